@@ -1,91 +1,166 @@
 from scapy.all import *
 from scapy.layers.http import HTTPRequest, HTTPResponse
+import argparse
 import json
+import threading
 import webbrowser
 import time
 
+from fastPath import DLT_EN10MB, RawCapture, is_http, parse_headers, replay, with_payload
+from httpPipeline import QUEUE_SIZE, WORKERS, CapturePipeline
+from httpStorage import TrafficStore
+
+HTTP_FILTER = "tcp port 80 or tcp port 443"
+
 
 class HTTPTrafficAnalyzer:
-    def __init__(self):
+    def __init__(self, capacity=None, verbose=True):
+        # capacity - сколько последних запросов/ответов хранить (None - все); итоги считаются по всем
+        # verbose - печатать каждый запрос/ответ
+        self.verbose = verbose
         self.sessions = {}
-        self.http_requests = []
-        self.http_responses = []
+        self.store = TrafficStore(capacity)
+        self.http_requests = self.store.requests
+        self.http_responses = self.store.responses
 
     def analyze_packet(self, packet):
         # Анализ HTTP запросов
         if packet.haslayer(HTTPRequest):
             http_layer = packet[HTTPRequest]
-            request_info = {
-                'timestamp': time.time(),
-                'method': http_layer.Method.decode(),
-                'host': http_layer.Host.decode() if http_layer.Host else '',
-                'path': http_layer.Path.decode(),
-                'src_ip': packet[IP].src,
-                'dst_ip': packet[IP].dst,
-                'user_agent': http_layer.get_field('User-Agent').decode() if http_layer.get_field('User-Agent') else '',
-                'headers': dict(http_layer.fields)
-            }
-            self.http_requests.append(request_info)
-            print(f"HTTP Request: {request_info['method']} {request_info['path']}")
+            request_info = self.store.add_request(
+                timestamp=float(packet.time),
+                method=http_layer.Method.decode(),
+                host=http_layer.Host.decode() if http_layer.Host else '',
+                path=http_layer.Path.decode(),
+                src_ip=packet[IP].src,
+                dst_ip=packet[IP].dst,
+                user_agent=http_layer.User_Agent.decode() if http_layer.User_Agent else '',
+                fields=http_layer.fields
+            )
+            if self.verbose:
+                print(f"HTTP Request: {request_info.method} {request_info.path}")
 
         # Анализ HTTP ответов
         if packet.haslayer(HTTPResponse):
             http_layer = packet[HTTPResponse]
-            response_info = {
-                'timestamp': time.time(),
-                'status_code': http_layer.Status_Code.decode() if http_layer.Status_Code else '',
-                'src_ip': packet[IP].src,
-                'dst_ip': packet[IP].dst,
-                'headers': dict(http_layer.fields)
-            }
-            self.http_responses.append(response_info)
-            print(f"HTTP Response: Status {response_info['status_code']}")
-
-    def start_analysis(self):
+            response_info = self.store.add_response(
+                timestamp=float(packet.time),
+                status_code=http_layer.Status_Code.decode() if http_layer.Status_Code else '',
+                src_ip=packet[IP].src,
+                dst_ip=packet[IP].dst,
+                fields=http_layer.fields
+            )
+            if self.verbose:
+                print(f"HTTP Response: Status {response_info.status_code}")
+
+    def analyze_raw(self, data, timestamp, linktype=DLT_EN10MB):
+        # Быстрый путь: заголовки IP/TCP читаются из буфера, слои scapy строятся
+        # только для сегментов, начинающихся со стартовой строки HTTP
+        headers = parse_headers(data, linktype)
+        if headers is None or not is_http(data, headers[2], headers[6]):
+            return
+        packet = conf.l2types.num2layer.get(linktype, Ether)(data)
+        packet.time = timestamp
+        self.analyze_packet(packet)
+
+    def start_analysis(self, bpf_filter=HTTP_FILTER, fast=False):
         print("Запуск анализа HTTP трафика...")
+        if fast:
+            # Пустые TCP-сегменты отсекаются фильтром в ядре
+            RawCapture(self.analyze_raw, with_payload(bpf_filter)).run()
+            return
         sniff(prn=self.analyze_packet, store=0,
-              filter="tcp port 80 or tcp port 443")
+              filter=bpf_filter)
+
+    def start_pipeline(self, bpf_filter=HTTP_FILTER, workers=WORKERS, queue_size=QUEUE_SIZE, iface=None):
+        # Конвейер: захват только ставит сырые пакеты в очередь, разбор и анализ - в потоках-обработчиках.
+        # Возвращает CapturePipeline: stats() - счетчики и глубина очереди, stop() - остановка
+        print("Запуск анализа HTTP трафика (конвейер)...")
+        pipeline = CapturePipeline(self.analyze_packet, workers, queue_size).start()
+        pipeline.capture(bpf_filter, iface)
+        return pipeline
+
+    def analyze_pcap(self, path, fast=False):
+        # Офлайн-разбор записи: PcapReader читает пакеты по одному (pcap и pcapng), файл целиком не загружается
+        if fast:
+            return replay(path, self.analyze_raw)
+        count = 0
+        with PcapReader(path) as reader:
+            for packet in reader:
+                self.analyze_packet(packet)
+                count += 1
+        return count
 
     def generate_report(self):
         print("\n" + "=" * 50)
         print("ОТЧЕТ ПО АНАЛИЗУ ТРАФИКА")
         print("=" * 50)
 
-        print(f"\nВсего HTTP запросов: {len(self.http_requests)}")
-        print(f"Всего HTTP ответов: {len(self.http_responses)}")
+        print(f"\nВсего HTTP запросов: {self.store.total_requests}")
+        print(f"Всего HTTP ответов: {self.store.total_responses}")
 
         print("\nДЕТАЛИ ЗАПРОСОВ:")
-        for i, req in enumerate(self.http_requests, 1):
-            print(f"{i}. {req['method']} {req['path']} -> {req['dst_ip']}")
+        # Нумерация сквозная: вытесненные из буфера запросы учитываются в номерах
+        first = self.http_requests.evicted + 1
+        if self.http_requests.evicted:
+            print(f"(показаны последние {len(self.http_requests)}, ранние вытеснены из буфера)")
+        for i, req in enumerate(self.http_requests, first):
+            print(f"{i}. {req.method} {req.path} -> {req.dst_ip}")
 
         print("\nСТАТУСЫ ОТВЕТОВ:")
-        status_counts = {}
-        for resp in self.http_responses:
-            status = resp['status_code']
-            status_counts[status] = status_counts.get(status, 0) + 1
-
-        for status, count in status_counts.items():
+        for status, count in self.store.status_counts.items():
             print(f"Статус {status}: {count} раз")
 
 
-# Запуск анализатора
-analyzer = HTTPTrafficAnalyzer()
-
-# Запуск в отдельном потоке
-import threading
-
-analysis_thread = threading.Thread(target=analyzer.start_analysis)
-analysis_thread.daemon = True
-analysis_thread.start()
-
-
-
-# Открываем Gruyere
-webbrowser.open("http://localhost:8008")
-
-# Даем время для взаимодействия
-print("Взаимодействуйте с сайтом в течение 60 секунд...")
-time.sleep(60)
-
-# Генерируем отчет
-analyzer.generate_report()
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description='Анализ HTTP трафика')
+    parser.add_argument('--pcap', help='разобрать pcap/pcapng-файл вместо живого захвата')
+    parser.add_argument('--filter', default=HTTP_FILTER, help='BPF-фильтр живого захвата')
+    parser.add_argument('--capacity', type=int, default=None, help='сколько последних запросов/ответов хранить')
+    parser.add_argument('--duration', type=int, default=60, help='длительность живого захвата, с')
+    parser.add_argument('--quiet', action='store_true', help='не печатать каждый пакет')
+    parser.add_argument('--fast', action='store_true',
+                        help='быстрый путь: фильтр BPF в ядре и разбор заголовков из сырых байтов')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='конвейер: захват только ставит пакеты в очередь, разбор - в потоках-обработчиках')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='потоков разбора (для --pipeline)')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help='емкость очереди (для --pipeline)')
+    args = parser.parse_args()
+
+    # Запуск анализатора
+    analyzer = HTTPTrafficAnalyzer(args.capacity, verbose=not args.quiet)
+
+    if args.pcap:
+        analyzer.analyze_pcap(args.pcap, args.fast)
+        analyzer.generate_report()
+        return
+
+    pipeline = None
+    if args.pipeline:
+        # С --fast пустые TCP-сегменты отсекаются в ядре и не занимают очередь
+        bpf_filter = with_payload(args.filter) if args.fast else args.filter
+        pipeline = analyzer.start_pipeline(bpf_filter, args.workers, args.queue_size)
+    else:
+        # Запуск в отдельном потоке
+        analysis_thread = threading.Thread(target=analyzer.start_analysis, args=(args.filter, args.fast))
+        analysis_thread.daemon = True
+        analysis_thread.start()
+
+    # Открываем Gruyere
+    webbrowser.open("http://localhost:8008")
+
+    # Даем время для взаимодействия
+    print(f"Взаимодействуйте с сайтом в течение {args.duration} секунд...")
+    time.sleep(args.duration)
+
+    if pipeline is not None:
+        stats = pipeline.stop()
+        print(f"\nКонвейер: захвачено {stats['captured']}, отброшено {stats['dropped']}, "
+              f"обработано {stats['processed']}, ошибок разбора {stats['errors']}")
+
+    # Генерируем отчет
+    analyzer.generate_report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+import glob
+import math
+import os
+import shelve
+import shutil
+import tempfile
+from collections import Counter, OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scapy.layers.dns import DNS
+
+# Домен признаков - столько последних меток имени (2: a.b.example.com -> example.com), 0 - имя целиком
+DOMAIN_LABELS = 2
+# Батч выдается, когда изменилось столько доменов или прошло flush_interval секунд
+BATCH_DOMAINS = 10_000
+FLUSH_INTERVAL = 60.0
+# Верхняя граница числа доменов в памяти: при переполнении вытесняются самые давние
+MAX_DOMAINS = 100_000
+# Сколько различных TTL запоминать на домен
+MAX_TTLS = 256
+# Строк в одном файле ParquetBatchWriter: батчи дописываются группами строк, затем начинается новый файл
+ROLL_ROWS = 1_000_000
+
+QTYPE_NULL = 10
+QTYPE_TXT = 16
+QTYPE_OPT = 41
+
+# Схема колонок dnsAnalyzer.py (homework5): домен, частоты типов, энтропия, длина, TTL
+FEATURE_COLUMNS = ['rr', 'NULL_frequency', 'TXT_frequency', 'OPT_frequency', 'entropy', 'rr_name_entropy',
+                   'len', 'rr_name_length', 'unique_ttl', 'ttl_mean', 'ttl_variance', 'queries',
+                   'first_seen', 'last_seen']
+
+
+def shannon_entropy(counts, total: int) -> float:
+    """Энтропия Шеннона (бит на символ) по счетчикам символов"""
+    if not total:
+        return 0.0
+    return math.log2(total) - sum(count * math.log2(count) for count in counts if count) / total
+
+
+def base_domain(name: str, labels: int = DOMAIN_LABELS) -> str:
+    """
+        Args:
+            name (str): DNS-имя из запроса
+            labels (int): сколько последних меток оставить, 0 - все
+
+        Returns:
+            str: домен в нижнем регистре без завершающей точки
+    """
+    name = name.rstrip('.').lower()
+    if labels:
+        name = '.'.join(name.split('.')[-labels:])
+    return name
+
+
+class DomainFeatures:
+    """Накопленные признаки одного домена; все обновления - O(длины имени)"""
+
+    __slots__ = ('queries', 'null', 'txt', 'opt', 'chars', 'name_length', 'ttls', 'ttl_count', 'ttl_mean',
+                 'ttl_m2', 'first_seen', 'last_seen')
+
+    def __init__(self, timestamp: float):
+        self.queries = 0
+        self.null = 0
+        self.txt = 0
+        self.opt = 0
+        # Счетчики символов всех запрошенных имен домена - для потоковой энтропии
+        self.chars: Counter = Counter()
+        self.name_length = 0
+        self.ttls: set[int] = set()
+        # TTL ответов: количество, среднее и сумма квадратов отклонений (алгоритм Уэлфорда)
+        self.ttl_count = 0
+        self.ttl_mean = 0.0
+        self.ttl_m2 = 0.0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+
+    def add_query(self, name: str, qtype: int, opt: bool) -> None:
+        self.queries += 1
+        self.null += qtype == QTYPE_NULL
+        self.txt += qtype == QTYPE_TXT
+        self.opt += opt or qtype == QTYPE_OPT
+        self.chars.update(name)
+        self.name_length += len(name)
+
+    def add_ttl(self, ttl: int) -> None:
+        if len(self.ttls) < MAX_TTLS:
+            self.ttls.add(ttl)
+        self.ttl_count += 1
+        delta = ttl - self.ttl_mean
+        self.ttl_mean += delta / self.ttl_count
+        self.ttl_m2 += delta * (ttl - self.ttl_mean)
+
+    def row(self, domain: str) -> dict:
+        queries = self.queries or 1
+        return {
+            'rr': domain,
+            'NULL_frequency': self.null / queries,
+            'TXT_frequency': self.txt / queries,
+            'OPT_frequency': self.opt / queries,
+            'entropy': shannon_entropy(self.chars.values(), self.name_length),
+            'rr_name_entropy': shannon_entropy(Counter(domain).values(), len(domain)),
+            'len': self.name_length / queries,
+            'rr_name_length': len(domain),
+            'unique_ttl': len(self.ttls),
+            'ttl_mean': self.ttl_mean,
+            'ttl_variance': self.ttl_m2 / self.ttl_count if self.ttl_count else 0.0,
+            'queries': self.queries,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+        }
+
+
+class DnsFeatureExtractor:
+    """
+        Потоковое извлечение DNS-признаков по доменам из живого трафика или pcap.
+
+        Запросы обновляют частоты типов, длину и счетчики символов (энтропию), ответы - набор
+        и статистику TTL. Признаки отдаются DataFrame'ами в схеме dnsAnalyzer.py двумя потоками:
+        on_batch - промежуточные обновления (текущее состояние доменов, изменившихся с прошлой
+        выдачи; домен повторяется в каждом батче, где менялся, актуальна последняя строка),
+        on_final - итоговое состояние всех доменов в close(), каждый домен ровно один раз.
+        Домены сверх max_domains вытесняются из памяти на диск (shelve во временном каталоге);
+        вернувшийся домен продолжает накопленное состояние, а не начинает новую строку.
+    """
+
+    def __init__(self, labels: int = DOMAIN_LABELS, batch_domains: int = BATCH_DOMAINS,
+                 flush_interval: float = FLUSH_INTERVAL, max_domains: int = MAX_DOMAINS, on_batch=None,
+                 on_final=None):
+        """
+            Args:
+                labels (int): сколько последних меток имени образуют домен, 0 - имя целиком
+                batch_domains (int): изменившихся доменов, после которых выдается батч
+                flush_interval (float): период выдачи батчей, с
+                max_domains (int): максимум доменов в памяти
+                on_batch: on_batch(DataFrame) - получатель промежуточных обновлений
+                on_final: on_final(DataFrame) - получатель итоговых состояний доменов
+        """
+        self.labels = labels
+        self.batch_domains = batch_domains
+        self.flush_interval = flush_interval
+        self.max_domains = max_domains
+        self.on_batch = on_batch
+        self.on_final = on_final
+        self.domains: OrderedDict[str, DomainFeatures] = OrderedDict()
+        # Изменившиеся домены в порядке изменения (dict - ради стабильного порядка строк батча)
+        self._dirty: dict[str, None] = {}
+        # Состояния вытесненных доменов на диске; создаются при первом вытеснении
+        self._spill_dir = None
+        self._spill = None
+        self._next_flush = None
+        self.queries = 0
+        self.responses = 0
+        self.batches = 0
+        self.evicted = 0
+        self.restored = 0
+
+    def update(self, packet) -> None:
+        """Учитывает пакет scapy (не-DNS пакеты пропускаются)"""
+        if packet.haslayer(DNS):
+            self.add(packet[DNS], float(packet.time))
+
+    def add(self, dns, timestamp: float) -> None:
+        """
+            Учитывает разобранный DNS-слой
+
+            Args:
+                dns: слой scapy DNS
+                timestamp (float): время пакета
+        """
+        if not dns.qd:
+            return
+        question = dns.qd[0]
+        name = question.qname.decode('utf-8', errors='replace').rstrip('.').lower()
+        domain = base_domain(name, self.labels)
+        features = self._features(domain, timestamp)
+        if dns.qr == 0:
+            opt = any(record.type == QTYPE_OPT for record in dns.ar or ())
+            features.add_query(name, question.qtype, opt)
+            self.queries += 1
+        else:
+            for record in dns.an or ():
+                ttl = getattr(record, 'ttl', None)
+                if ttl is not None:
+                    features.add_ttl(ttl)
+            self.responses += 1
+        self._dirty[domain] = None
+
+        if self._next_flush is None:
+            self._next_flush = timestamp + self.flush_interval
+        if timestamp >= self._next_flush or len(self._dirty) >= self.batch_domains:
+            self.flush(timestamp)
+
+    def _features(self, domain: str, timestamp: float) -> DomainFeatures:
+        features = self.domains.get(domain)
+        if features is not None:
+            self.domains.move_to_end(domain)
+            features.last_seen = max(features.last_seen, timestamp)
+            return features
+        if self._spill is not None and domain in self._spill:
+            # Вернувшийся домен продолжает состояние с диска: итоговая строка останется одна
+            features = self._spill.pop(domain)
+            features.last_seen = max(features.last_seen, timestamp)
+            self.restored += 1
+        else:
+            features = DomainFeatures(timestamp)
+        self.domains[domain] = features
+        if len(self.domains) > self.max_domains:
+            self._evict()
+        return features
+
+    def _evict(self) -> None:
+        if self._spill is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='dns-features-')
+            self._spill = shelve.open(os.path.join(self._spill_dir, 'domains'))
+        evicted, state = self.domains.popitem(last=False)
+        self._spill[evicted] = state
+        self.evicted += 1
+
+    def batch(self) -> pd.DataFrame:
+        """Состояние доменов, изменившихся с прошлой выдачи; сбрасывает список изменений"""
+        rows = []
+        for domain in self._dirty:
+            # Изменившийся домен мог быть вытеснен до выдачи - его состояние на диске
+            features = self.domains.get(domain)
+            if features is None and self._spill is not None:
+                features = self._spill.get(domain)
+            if features is not None:
+                rows.append(features.row(domain))
+        self._dirty = {}
+        return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+    def snapshot(self) -> pd.DataFrame:
+        """Состояние всех доменов в памяти (без вытесненных на диск)"""
+        return pd.DataFrame([features.row(domain) for domain, features in self.domains.items()],
+                            columns=FEATURE_COLUMNS)
+
+    def flush(self, now: float | None = None) -> pd.DataFrame | None:
+        """
+            Выдает батч изменившихся доменов в on_batch
+
+            Args:
+                now (float | None): текущее время пакетов; None - конец захвата
+
+            Returns:
+                pd.DataFrame | None: батч или None, если изменений не было
+        """
+        if now is not None:
+            self._next_flush = now + self.flush_interval
+        if not self._dirty:
+            return None
+        frame = self.batch()
+        self.batches += 1
+        if self.on_batch is not None:
+            self.on_batch(frame)
+        return frame
+
+    def close(self) -> pd.DataFrame:
+        """
+            Конец захвата: последняя выдача обновлений и итоговое состояние всех доменов в on_final -
+            сначала вытесненных на диск (частями по batch_domains), затем остававшихся в памяти.
+            Память доменов и временный каталог освобождаются
+
+            Returns:
+                pd.DataFrame: итоговые строки доменов, остававшихся в памяти
+        """
+        self.flush()
+        if self._spill is not None:
+            rows = []
+            for domain in self._spill:
+                rows.append(self._spill[domain].row(domain))
+                if len(rows) >= self.batch_domains:
+                    self._emit_final(rows)
+                    rows = []
+            self._emit_final(rows)
+            self._spill.close()
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill = self._spill_dir = None
+        final = self.snapshot()
+        self.domains.clear()
+        self._emit_final(final)
+        return final
+
+    def _emit_final(self, rows) -> None:
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+        if self.on_final is not None and len(frame):
+            self.on_final(frame)
+
+
+class ParquetBatchWriter:
+    """
+        Пишет батчи признаков в каталог: батч дописывается группой строк в текущий файл
+        part-NNNNN.parquet, после roll_rows строк начинается следующий файл. close() обязателен -
+        он дописывает метаданные последнего файла.
+        Каталог итоговых состояний (on_final) можно передать dnsAnalyzer.py как каталог партиций;
+        каталог промежуточных обновлений (on_batch) содержит повторы доменов и для этого не годится
+    """
+
+    def __init__(self, directory: str, roll_rows: int = ROLL_ROWS):
+        """
+            Args:
+                directory (str): каталог частей
+                roll_rows (int): строк в одном файле
+        """
+        self.directory = directory
+        self.roll_rows = roll_rows
+        self.files = 0
+        self.rows = 0
+        self.path = None
+        self._writer = None
+        self._file_rows = 0
+        os.makedirs(directory, exist_ok=True)
+        # Части прошлого прогона удаляются, чтобы не смешаться с новыми
+        for path in glob.glob(os.path.join(directory, 'part-*.parquet')):
+            os.remove(path)
+
+    def write(self, batch: pd.DataFrame) -> str:
+        """
+            Args:
+                batch (pd.DataFrame): строки признаков
+
+            Returns:
+                str: файл, в который записан батч
+        """
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+        if self._writer is not None and self._file_rows >= self.roll_rows:
+            self._writer.close()
+            self._writer = None
+        if self._writer is None:
+            self.path = os.path.join(self.directory, f'part-{self.files:05d}.parquet')
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+            self.files += 1
+            self._file_rows = 0
+        self._writer.write_table(table.cast(self._writer.schema))
+        self._file_rows += len(batch)
+        self.rows += len(batch)
+        return self.path
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
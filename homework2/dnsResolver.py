@@ -0,0 +1,128 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Емкость кеша, время жизни удачного и неудачного ответа (с), потоков разрешения
+CACHE_SIZE = 4096
+TTL = 300
+NEGATIVE_TTL = 60
+WORKERS = 8
+
+
+class ReverseResolver:
+    """
+        Неблокирующее обратное разрешение IP -> имя.
+
+        lookup сразу возвращает имя из кеша (LRU + TTL) или None; при промахе запрос уходит
+        в пул потоков, а по готовности вызывается callback. Неудачи (herror/gaierror)
+        тоже кешируются, чтобы не повторять медленные запросы к одним и тем же адресам.
+    """
+
+    def __init__(self, cache_size: int = CACHE_SIZE, ttl: float = TTL, negative_ttl: float = NEGATIVE_TTL,
+                 workers: int = WORKERS, resolve=None):
+        """
+            Args:
+                cache_size (int): сколько адресов держать в кеше
+                ttl (float): время жизни найденного имени, с
+                negative_ttl (float): время жизни неудачного разрешения, с
+                workers (int): потоков для запросов
+                resolve: функция ip -> имя (по умолчанию socket.gethostbyaddr)
+        """
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._resolve = resolve or (lambda ip: socket.gethostbyaddr(ip)[0])
+        # ip -> (имя или None, момент устаревания)
+        self._cache: OrderedDict[str, tuple[str | None, float]] = OrderedDict()
+        # ip -> callbacks, ждущие уже отправленного запроса: один адрес не разрешается дважды
+        self._pending: dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='resolver')
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.resolved = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def lookup(self, ip: str, callback=None) -> str | None:
+        """
+            Имя из кеша без ожидания
+
+            Args:
+                ip (str): адрес
+                callback: callback(ip, имя или None), вызывается из потока пула, если имени еще нет в кеше
+
+            Returns:
+                str | None: имя, если оно уже известно; None - неизвестно или не разрешается
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(ip)
+            if cached is not None and cached[1] > now:
+                self._cache.move_to_end(ip)
+                if cached[0] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return cached[0]
+
+            self.misses += 1
+            waiting = self._pending.get(ip)
+            if waiting is not None:
+                if callback is not None:
+                    waiting.append(callback)
+                return None
+            self._pending[ip] = [callback] if callback is not None else []
+        self._executor.submit(self._lookup, ip)
+        return None
+
+    def _lookup(self, ip: str) -> None:
+        start = time.monotonic()
+        try:
+            name = self._resolve(ip)
+        except Exception:
+            # herror/gaierror и прочие сбои - адрес не разрешается, кешируется как неудача
+            name = None
+        finished = time.monotonic()
+        latency = finished - start
+
+        with self._lock:
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            if name is None:
+                self.failed += 1
+            else:
+                self.resolved += 1
+            self._cache[ip] = (name, finished + (self.ttl if name is not None else self.negative_ttl))
+            self._cache.move_to_end(ip)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            callbacks = self._pending.pop(ip, [])
+
+        for callback in callbacks:
+            callback(ip, name)
+
+    def stats(self) -> dict:
+        """Попадания, промахи, результаты запросов и задержки (мс)"""
+        with self._lock:
+            lookups = self.resolved + self.failed
+            return {
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'resolved': self.resolved,
+                'failed': self.failed,
+                'pending': len(self._pending),
+                'cached': len(self._cache),
+                'latency_avg_ms': self.latency_total / lookups * 1000 if lookups else 0.0,
+                'latency_max_ms': self.latency_max * 1000,
+            }
+
+    def close(self, wait: bool = False) -> None:
+        """Останавливает пул; незавершенные запросы можно не ждать"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
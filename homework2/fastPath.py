@@ -0,0 +1,243 @@
+import socket
+import struct
+import threading
+import time
+
+from scapy.all import RawPcapReader, conf
+
+# Типы канального уровня pcap
+DLT_EN10MB = 1
+DLT_RAW = 101
+DLT_LINUX_SLL = 113
+DLT_IPV4 = 228
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+PROTO_TCP = 6
+PROTO_UDP = 17
+DNS_PORT = 53
+
+# Пакеты только IPv4: остальное быстрый путь не разбирает и отсекается еще в ядре
+IPV4_FILTER = 'ip'
+# Условие BPF «у TCP-сегмента есть данные»: длина IP минус заголовки IP и TCP не ноль.
+# Пустые ACK не доходят до пользовательского пространства
+TCP_PAYLOAD_FILTER = '(((ip[2:2] - ((ip[0]&0xf)<<2)) - ((tcp[12]&0xf0)>>2)) != 0)'
+
+# Как часто живой захват проверяет остановку при отсутствии трафика, с
+POLL_INTERVAL = 0.5
+
+_ETHER_TYPE = struct.Struct('!H')
+_IPV4 = struct.Struct('!BxHxxHxBxx4s4s')
+_PORTS = struct.Struct('!HH')
+_TCP = struct.Struct('!HHIIBB')
+
+# Флаги TCP
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+
+
+def link_offset(data, linktype: int) -> int:
+    """
+        Смещение IPv4-заголовка в кадре
+
+        Args:
+            data: байты кадра
+            linktype (int): тип канального уровня pcap
+
+        Returns:
+            int: смещение; -1 - в кадре не IPv4
+    """
+    if linktype == DLT_EN10MB:
+        offset = 12
+        ether_type = _ETHER_TYPE.unpack_from(data, offset)[0]
+        # Метки VLAN (в том числе двойные) пропускаются
+        while ether_type in ETHERTYPE_VLAN:
+            offset += 4
+            ether_type = _ETHER_TYPE.unpack_from(data, offset)[0]
+        return offset + 2 if ether_type == ETHERTYPE_IPV4 else -1
+    if linktype == DLT_LINUX_SLL:
+        return 16 if _ETHER_TYPE.unpack_from(data, 14)[0] == ETHERTYPE_IPV4 else -1
+    if linktype in (DLT_RAW, DLT_IPV4):
+        return 0 if data[0] >> 4 == 4 else -1
+    return -1
+
+
+def parse_headers(data, linktype: int = DLT_EN10MB):
+    """
+        Разбор фиксированных полей IPv4/TCP/UDP прямо из буфера, без слоев scapy
+
+        Args:
+            data: байты кадра (bytes или memoryview)
+            linktype (int): тип канального уровня pcap
+
+        Returns:
+            tuple | None: (src, dst, proto, sport, dport, длина IP, смещение данных L4)
+                          или None для не-IPv4 и обрезанных кадров; у фрагментов и протоколов без портов порты 0
+    """
+    view = memoryview(data)
+    try:
+        offset = link_offset(view, linktype)
+        if offset < 0:
+            return None
+        version_ihl, length, fragment, proto, src, dst = _IPV4.unpack_from(view, offset)
+        if version_ihl >> 4 != 4:
+            return None
+        header = offset + (version_ihl & 0x0F) * 4
+        sport = dport = 0
+        payload = header
+        # Порты есть только в первом фрагменте
+        if not fragment & 0x1FFF:
+            if proto == PROTO_TCP:
+                sport, dport = _PORTS.unpack_from(view, header)
+                payload = header + (view[header + 12] >> 4) * 4
+            elif proto == PROTO_UDP:
+                sport, dport = _PORTS.unpack_from(view, header)
+                payload = header + 8
+    except (struct.error, IndexError):
+        return None
+    return socket.inet_ntoa(src), socket.inet_ntoa(dst), proto, sport, dport, length, payload
+
+
+def parse_tcp(data, linktype: int = DLT_EN10MB):
+    """
+        Поля TCP-сегмента для отслеживания соединений, прямо из буфера
+
+        Args:
+            data: байты кадра
+            linktype (int): тип канального уровня pcap
+
+        Returns:
+            tuple | None: (src, dst, sport, dport, seq, ack, флаги, длина данных) или None, если это не TCP/IPv4
+    """
+    view = memoryview(data)
+    try:
+        offset = link_offset(view, linktype)
+        if offset < 0:
+            return None
+        version_ihl, length, fragment, proto, src, dst = _IPV4.unpack_from(view, offset)
+        if version_ihl >> 4 != 4 or proto != PROTO_TCP or fragment & 0x1FFF:
+            return None
+        ip_header = (version_ihl & 0x0F) * 4
+        sport, dport, seq, ack, data_offset, flags = _TCP.unpack_from(view, offset + ip_header)
+    except (struct.error, IndexError):
+        return None
+    payload_length = length - ip_header - (data_offset >> 4) * 4
+    return socket.inet_ntoa(src), socket.inet_ntoa(dst), sport, dport, seq, ack, flags, max(payload_length, 0)
+
+
+def is_dns(proto: int, sport: int, dport: int) -> bool:
+    """Пакет требует разбора DNS"""
+    return proto == PROTO_UDP and (sport == DNS_PORT or dport == DNS_PORT)
+
+
+HTTP_PREFIXES = (b'GET ', b'POST ', b'PUT ', b'DELETE ', b'HEAD ', b'OPTIONS ', b'PATCH ', b'CONNECT ',
+                 b'TRACE ', b'HTTP/')
+
+
+def is_http(data, proto: int, payload: int) -> bool:
+    """TCP-сегмент начинается со стартовой строки HTTP-запроса или ответа"""
+    return proto == PROTO_TCP and bytes(data[payload:payload + 8]).startswith(HTTP_PREFIXES)
+
+
+def iter_pcap(path: str):
+    """
+        Сырые кадры записи без разбора scapy
+
+        Yields:
+            tuple: (байты, время, тип канального уровня)
+    """
+    with RawPcapReader(path) as reader:
+        linktype = reader.linktype
+        # В pcap с магией 0xa1b23c4d поле usec хранит наносекунды
+        fraction = 1e9 if getattr(reader, 'nano', False) else 1e6
+        for data, meta in reader:
+            if hasattr(meta, 'sec'):
+                timestamp = meta.sec + meta.usec / fraction
+            else:
+                # pcapng: время в единицах tsresol
+                timestamp = ((meta.tshigh << 32) + meta.tslow) / meta.tsresol
+                linktype = getattr(meta, 'linktype', linktype)
+            yield data, timestamp, linktype
+
+
+def replay(path: str, handler, count: int = 0) -> int:
+    """
+        Прогоняет запись через handler(байты, время, тип канального уровня)
+
+        Args:
+            path (str): pcap/pcapng-файл
+            handler: обработчик сырого кадра
+            count (int): сколько кадров, 0 - все
+
+        Returns:
+            int: обработано кадров
+    """
+    processed = 0
+    for data, timestamp, linktype in iter_pcap(path):
+        handler(data, timestamp, linktype)
+        processed += 1
+        if count and processed >= count:
+            break
+    return processed
+
+
+def with_payload(bpf_filter: str | None) -> str:
+    """BPF-фильтр, дополнительно отсекающий TCP-сегменты без данных"""
+    return f'({bpf_filter}) and tcp and {TCP_PAYLOAD_FILTER}' if bpf_filter else f'tcp and {TCP_PAYLOAD_FILTER}'
+
+
+class RawCapture:
+    """
+        Живой захват сырых кадров с фильтром BPF в ядре; кадры передаются в handler
+        без разбора scapy
+    """
+
+    def __init__(self, handler, bpf_filter: str | None = IPV4_FILTER, iface=None):
+        """
+            Args:
+                handler: handler(байты, время, тип канального уровня)
+                bpf_filter (str | None): BPF-фильтр
+                iface: интерфейс, None - по умолчанию
+        """
+        self.handler = handler
+        self.bpf_filter = bpf_filter
+        self.iface = iface
+        self.captured = 0
+        self._stop = threading.Event()
+
+    def run(self, count: int = 0, timeout: float | None = None) -> int:
+        """
+            Захват на текущем потоке
+
+            Args:
+                count (int): сколько кадров, 0 - без ограничения
+                timeout (float | None): длительность, с
+
+            Returns:
+                int: захвачено кадров
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        sock = conf.L2listen(iface=self.iface, filter=self.bpf_filter)
+        try:
+            while not self._stop.is_set():
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                # Ожидание с таймаутом, чтобы stop() и timeout срабатывали и без трафика
+                if not sock.select([sock], POLL_INTERVAL):
+                    continue
+                layer, data, timestamp = sock.recv_raw()
+                if data is None:
+                    continue
+                self.captured += 1
+                self.handler(data, timestamp or time.time(), conf.l2types.layer2num.get(layer, DLT_EN10MB))
+                if count and self.captured >= count:
+                    break
+        finally:
+            sock.close()
+        return self.captured
+
+    def stop(self) -> None:
+        self._stop.set()
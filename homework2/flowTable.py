@@ -0,0 +1,220 @@
+import threading
+import time
+from collections import OrderedDict
+
+from scapy.layers.dns import DNSQR
+from scapy.layers.inet import IP, TCP, UDP
+
+# Поток считается завершенным после стольких секунд без пакетов
+IDLE_TIMEOUT = 60.0
+# Как часто выдавать сводку по потокам, с
+FLUSH_INTERVAL = 10.0
+# Верхняя граница числа потоков: при переполнении вытесняются самые давние
+MAX_FLOWS = 100_000
+# Сколько различных DNS-имен хранить на поток
+MAX_QNAMES = 16
+
+
+class FlowRecord:
+    """Поток по 5-кортежу (src, dst, proto, sport, dport) с итоговыми счетчиками"""
+
+    __slots__ = ('src', 'dst', 'proto', 'sport', 'dport', 'packets', 'bytes', 'first_seen', 'last_seen', 'qnames')
+
+    def __init__(self, src, dst, proto, sport, dport, timestamp):
+        self.src = src
+        self.dst = dst
+        self.proto = proto
+        self.sport = sport
+        self.dport = dport
+        self.packets = 0
+        self.bytes = 0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        # Множество создается только у DNS-потоков
+        self.qnames = None
+
+    @property
+    def key(self) -> tuple:
+        return self.src, self.dst, self.proto, self.sport, self.dport
+
+    @property
+    def duration(self) -> float:
+        return self.last_seen - self.first_seen
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+
+class FlowTable:
+    """
+        Таблица активных потоков. Словарь упорядочен по последнему пакету, поэтому
+        простаивающие потоки всегда в начале и вытесняются без обхода всей таблицы.
+        Раз в flush_interval завершенные потоки выдаются пачкой в on_flush: по времени пакетов,
+        а при живом захвате еще и по часам (start_sweeper), чтобы на тихом канале потоки не зависали.
+    """
+
+    def __init__(self, idle_timeout: float = IDLE_TIMEOUT, flush_interval: float = FLUSH_INTERVAL,
+                 max_flows: int = MAX_FLOWS, on_flush=None):
+        """
+            Args:
+                idle_timeout (float): сколько секунд поток может простаивать
+                flush_interval (float): период выдачи сводок, с
+                max_flows (int): максимум потоков в таблице
+                on_flush: on_flush(завершенные потоки, таблица, время) - вызывается раз в flush_interval
+        """
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self.max_flows = max_flows
+        self.on_flush = on_flush
+        self.flows: OrderedDict[tuple, FlowRecord] = OrderedDict()
+        # Пакеты и проверка по часам идут из разных потоков; RLock - on_flush может читать таблицу
+        self._lock = threading.RLock()
+        self._finished: list[FlowRecord] = []
+        self._next_flush = None
+        self.packets = 0
+        self.bytes = 0
+        self.created = 0
+        self.expired = 0
+
+    def update(self, packet) -> FlowRecord | None:
+        """
+            Учитывает пакет scapy
+
+            Args:
+                packet: пакет scapy
+
+            Returns:
+                FlowRecord | None: поток пакета; None - пакет без IP
+        """
+        if not packet.haslayer(IP):
+            return None
+        ip = packet[IP]
+        if packet.haslayer(TCP):
+            sport, dport = packet[TCP].sport, packet[TCP].dport
+        elif packet.haslayer(UDP):
+            sport, dport = packet[UDP].sport, packet[UDP].dport
+        else:
+            sport = dport = 0
+        qname = None
+        if packet.haslayer(DNSQR):
+            qname = packet[DNSQR].qname.decode('utf-8', errors='replace')
+        return self.add(ip.src, ip.dst, ip.proto, sport, dport, ip.len or len(ip), float(packet.time), qname)
+
+    def add(self, src, dst, proto, sport, dport, size: int, timestamp: float, qname: str | None = None) -> FlowRecord:
+        """
+            Учитывает пакет по уже извлеченным полям
+
+            Args:
+                src, dst, proto, sport, dport: 5-кортеж (порты 0 у протоколов без портов)
+                size (int): длина IP-пакета, байт
+                timestamp (float): время пакета
+                qname (str | None): DNS-имя из запроса
+
+            Returns:
+                FlowRecord: поток пакета
+        """
+        with self._lock:
+            return self._add(src, dst, proto, sport, dport, size, timestamp, qname)
+
+    def _add(self, src, dst, proto, sport, dport, size, timestamp, qname) -> FlowRecord:
+        key = (src, dst, proto, sport, dport)
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = FlowRecord(src, dst, proto, sport, dport, timestamp)
+            self.created += 1
+            if len(self.flows) > self.max_flows:
+                self._finish(self.flows.popitem(last=False)[1])
+        else:
+            self.flows.move_to_end(key)
+        flow.packets += 1
+        flow.bytes += size
+        flow.last_seen = max(flow.last_seen, timestamp)
+        if qname is not None:
+            if flow.qnames is None:
+                flow.qnames = set()
+            if len(flow.qnames) < MAX_QNAMES:
+                flow.qnames.add(qname)
+        self.packets += 1
+        self.bytes += size
+
+        if self._next_flush is None:
+            self._next_flush = timestamp + self.flush_interval
+        elif timestamp >= self._next_flush:
+            self.flush(timestamp)
+        return flow
+
+    def _finish(self, flow: FlowRecord) -> None:
+        self._finished.append(flow)
+        self.expired += 1
+
+    def expire(self, now: float) -> None:
+        """Переносит в завершенные потоки, простаивающие дольше idle_timeout к моменту now"""
+        deadline = now - self.idle_timeout
+        while self.flows:
+            flow = next(iter(self.flows.values()))
+            if flow.last_seen > deadline:
+                break
+            self._finish(self.flows.popitem(last=False)[1])
+
+    def flush(self, now: float, final: bool = False) -> list[FlowRecord]:
+        """
+            Выдает накопленные завершенные потоки
+
+            Args:
+                now (float): текущее время (пакетов или часов)
+                final (bool): завершить и все активные потоки (конец захвата)
+
+            Returns:
+                list[FlowRecord]: завершенные потоки с прошлой выдачи
+        """
+        with self._lock:
+            self.expire(now)
+            if final:
+                while self.flows:
+                    self._finish(self.flows.popitem(last=False)[1])
+            finished, self._finished = self._finished, []
+            self._next_flush = now + self.flush_interval
+            if self.on_flush is not None:
+                self.on_flush(finished, self, now)
+            return finished
+
+    def sweep(self, now: float) -> list[FlowRecord] | None:
+        """
+            Выдача по часам: срабатывает, если с прошлой выдачи прошло flush_interval, даже без пакетов
+
+            Args:
+                now (float): текущее время в той же шкале, что и время пакетов
+
+            Returns:
+                list[FlowRecord] | None: завершенные потоки; None - выдавать еще рано
+        """
+        with self._lock:
+            if self._next_flush is None or now < self._next_flush:
+                return None
+            return self.flush(now)
+
+    def start_sweeper(self, clock=time.time) -> threading.Event:
+        """
+            Фоновая проверка простаивающих потоков по часам (для живого захвата)
+
+            Args:
+                clock: источник текущего времени, по умолчанию time.time (шкала времени пакетов)
+
+            Returns:
+                threading.Event: set() останавливает проверку
+        """
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(min(self.flush_interval, 1.0)):
+                self.sweep(clock())
+        threading.Thread(target=run, daemon=True, name='flow-sweeper').start()
+        return stop
+
+    def top(self, n: int = 10) -> list[FlowRecord]:
+        """Активные потоки с наибольшим объемом"""
+        with self._lock:
+            return sorted(self.flows.values(), key=lambda flow: flow.bytes, reverse=True)[:n]
+
+    def __len__(self) -> int:
+        return len(self.flows)
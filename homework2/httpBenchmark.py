@@ -0,0 +1,134 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+
+from scapy.all import DNS, DNSQR, IP, TCP, UDP, Ether, PcapReader, PcapWriter, conf
+from scapy.layers.http import HTTP, HTTPRequest, HTTPResponse
+
+from fastPath import iter_pcap
+from httpPipeline import CapturePipeline
+from TraficAnalyzer import HTTPTrafficAnalyzer
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+METHODS = [b'GET', b'GET', b'GET', b'POST', b'PUT', b'DELETE']
+HOSTS = [b'localhost:8008', b'google-gruyere.appspot.com', b'example.com']
+PATHS = [b'/', b'/login', b'/snippets.gtl', b'/upload.gtl', b'/static/main.css', b'/api/items?id=']
+STATUSES = [(b'200', b'OK'), (b'200', b'OK'), (b'302', b'Found'), (b'404', b'Not Found'), (b'500', b'Server Error')]
+USER_AGENTS = [b'Mozilla/5.0 (X11; Linux x86_64)', b'curl/8.0', b'python-requests/2.31']
+
+
+def generate_pcap(path: str, packets: int, seed: int = 0, noise: float = 0.2, dns: float = 0.0) -> None:
+    """
+        Пишет pcap с HTTP-запросами и ответами потоково (PcapWriter), без списка пакетов в памяти
+
+        Args:
+            path (str): куда писать
+            packets (int): сколько пакетов
+            seed (int): зерно генератора
+            noise (float): доля не-HTTP TCP-пакетов (ACK без данных)
+            dns (float): доля DNS-запросов
+    """
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    with PcapWriter(path, sync=False) as writer:
+        for i in range(packets):
+            client = f'10.0.{rng.randrange(256)}.{rng.randrange(1, 255)}'
+            sport = rng.randrange(1024, 65535)
+            base = Ether() / IP(src=client, dst='10.1.0.1') / TCP(sport=sport, dport=80, flags='PA')
+            draw = rng.random()
+            if draw < dns:
+                packet = (Ether() / IP(src=client, dst='10.1.0.53') / UDP(sport=sport, dport=53)
+                          / DNS(rd=1, qd=DNSQR(qname=rng.choice(HOSTS).split(b':')[0], qtype=rng.choice(['A', 'TXT']))))
+            elif draw < dns + noise:
+                packet = Ether() / IP(src=client, dst='10.1.0.1') / TCP(sport=sport, dport=80, flags='A')
+            elif i % 2 == 0:
+                path_ = rng.choice(PATHS) + (str(rng.randrange(1000)).encode() if rng.random() < 0.3 else b'')
+                packet = base / HTTP() / HTTPRequest(Method=rng.choice(METHODS), Path=path_,
+                                                      Host=rng.choice(HOSTS), User_Agent=rng.choice(USER_AGENTS),
+                                                      Accept=b'*/*')
+            else:
+                status, reason = rng.choice(STATUSES)
+                packet = (Ether() / IP(src='10.1.0.1', dst=client) / TCP(sport=80, dport=sport, flags='PA')
+                          / HTTP() / HTTPResponse(Status_Code=status, Reason_Phrase=reason,
+                                                  Content_Type=b'text/html', Content_Length=b'0'))
+            packet.time = start + i * 0.001
+            writer.write(packet)
+
+
+def run_stage(name: str, packets: int, func, results: list, *args):
+    """Выполняет стадию и добавляет (стадия, пакетов, время, пакетов/с, мкс/пакет) в results"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    elapsed = time.perf_counter() - start
+    results.append((name, packets, elapsed, packets / elapsed if elapsed else float('inf'),
+                    elapsed / packets * 1e6 if packets else 0.0))
+
+
+def read_only(path: str) -> None:
+    # Базовая стоимость: только чтение и разбор слоев scapy, без анализа
+    with PcapReader(path) as reader:
+        for _ in reader:
+            pass
+
+
+def analyze_offline(path: str, capacity: int | None) -> None:
+    analyzer = HTTPTrafficAnalyzer(capacity, verbose=False)
+    analyzer.analyze_pcap(path)
+    analyzer.generate_report()
+
+
+def analyze_fast(path: str, capacity: int | None) -> None:
+    analyzer = HTTPTrafficAnalyzer(capacity, verbose=False)
+    analyzer.analyze_pcap(path, fast=True)
+    analyzer.generate_report()
+
+
+def analyze_pipeline(path: str, capacity: int | None, workers: int) -> None:
+    # Очередь размером с запись: замеряется пропускная способность разбора, а не отбрасывание
+    analyzer = HTTPTrafficAnalyzer(capacity, verbose=False)
+    pipeline = CapturePipeline(analyzer.analyze_packet, workers, queue_size=1 << 30).start()
+    # iter_pcap учитывает наносекундные pcap, pcapng и тип канального уровня записи
+    for data, timestamp, linktype in iter_pcap(path):
+        pipeline.enqueue(data, timestamp, conf.l2types.num2layer.get(linktype, Ether))
+    pipeline.stop()
+
+
+def run_benchmark(path: str, packets: int, capacity: int | None, workers: int) -> list:
+    """
+        Returns:
+            list: строки замеров по стадиям
+    """
+    results = []
+    run_stage('read', packets, read_only, results, path)
+    run_stage('offline', packets, analyze_offline, results, path, capacity)
+    run_stage('fast', packets, analyze_fast, results, path, capacity)
+    run_stage('pipeline', packets, analyze_pipeline, results, path, capacity, workers)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк HTTPTrafficAnalyzer на сгенерированных pcap')
+    parser.add_argument('--packets', type=int, nargs='+', default=DEFAULT_SIZES, help='размеры записей')
+    parser.add_argument('--capacity', type=int, default=10_000, help='емкость буферов анализатора')
+    parser.add_argument('--workers', type=int, default=2, help='потоков разбора в режиме конвейера')
+    parser.add_argument('--workdir', default='http_benchmark', help='каталог для pcap')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    print(f"{'стадия':<10} {'пакетов':>10} {'время, с':>10} {'пакетов/с':>12} {'мкс/пакет':>10}")
+    for packets in args.packets:
+        path = os.path.join(args.workdir, f'http_{packets}_{args.seed}.pcap')
+        if not os.path.exists(path):
+            generate_pcap(path, packets, args.seed)
+        for name, count, elapsed, rate, cost in run_benchmark(path, packets, args.capacity, args.workers):
+            print(f"{name:<10} {count:>10,} {elapsed:>10.3f} {rate:>12,.0f} {cost:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+
+from scapy.all import conf
+from scapy.layers.l2 import Ether
+
+from fastPath import POLL_INTERVAL
+
+# Размер очереди между захватом и разбором и количество потоков разбора по умолчанию
+QUEUE_SIZE = 10_000
+WORKERS = 2
+# Метка конца очереди: по одной на обработчик
+STOP = None
+
+
+class CapturePipeline:
+    """
+        Захват отделен от анализа: поток захвата только кладет сырые байты и время пакета
+        в ограниченную очередь, разбор слоев scapy и анализ выполняют потоки-обработчики.
+        Если очередь переполнена, пакет отбрасывается и учитывается в dropped - захват не ждет.
+        Обработчики спят в блокирующем get() и просыпаются только с приходом пакета.
+    """
+
+    def __init__(self, analyze, workers: int = WORKERS, queue_size: int = QUEUE_SIZE):
+        """
+            Args:
+                analyze: функция анализа одного разобранного пакета (например, HTTPTrafficAnalyzer.analyze_packet)
+                workers (int): количество потоков разбора
+                queue_size (int): емкость очереди в пакетах
+        """
+        self.analyze = analyze
+        self.queue_size = queue_size
+        self.queue = queue.Queue(queue_size)
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+        self.errors = 0
+        # Анализатор и его счетчики не потокобезопасны, поэтому сам анализ идет под замком;
+        # разбор байтов в слои scapy (основная работа) - параллельно
+        self._analyze_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._stop_capture = threading.Event()
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        self._capture_thread = None
+        self._socket = None
+
+    def enqueue(self, data: bytes, timestamp: float, layer=Ether) -> None:
+        """
+            Вызывается на потоке захвата: только кладет пакет в очередь
+
+            Args:
+                data (bytes): сырые байты пакета
+                timestamp (float): время захвата
+                layer: класс канального уровня для разбора (Ether, CookedLinux, ...)
+        """
+        self.captured += 1
+        try:
+            self.queue.put_nowait((layer, data, timestamp))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> 'CapturePipeline':
+        """Запускает потоки-обработчики"""
+        for worker in self._workers:
+            worker.start()
+        return self
+
+    def capture(self, bpf_filter: str | None = None, iface=None) -> None:
+        """
+            Живой захват в отдельном потоке через сырой сокет: пакеты не разбираются scapy на потоке захвата
+
+            Args:
+                bpf_filter (str | None): BPF-фильтр
+                iface: интерфейс, None - по умолчанию
+        """
+        self._socket = conf.L2listen(iface=iface, filter=bpf_filter)
+        self._capture_thread = threading.Thread(target=self._capture, daemon=True)
+        self._capture_thread.start()
+
+    def _capture(self) -> None:
+        while not self._stop_capture.is_set():
+            try:
+                # Ожидание с таймаутом, как в RawCapture: stop() срабатывает и без трафика
+                if not self._socket.select([self._socket], POLL_INTERVAL):
+                    continue
+                layer, data, timestamp = self._socket.recv_raw()
+            except OSError:
+                break
+            if data is not None:
+                self.enqueue(data, timestamp or time.time(), layer or Ether)
+
+    def _work(self) -> None:
+        while (item := self.queue.get()) is not STOP:
+            layer, data, timestamp = item
+            try:
+                packet = layer(data)
+                packet.time = timestamp
+                with self._analyze_lock:
+                    self.analyze(packet)
+            except Exception:
+                # Битый пакет не должен останавливать обработчик
+                with self._counter_lock:
+                    self.errors += 1
+            with self._counter_lock:
+                self.processed += 1
+
+    def depth(self) -> int:
+        """Текущая глубина очереди"""
+        return self.queue.qsize()
+
+    def stats(self) -> dict:
+        """Счетчики конвейера: захвачено, отброшено, обработано, ошибок разбора, глубина очереди"""
+        return {
+            'captured': self.captured,
+            'dropped': self.dropped,
+            'processed': self.processed,
+            'errors': self.errors,
+            'queue_depth': self.depth(),
+        }
+
+    def stop(self, drain: bool = True) -> dict:
+        """
+            Останавливает захват и обработчики
+
+            Args:
+                drain (bool): дождаться разбора уже захваченных пакетов
+
+            Returns:
+                dict: итоговые счетчики (stats)
+        """
+        self._stop_capture.set()
+        if self._capture_thread is not None:
+            # Поток захвата замечает остановку не позже чем через POLL_INTERVAL
+            self._capture_thread.join(timeout=2 * POLL_INTERVAL)
+        if self._socket is not None:
+            self._socket.close()
+        if not drain:
+            with self.queue.mutex:
+                self.queue.queue.clear()
+                self.queue.not_full.notify_all()
+        # Метки встают в конец очереди: обработчики завершаются, разобрав все, что было до них
+        for _ in self._workers:
+            self.queue.put(STOP)
+        for worker in self._workers:
+            worker.join()
+        return self.stats()
@@ -0,0 +1,153 @@
+import sys
+from collections import Counter
+
+
+class RingBuffer:
+    """Буфер на capacity последних записей; старые перезаписываются. capacity=None - без ограничения"""
+
+    __slots__ = ('capacity', '_items', '_head', 'evicted')
+
+    def __init__(self, capacity: int | None = None):
+        if capacity is not None and capacity < 1:
+            raise ValueError('capacity должен быть положительным')
+        self.capacity = capacity
+        self._items = []
+        # Индекс самой старой записи, когда буфер заполнен
+        self._head = 0
+        self.evicted = 0
+
+    def append(self, item) -> None:
+        if self.capacity is None or len(self._items) < self.capacity:
+            self._items.append(item)
+            return
+        self._items[self._head] = item
+        self._head = (self._head + 1) % self.capacity
+        self.evicted += 1
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        # От старых к новым
+        yield from self._items[self._head:]
+        yield from self._items[:self._head]
+
+
+# Поля стартовой строки хранятся в записи отдельно и в набор заголовков не входят,
+# иначе набор был бы свой у каждого пути
+START_LINE_FIELDS = frozenset({'Method', 'Path', 'Http_Version', 'Status_Code', 'Reason_Phrase'})
+# Сколько различных наборов заголовков кешировать; дальше новые наборы хранятся без разделения
+MAX_HEADER_SETS = 4096
+
+
+class HeaderTable:
+    """
+        Общая таблица заголовков: одинаковые наборы заголовков хранятся одним кортежем,
+        строки имен и значений интернируются
+    """
+
+    __slots__ = ('_sets', 'max_sets')
+
+    def __init__(self, max_sets: int = MAX_HEADER_SETS):
+        self._sets: dict[tuple, tuple] = {}
+        self.max_sets = max_sets
+
+    def intern(self, fields: dict) -> tuple[tuple[str, str], ...]:
+        """
+            Args:
+                fields (dict): поля HTTP-слоя scapy (значения bytes или None)
+
+            Returns:
+                tuple: ((имя, значение), ...) без пустых полей и стартовой строки, общий для одинаковых наборов
+        """
+        headers = tuple((sys.intern(name), sys.intern(as_text(value)))
+                        for name, value in fields.items()
+                        if value is not None and name not in START_LINE_FIELDS)
+        shared = self._sets.get(headers)
+        if shared is not None:
+            return shared
+        if len(self._sets) < self.max_sets:
+            self._sets[headers] = headers
+        return headers
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+
+def as_text(value) -> str:
+    """Значение поля scapy строкой (bytes декодируются без потерь как latin-1)"""
+    if isinstance(value, bytes):
+        return value.decode('latin-1')
+    return str(value)
+
+
+class RequestRecord:
+    __slots__ = ('timestamp', 'method', 'host', 'path', 'src_ip', 'dst_ip', 'user_agent', 'headers')
+
+    def __init__(self, timestamp, method, host, path, src_ip, dst_ip, user_agent, headers):
+        self.timestamp = timestamp
+        self.method = method
+        self.host = host
+        self.path = path
+        self.src_ip = src_ip
+        self.dst_ip = dst_ip
+        self.user_agent = user_agent
+        self.headers = headers
+
+    def __getitem__(self, key: str):
+        # Доступ как к словарю, как у прежних записей-словарей
+        return getattr(self, key)
+
+
+class ResponseRecord:
+    __slots__ = ('timestamp', 'status_code', 'src_ip', 'dst_ip', 'headers')
+
+    def __init__(self, timestamp, status_code, src_ip, dst_ip, headers):
+        self.timestamp = timestamp
+        self.status_code = status_code
+        self.src_ip = src_ip
+        self.dst_ip = dst_ip
+        self.headers = headers
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+
+class TrafficStore:
+    """
+        Хранилище разобранного HTTP-трафика: последние записи в кольцевых буферах
+        и точные итоги, которые не теряются при вытеснении записей
+    """
+
+    def __init__(self, capacity: int | None = None):
+        """
+            Args:
+                capacity (int | None): сколько последних запросов и ответов хранить, None - все
+        """
+        self.requests = RingBuffer(capacity)
+        self.responses = RingBuffer(capacity)
+        self.headers = HeaderTable()
+        self.total_requests = 0
+        self.total_responses = 0
+        self.methods: Counter = Counter()
+        self.hosts: Counter = Counter()
+        self.status_counts: Counter = Counter()
+
+    def add_request(self, timestamp, method, host, path, src_ip, dst_ip, user_agent, fields) -> RequestRecord:
+        method, host = sys.intern(method), sys.intern(host)
+        record = RequestRecord(timestamp, method, host, path, sys.intern(src_ip), sys.intern(dst_ip),
+                               sys.intern(user_agent), self.headers.intern(fields))
+        self.requests.append(record)
+        self.total_requests += 1
+        self.methods[method] += 1
+        self.hosts[host] += 1
+        return record
+
+    def add_response(self, timestamp, status_code, src_ip, dst_ip, fields) -> ResponseRecord:
+        status_code = sys.intern(status_code)
+        record = ResponseRecord(timestamp, status_code, sys.intern(src_ip), sys.intern(dst_ip),
+                                self.headers.intern(fields))
+        self.responses.append(record)
+        self.total_responses += 1
+        self.status_counts[status_code] += 1
+        return record
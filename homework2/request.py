@@ -1,72 +1,53 @@
-import sys
-
-from scapy.layers.inet import IP, TCP
-from scapy.sendrecv import sr1, send
-from scapy.utils import rdpcap
-import random
-
-
-# Проверяем наличие обязательных аргументов
-if len(sys.argv) < 2:
-    print("Необходимо указать адрес назначения (домен или IP).")
-    exit()
-
-dest = sys.argv[1]
-
-# Обрабатываем возможный пользовательский HTTP-запрос
-try:
-    if sys.argv[2]:
-        getStr = sys.argv[2]
-except IndexError:
-    getStr = 'GET / HTTP/1.1\r\nHost: {}\r\nAccept-Encoding: gzip, deflate\r\n\r\n'.format(dest)
-
-# Определяем максимальное количество запросов
-try:
-    max = int(sys.argv[3])
-except ValueError:
-    print("Максимальное количество запросов должно быть числом!")
-    exit()
-except IndexError:
-    max = 10
-
-counter = 0
-while counter < max:
-    # Отсылаем SYN-пакет
-    syn = IP(dst=dest) / TCP(sport=random.randint(1025, 65500), dport=80, flags='S')
-    # Получаем SYN-ACK
-    syn_ack = sr1(syn, timeout=5)
-    if syn_ack is None:
-        print(f"Нет ответа SYN-ACK от {dest}. Пропускаю итерацию.")
-        continue
-
-    # Отправляем ACK-пакет
-    ack_packet = IP(dst=dest) / TCP(dport=80, sport=syn_ack[TCP].sport, seq=syn_ack[TCP].ack, ack=(syn_ack[TCP].seq + 1), flags='A')
-    send(ack_packet, verbose=False)
-
-    # Отправляем HTTP GET-запрос
-    http_request = IP(dst=dest) / TCP(dport=80, sport=syn_ack[TCP].sport, seq=syn_ack[TCP].ack, ack=(syn_ack[TCP].seq + 1), flags='PA') / getStr
-    response = sr1(http_request, timeout=5)
-    if response:
-        print(response.summary())
-    else:
-        print("Нет ответа после отправки HTTP GET.")
-
-    counter += 1
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+import argparse
+
+from synLoad import BATCH, CONCURRENCY, RST_DROP_RULE, TIMEOUT, SynLoadGenerator
+
+
+def print_histogram(title, histogram):
+    print(f"\n{title}: {len(histogram)} замеров, p50 {histogram.percentile(0.5):.2f} мс, "
+          f"p90 {histogram.percentile(0.9):.2f} мс, p99 {histogram.percentile(0.99):.2f} мс")
+    if not len(histogram):
+        return
+    widest = max(histogram.counts)
+    for label, count in histogram.rows():
+        print(f"  {label:>12} | {'#' * max(round(count / widest * 40), 1 if count else 0):<40} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Нагрузка сервера TCP-рукопожатиями и HTTP-запросами',
+        epilog='Ядро сбрасывает соединения, открытые в обход него, поэтому для отправки запросов '
+               f'нужно отбросить исходящие RST: {RST_DROP_RULE.format(port="<порт>")}')
+    parser.add_argument('dest', help='адрес назначения (домен или IP)')
+    parser.add_argument('request', nargs='?', default=None, help='HTTP-запрос, по умолчанию GET /')
+    parser.add_argument('max', nargs='?', type=int, default=10, help='количество соединений')
+    parser.add_argument('--port', type=int, default=80, help='порт сервера')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='соединений в полете одновременно')
+    parser.add_argument('--batch', type=int, default=BATCH, help='SYN за одну отправку')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help='ожидание ответа, с')
+    parser.add_argument('--handshake-only', action='store_true', help='не отправлять запрос после рукопожатия')
+    args = parser.parse_args()
+
+    # Обрабатываем возможный пользовательский HTTP-запрос
+    request = args.request or 'GET / HTTP/1.1\r\nHost: {}\r\nAccept-Encoding: gzip, deflate\r\n\r\n'.format(args.dest)
+    payload = None if args.handshake_only else request.encode()
+
+    generator = SynLoadGenerator(args.dest, args.port, payload, args.concurrency, args.batch, args.timeout)
+    if payload is not None:
+        print(f"⚠️  Без правила '{RST_DROP_RULE.format(port=args.port)}' ядро сбросит соединения до запроса")
+    if generator.concurrency < args.concurrency:
+        print(f"⚠️  В полете не больше {generator.concurrency} соединений: по числу свободных исходных портов")
+    print(f"🚀 {args.max} соединений к {args.dest}:{args.port} через {generator.iface}, "
+          f"в полете до {generator.concurrency}...")
+    stats = generator.run(args.max)
+
+    print(f"✅ Отправлено SYN: {stats['sent']}, рукопожатий: {stats['handshakes']}, ответов: {stats['responses']}, "
+          f"сбросов: {stats['resets']}, таймаутов: {stats['timeouts']}")
+    print(f"   {stats['connections_per_sec']:.1f} соединений/с за {stats['elapsed']:.2f} с")
+    print_histogram("Задержка SYN -> SYN-ACK", generator.handshake_latency)
+    if payload is not None:
+        print_histogram("Задержка запрос -> ответ", generator.response_latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import os
+
+from scapy.all import sniff
+
+from fastPath import replay
+from flowTable import FlowTable
+from httpBenchmark import generate_pcap, run_stage
+from sniffer import make_fast_handler
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def flows_scapy(path: str) -> None:
+    # Текущий путь: полный разбор каждого пакета scapy и haslayer по слоям
+    table = FlowTable()
+
+    def handler(packet):
+        table.update(packet)
+
+    sniff(offline=path, prn=handler, store=False)
+    table.flush(float('inf'), final=True)
+
+
+def flows_fast(path: str) -> None:
+    table = FlowTable()
+    replay(path, make_fast_handler(table))
+    table.flush(float('inf'), final=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк таблицы потоков sniffer.py: scapy против быстрого пути')
+    parser.add_argument('--packets', type=int, nargs='+', default=DEFAULT_SIZES, help='размеры записей')
+    parser.add_argument('--dns', type=float, default=0.2, help='доля DNS-запросов в записи')
+    parser.add_argument('--workdir', default='http_benchmark', help='каталог для pcap')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    print(f"{'стадия':<10} {'пакетов':>10} {'время, с':>10} {'пакетов/с':>12} {'мкс/пакет':>10}")
+    for packets in args.packets:
+        path = os.path.join(args.workdir, f'mixed_{packets}_{args.seed}_{args.dns}.pcap')
+        if not os.path.exists(path):
+            generate_pcap(path, packets, args.seed, dns=args.dns)
+        results = []
+        run_stage('scapy', packets, flows_scapy, results, path)
+        run_stage('fast', packets, flows_fast, results, path)
+        for name, count, elapsed, rate, cost in results:
+            print(f"{name:<10} {count:>10,} {elapsed:>10.3f} {rate:>12,.0f} {cost:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
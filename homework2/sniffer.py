@@ -1,19 +1,24 @@
 from scapy.all import *
-import socket
+import argparse
 
+from dnsFeatures import DnsFeatureExtractor, ParquetBatchWriter
+from dnsResolver import ReverseResolver
+from fastPath import IPV4_FILTER, PROTO_TCP, PROTO_UDP, RawCapture, is_dns, parse_headers, replay
+from flowTable import FLUSH_INTERVAL, IDLE_TIMEOUT, FlowTable
+
+# Общий резолвер: имена берутся из кеша, промахи разрешаются в фоне и не задерживают захват
+resolver = ReverseResolver()
+
+
+def report_resolved(ip_address, dns_name):
+    """Печатает имя, разрешенное уже после вывода пакета"""
+    if dns_name is not None:
+        print(f"  🔎 {ip_address} -> {dns_name}")
 
-def get_dns_name(ip_address):
-    """Функция для получения DNS-имени по IP-адресу"""
-    try:
-        # Пробуем получить доменное имя
-        dns_name = socket.gethostbyaddr(ip_address)[0]
-        return dns_name
-    except (socket.herror, socket.gaierror):
-        # Если не удалось разрешить имя, возвращаем исходный IP
-        return ip_address
-    except Exception:
-        # На случай других ошибок
-        return ip_address
+
+def cached_dns_name(ip_address):
+    """DNS-имя из кеша или сам IP, пока имя не разрешено"""
+    return resolver.lookup(ip_address, report_resolved) or ip_address
 
 
 def packet_handler(packet):
@@ -25,9 +30,9 @@ def packet_handler(packet):
         ip_dst = packet[IP].dst
         protocol = packet[IP].proto
 
-        # Получаем DNS-имена для source и destination
-        src_dns = get_dns_name(ip_src)
-        dst_dns = get_dns_name(ip_dst)
+        # DNS-имена для source и destination без ожидания: при промахе печатается IP
+        src_dns = cached_dns_name(ip_src)
+        dst_dns = cached_dns_name(ip_dst)
 
         print(f"IP пакет: {ip_src} ({src_dns}) -> {ip_dst} ({dst_dns}) (протокол: {protocol})")
 
@@ -51,10 +56,186 @@ def packet_handler(packet):
         print("-" * 40)
 
 
-# Запускаем перехват на 10 пакетов
-print("🚀 Начинаю перехват трафика...")
+def dns_layer(data, payload):
+    """Разбор scapy только DNS-части кадра (быстрый путь); None, если DNS не разобран"""
+    try:
+        return DNS(bytes(data[payload:]))
+    except Exception:
+        return None
+
+
+def dns_qname(dns):
+    """Имя из первого вопроса DNS или None"""
+    if dns is None or not dns.qd:
+        return None
+    return dns.qd[0].qname.decode('utf-8', errors='replace')
+
+
+def make_fast_handler(table=None, features=None):
+    """
+        Обработчик сырых кадров: поля IP/TCP/UDP берутся прямо из буфера, scapy разбирает только DNS
+
+        Args:
+            table (FlowTable | None): таблица потоков; None - вывод каждого пакета, как packet_handler
+            features (DnsFeatureExtractor | None): извлечение DNS-признаков
+    """
+    def handle(data, timestamp, linktype):
+        headers = parse_headers(data, linktype)
+        if headers is None:
+            return
+        ip_src, ip_dst, protocol, sport, dport, length, payload = headers
+        dns = dns_layer(data, payload) if is_dns(protocol, sport, dport) else None
+        if dns is not None and features is not None:
+            features.add(dns, timestamp)
+
+        if table is not None:
+            table.add(ip_src, ip_dst, protocol, sport, dport, length, timestamp, dns_qname(dns))
+            return
+
+        print(f"IP пакет: {ip_src} ({cached_dns_name(ip_src)}) -> {ip_dst} ({cached_dns_name(ip_dst)}) "
+              f"(протокол: {protocol})")
+        if protocol == PROTO_TCP:
+            print(f"  TCP порты: {sport} -> {dport}")
+        elif protocol == PROTO_UDP:
+            print(f"  UDP порты: {sport} -> {dport}")
+            if dns is not None and dns.qr == 0:
+                print(f"  DNS запрос: {dns_qname(dns) or 'N/A'}")
+        print("-" * 40)
+    return handle
+
+
+def make_feature_writer(writer, label):
+    """
+        Получатель батчей DNS-признаков: дописывает их в parquet-файлы каталога
+
+        Args:
+            writer (ParquetBatchWriter): запись частей
+            label (str): что пишется (для вывода)
+    """
+    def write_batch(batch):
+        path = writer.write(batch)
+        print(f"🧬 DNS-признаки ({label}): {len(batch)} доменов -> {path}")
+    return write_batch
+
+
+def print_resolver_stats():
+    stats = resolver.stats()
+    print(f"🔎 DNS: попаданий {stats['hits']} (неудач из кеша {stats['negative_hits']}), "
+          f"промахов {stats['misses']}, разрешено {stats['resolved']}, не разрешено {stats['failed']}, "
+          f"в ожидании {stats['pending']}")
+    print(f"   Задержка разрешения: средняя {stats['latency_avg_ms']:.1f} мс, "
+          f"максимальная {stats['latency_max_ms']:.1f} мс")
+
+
+def format_flow(flow):
+    """Строка сводки по потоку"""
+    line = (f"  {flow.src}:{flow.sport} -> {flow.dst}:{flow.dport} (протокол: {flow.proto}) "
+            f"пакетов {flow.packets}, байт {flow.bytes}, {flow.duration:.1f} с")
+    if flow.qnames:
+        line += f", DNS: {', '.join(sorted(flow.qnames))}"
+    return line
+
+
+def make_flow_printer(top):
+    """Обработчик выдачи FlowTable: одна сводка на пачку вместо вывода каждого пакета"""
+    def print_flows(finished, table, now):
+        print(f"📊 {time.strftime('%H:%M:%S', time.localtime(now))}: активных потоков {len(table)}, "
+              f"завершено {len(finished)}, всего пакетов {table.packets}, байт {table.bytes}")
+        if finished:
+            print(" Завершенные:")
+            for flow in sorted(finished, key=lambda flow: flow.bytes, reverse=True)[:top]:
+                print(format_flow(flow))
+        active = table.top(top)
+        if active:
+            print(" Активные:")
+            for flow in active:
+                print(format_flow(flow))
+        print("-" * 40)
+    return print_flows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Перехват и разбор трафика')
+    parser.add_argument('--mode', choices=['packets', 'flows'], default='packets',
+                        help='packets - вывод каждого пакета, flows - сводки по потокам')
+    parser.add_argument('--count', type=int, default=0, help='сколько пакетов перехватить, 0 - без ограничения')
+    parser.add_argument('--timeout', type=float, default=None, help='длительность перехвата, с')
+    parser.add_argument('--pcap', help='разобрать pcap-файл вместо живого перехвата')
+    parser.add_argument('--filter', default=None, help='BPF-фильтр')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help='простой, после которого поток завершен, с')
+    parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL, help='период сводок по потокам, с')
+    parser.add_argument('--top', type=int, default=10, help='сколько потоков показывать в сводке')
+    parser.add_argument('--fast', action='store_true',
+                        help='быстрый путь: фильтр BPF в ядре и разбор заголовков из сырых байтов')
+    parser.add_argument('--dns-features', metavar='DIR',
+                        help='каталог итоговых DNS-признаков в схеме dnsAnalyzer.py (домен - одна строка)')
+    parser.add_argument('--dns-updates', metavar='DIR',
+                        help='каталог промежуточных обновлений DNS-признаков '
+                             '(домен повторяется, актуальна последняя строка)')
+    parser.add_argument('--dns-interval', type=float, default=60.0, help='период промежуточных обновлений DNS-признаков, с')
+    args = parser.parse_args()
+
+    table = None
+    if args.mode == 'flows':
+        table = FlowTable(args.idle_timeout, args.flush_interval, on_flush=make_flow_printer(args.top))
+    features = None
+    final_writer = ParquetBatchWriter(args.dns_features) if args.dns_features else None
+    updates_writer = ParquetBatchWriter(args.dns_updates) if args.dns_updates else None
+    if final_writer is not None or updates_writer is not None:
+        features = DnsFeatureExtractor(
+            flush_interval=args.dns_interval,
+            on_batch=make_feature_writer(updates_writer, 'обновления') if updates_writer is not None else None,
+            on_final=make_feature_writer(final_writer, 'итог') if final_writer is not None else None)
+
+    def handler(packet):
+        # sniff печатает возвращенное значение, поэтому из обработчика ничего не возвращается
+        if table is not None:
+            table.update(packet)
+        else:
+            packet_handler(packet)
+        if features is not None:
+            features.update(packet)
+
+    # На тихом канале пакеты не приходят и не запускают выдачу: живой захват дополнительно
+    # проверяет простаивающие потоки по часам
+    stop_sweeper = table.start_sweeper() if table is not None and not args.pcap else None
+
+    print("🚀 Начинаю перехват трафика...")
+    try:
+        if args.fast:
+            fast_handler = make_fast_handler(table, features)
+            if args.pcap:
+                replay(args.pcap, fast_handler, args.count)
+            else:
+                RawCapture(fast_handler, args.filter or IPV4_FILTER).run(args.count, args.timeout)
+        else:
+            sniff_args = {'count': args.count, 'prn': handler, 'store': False, 'filter': args.filter}
+            if args.pcap:
+                sniff_args['offline'] = args.pcap
+            else:
+                sniff_args['timeout'] = args.timeout
+            sniff(**sniff_args)
+    except KeyboardInterrupt:
+        pass
+
+    print("✅ Перехват завершен!")
+    if stop_sweeper is not None:
+        stop_sweeper.set()
+    if features is not None:
+        features.close()
+        for writer in (final_writer, updates_writer):
+            if writer is not None:
+                writer.close()
+                print(f"🧬 {writer.directory}: {writer.rows} строк в {writer.files} файлах")
+    if table is not None:
+        # Итоговая сводка: все оставшиеся потоки считаются завершенными
+        last_seen = max((flow.last_seen for flow in table.flows.values()), default=time.time())
+        table.flush(last_seen, final=True)
+    else:
+        print_resolver_stats()
+    resolver.close()
 
-# Захватываем только 10 пакетов для примера
-sniff(count=10, prn=packet_handler)
 
-print("✅ Перехват завершен!")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
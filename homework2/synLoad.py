@@ -0,0 +1,302 @@
+import math
+import random
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from scapy.all import IP, TCP, L3RawSocket, Raw, conf
+
+from fastPath import DLT_EN10MB, POLL_INTERVAL, TCP_ACK, TCP_RST, TCP_SYN, parse_tcp
+
+# Одновременно незавершенных соединений, SYN за одну отправку, ожидание ответа (с)
+CONCURRENCY = 100
+BATCH = 20
+TIMEOUT = 5.0
+# Пауза основного цикла, когда окно соединений заполнено
+TICK = 0.001
+# Границы корзин гистограммы задержек, мс
+HISTOGRAM_BOUNDS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+# Относительная точность перцентилей: соседние логарифмические корзины отличаются в 1 + 2 * PRECISION раз
+PRECISION = 0.01
+# Единые часы для отправки и приема: время захвата ядра (recv_raw) идет по тем же часам CLOCK_REALTIME
+CLOCK = time.time
+SOURCE_PORTS = (1025, 65500)
+# Буфер приема сниффера, байт
+RECV_BUFFER = 8 * 1024 * 1024
+# Правило, без которого ядро сбрасывает соединения генератора до отправки данных
+RST_DROP_RULE = 'iptables -A OUTPUT -p tcp --tcp-flags RST RST --dport {port} -j DROP'
+
+# Состояния соединения
+SYN_SENT = 'syn_sent'
+DATA_SENT = 'data_sent'
+DONE = 'done'
+TIMED_OUT = 'timeout'
+RESET = 'reset'
+
+
+class Connection:
+    __slots__ = ('sport', 'seq', 'state', 'sent_at', 'synack_at', 'response_at', 'deadline')
+
+    def __init__(self, sport: int, seq: int, sent_at: float, timeout: float):
+        self.sport = sport
+        self.seq = seq
+        self.state = SYN_SENT
+        self.sent_at = sent_at
+        self.synack_at = None
+        self.response_at = None
+        self.deadline = sent_at + timeout
+
+
+class LatencyHistogram:
+    """
+        Гистограмма задержек по фиксированным корзинам и перцентили по логарифмическим корзинам:
+        память ограничена числом корзин, а не количеством замеров, ошибка перцентиля - не больше PRECISION
+    """
+
+    def __init__(self, bounds: list[float] = HISTOGRAM_BOUNDS, precision: float = PRECISION):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self._gamma = (1 + precision) / (1 - precision)
+        self._log_gamma = math.log(self._gamma)
+        # Индекс логарифмической корзины -> количество; нулевые и отрицательные задержки - отдельно
+        self._buckets: dict[int, int] = {}
+        self._zero = 0
+        self.total = 0
+
+    def add(self, latency_ms: float) -> None:
+        self.counts[bisect_left(self.bounds, latency_ms)] += 1
+        self.total += 1
+        if latency_ms <= 0:
+            self._zero += 1
+            return
+        index = math.ceil(math.log(latency_ms) / self._log_gamma)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = min(int(q * self.total), self.total - 1)
+        if rank < self._zero:
+            return 0.0
+        seen = self._zero
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                # Середина корзины (gamma^(i-1), gamma^i] в смысле относительной ошибки
+                return 2 * self._gamma ** index / (self._gamma + 1)
+        return 0.0
+
+    def rows(self) -> list[tuple[str, int]]:
+        """(подпись корзины, количество) без пустых корзин по краям"""
+        labels = [f'<= {bound:g} мс' for bound in self.bounds] + [f'> {self.bounds[-1]:g} мс']
+        used = [i for i, count in enumerate(self.counts) if count]
+        if not used:
+            return []
+        return [(labels[i], self.counts[i]) for i in range(used[0], used[-1] + 1)]
+
+    def __len__(self) -> int:
+        return self.total
+
+
+class SynLoadGenerator:
+    """
+        Нагрузка рукопожатиями TCP: держит до concurrency соединений в полете одновременно.
+
+        SYN отправляются пачками с уникальными исходными портами, один поток-сниффер читает сырые
+        кадры и сопоставляет SYN-ACK с соединением по (порт, seq + 1). После SYN-ACK отправляются ACK
+        и данные запроса; соединение завершается ответом сервера, RST или по таймауту.
+
+        Ядро не знает об этих соединениях и отвечает на SYN-ACK сбросом. Чтобы доходило до данных,
+        исходящие RST нужно отбросить (RST_DROP_RULE). Правило отбрасывает и собственные RST генератора,
+        поэтому сервер в этом режиме освобождает соединения по своим таймаутам.
+        Завершенное соединение (после рукопожатия или ответа) закрывается сегментом RST.
+    """
+
+    def __init__(self, dest: str, dport: int = 80, payload: bytes | None = None, concurrency: int = CONCURRENCY,
+                 batch: int = BATCH, timeout: float = TIMEOUT, iface=None):
+        """
+            Args:
+                dest (str): адрес сервера
+                dport (int): порт сервера
+                payload (bytes | None): данные после рукопожатия (HTTP-запрос), None - только рукопожатие
+                concurrency (int): максимум соединений в полете
+                batch (int): SYN за одну отправку
+                timeout (float): ожидание SYN-ACK и ответа, с
+                iface: интерфейс, по умолчанию - по таблице маршрутизации
+        """
+        self.dest = dest
+        self.dport = dport
+        self.payload = payload
+        self.batch = batch
+        self.timeout = timeout
+        route_iface, self.src, _ = conf.route.route(dest)
+        self.iface = iface or route_iface
+
+        # Таблица соединений в полете: исходный порт -> соединение
+        self.connections: dict[int, Connection] = {}
+        self._lock = threading.Lock()
+        ports = list(range(*SOURCE_PORTS))
+        random.shuffle(ports)
+        # У каждого соединения в полете свой исходный порт: больше, чем портов, не открыть
+        self.concurrency = max(1, min(concurrency, len(ports)))
+        # Свободные исходные порты: берутся справа, освободившиеся возвращаются слева
+        self._ports = deque(ports)
+        self._stop = threading.Event()
+
+        self.sent = 0
+        self.handshakes = 0
+        self.responses = 0
+        self.resets = 0
+        self.timeouts = 0
+        self.handshake_latency = LatencyHistogram()
+        self.response_latency = LatencyHistogram()
+        self.elapsed = 0.0
+
+    def run(self, total: int) -> dict:
+        """
+            Выполняет total соединений
+
+            Args:
+                total (int): сколько соединений открыть
+
+            Returns:
+                dict: итоговые счетчики (stats)
+        """
+        listen = self._open_listen()
+        # Пакеты, отправленные через packet-сокет на loopback, ядро не принимает как входящие
+        if self.iface == conf.loopback_name:
+            sender = L3RawSocket(iface=self.iface)
+        else:
+            sender = conf.L3socket(iface=self.iface)
+        sniffer = threading.Thread(target=self._sniff, args=(listen, sender), daemon=True)
+        sniffer.start()
+        start = CLOCK()
+        try:
+            while self.sent < total or self.connections:
+                self._expire(CLOCK())
+                free = min(self.concurrency - len(self.connections), total - self.sent, self.batch)
+                if free > 0:
+                    self._send_syns(sender, free)
+                else:
+                    time.sleep(TICK)
+        finally:
+            self.elapsed = CLOCK() - start
+            self._stop.set()
+            sniffer.join()
+            listen.close()
+            sender.close()
+        return self.stats()
+
+    def _open_listen(self):
+        bpf_filter = f'tcp and src host {self.dest} and src port {self.dport}'
+        try:
+            listen = conf.L2listen(iface=self.iface, filter=bpf_filter)
+        except Exception:
+            # Без libpcap фильтр не компилируется - отбор делается в _sniff
+            listen = conf.L2listen(iface=self.iface)
+        # Пока поток отправки держит GIL, ответы копятся в буфере сокета: маленький буфер теряет SYN-ACK.
+        # У сокетов libpcap (не Linux) системного сокета ins нет
+        if hasattr(listen, 'ins') and hasattr(listen.ins, 'setsockopt'):
+            listen.ins.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+        return listen
+
+    def _send_syns(self, sender, count: int) -> None:
+        # Пакеты собираются заранее, время отправки ставится непосредственно перед send
+        batch = []
+        with self._lock:
+            for _ in range(count):
+                sport = self._ports.pop()
+                seq = random.getrandbits(32)
+                connection = self.connections[sport] = Connection(sport, seq, CLOCK(), self.timeout)
+                batch.append((connection, IP(dst=self.dest) / TCP(sport=sport, dport=self.dport, seq=seq, flags='S')))
+        for connection, packet in batch:
+            connection.sent_at = CLOCK()
+            connection.deadline = connection.sent_at + self.timeout
+            sender.send(packet)
+        self.sent += count
+
+    def _sniff(self, listen, sender) -> None:
+        while not self._stop.is_set():
+            if not listen.select([listen], POLL_INTERVAL):
+                continue
+            layer, data, timestamp = listen.recv_raw()
+            if data is None:
+                continue
+            fields = parse_tcp(data, conf.l2types.layer2num.get(layer, DLT_EN10MB))
+            if fields is None:
+                continue
+            src, dst, sport, dport, seq, ack, flags, length = fields
+            if src != self.dest or sport != self.dport:
+                continue
+            # Время захвата ядром, если сокет его отдает: задержка не включает очередь сниффера
+            self._handle(sender, dport, seq, ack, flags, length, timestamp or CLOCK())
+
+    def _handle(self, sender, port: int, seq: int, ack: int, flags: int, length: int, now: float) -> None:
+        with self._lock:
+            connection = self.connections.get(port)
+            if connection is None:
+                return
+            if flags & TCP_RST:
+                self.resets += 1
+                self._finish(connection, RESET)
+                return
+            if connection.state == SYN_SENT:
+                if flags & (TCP_SYN | TCP_ACK) != TCP_SYN | TCP_ACK or ack != (connection.seq + 1) & 0xFFFFFFFF:
+                    return
+                connection.synack_at = now
+                self.handshakes += 1
+                self.handshake_latency.add((now - connection.sent_at) * 1000)
+                ack = (seq + 1) & 0xFFFFFFFF
+                if self.payload is None:
+                    self._finish(connection, DONE)
+                    packets = [self._segment(connection, ack, 'R')]
+                else:
+                    connection.state = DATA_SENT
+                    connection.deadline = now + self.timeout
+                    packets = [self._segment(connection, ack, 'A'),
+                               self._segment(connection, ack, 'PA', self.payload)]
+            elif connection.state == DATA_SENT and length:
+                connection.response_at = now
+                self.responses += 1
+                self.response_latency.add((now - connection.synack_at) * 1000)
+                self._finish(connection, DONE)
+                # Ответ получен - соединение сбрасывается, чтобы сервер не держал его до таймаута
+                packets = [self._segment(connection, (seq + length) & 0xFFFFFFFF, 'R', sent=len(self.payload))]
+            else:
+                return
+        for packet in packets:
+            sender.send(packet)
+
+    def _segment(self, connection: Connection, ack: int, flags: str, payload: bytes | None = None, sent: int = 0):
+        # sent - сколько байт данных уже отправлено: на них сдвигается seq
+        packet = IP(dst=self.dest) / TCP(sport=connection.sport, dport=self.dport,
+                                         seq=(connection.seq + 1 + sent) & 0xFFFFFFFF, ack=ack, flags=flags)
+        return packet / Raw(payload) if payload else packet
+
+    def _finish(self, connection: Connection, state: str) -> None:
+        # Вызывается под замком: порт возвращается в пул только после завершения соединения
+        connection.state = state
+        del self.connections[connection.sport]
+        self._ports.appendleft(connection.sport)
+
+    def _expire(self, now: float) -> None:
+        with self._lock:
+            for connection in [c for c in self.connections.values() if c.deadline <= now]:
+                self.timeouts += 1
+                self._finish(connection, TIMED_OUT)
+
+    def stats(self) -> dict:
+        return {
+            'sent': self.sent,
+            'handshakes': self.handshakes,
+            'responses': self.responses,
+            'resets': self.resets,
+            'timeouts': self.timeouts,
+            'in_flight': len(self.connections),
+            'elapsed': self.elapsed,
+            'connections_per_sec': self.handshakes / self.elapsed if self.elapsed else 0.0,
+            'handshake_p50_ms': self.handshake_latency.percentile(0.5),
+            'handshake_p99_ms': self.handshake_latency.percentile(0.99),
+        }
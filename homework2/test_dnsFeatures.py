@@ -0,0 +1,87 @@
+import pandas as pd
+from scapy.layers.dns import DNS, DNSQR, DNSRR
+
+from dnsFeatures import DnsFeatureExtractor, ParquetBatchWriter
+
+START = 1_700_000_000.0
+DOMAINS = 50
+PACKETS = 6000
+
+
+def feed(extractor: DnsFeatureExtractor) -> None:
+    # Запрос и ответ по кругу по DOMAINS доменам, пакет раз в 0.1 с
+    for i in range(PACKETS // 2):
+        name = f'www.dom{i % DOMAINS}.com'
+        timestamp = START + i * 0.2
+        extractor.add(DNS(qr=0, qd=DNSQR(qname=name)), timestamp)
+        extractor.add(DNS(qr=1, qd=DNSQR(qname=name), an=DNSRR(rrname=name, ttl=60 + i % 3)), timestamp + 0.1)
+
+
+def read(directory) -> pd.DataFrame:
+    return pd.read_parquet(str(directory))
+
+
+def test_final_directory_has_one_row_per_domain(tmp_path):
+    final, updates = ParquetBatchWriter(str(tmp_path / 'final')), ParquetBatchWriter(str(tmp_path / 'updates'))
+    extractor = DnsFeatureExtractor(flush_interval=10, on_batch=updates.write, on_final=final.write)
+    feed(extractor)
+    expected = extractor.snapshot()
+    extractor.close()
+    final.close()
+    updates.close()
+
+    result = read(tmp_path / 'final')
+    assert len(result) == result['rr'].nunique() == DOMAINS
+    assert int(result['queries'].sum()) == PACKETS // 2
+    pd.testing.assert_frame_equal(result.sort_values('rr').reset_index(drop=True),
+                                  expected.sort_values('rr').reset_index(drop=True))
+    # Промежуточные обновления повторяют домены - это отдельный каталог
+    assert updates.rows > DOMAINS
+    # Батчи дописываются в один файл, а не файлом на выдачу
+    assert final.files == updates.files == 1
+    assert not extractor.domains
+
+
+def test_evicted_domains_are_emitted_once(tmp_path):
+    final = ParquetBatchWriter(str(tmp_path / 'final'))
+    extractor = DnsFeatureExtractor(flush_interval=10, max_domains=DOMAINS // 2, on_final=final.write)
+    for i in range(DOMAINS):
+        extractor.add(DNS(qr=0, qd=DNSQR(qname=f'dom{i}.com')), START + i)
+    extractor.close()
+    final.close()
+
+    result = read(tmp_path / 'final')
+    assert extractor.evicted == DOMAINS - DOMAINS // 2
+    assert sorted(result['rr']) == sorted(f'dom{i}.com' for i in range(DOMAINS))
+
+
+def test_readmitted_domains_continue_their_state(tmp_path):
+    # Домены идут по кругу, памяти хватает на половину: каждый домен вытесняется и возвращается
+    final, updates = ParquetBatchWriter(str(tmp_path / 'final')), ParquetBatchWriter(str(tmp_path / 'updates'))
+    bounded = DnsFeatureExtractor(flush_interval=10, max_domains=DOMAINS // 2, on_batch=updates.write,
+                                  on_final=final.write)
+    unbounded = DnsFeatureExtractor(flush_interval=10)
+    feed(bounded)
+    feed(unbounded)
+    bounded.close()
+    final.close()
+    updates.close()
+
+    result = read(tmp_path / 'final').sort_values('rr').reset_index(drop=True)
+    assert bounded.restored > 0
+    assert len(result) == result['rr'].nunique() == DOMAINS
+    pd.testing.assert_frame_equal(result, unbounded.close().sort_values('rr').reset_index(drop=True))
+    assert final.files == updates.files == 1
+    # Последнее обновление каждого домена совпадает с итогом
+    latest = read(tmp_path / 'updates').drop_duplicates('rr', keep='last').sort_values('rr').reset_index(drop=True)
+    pd.testing.assert_frame_equal(latest, result)
+
+
+def test_writer_rolls_files(tmp_path):
+    writer = ParquetBatchWriter(str(tmp_path), roll_rows=DOMAINS)
+    extractor = DnsFeatureExtractor(flush_interval=10, on_batch=writer.write)
+    feed(extractor)
+    extractor.close()
+    writer.close()
+    assert writer.files > 1
+    assert len(read(tmp_path)) == writer.rows
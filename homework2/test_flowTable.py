@@ -0,0 +1,33 @@
+import threading
+
+from flowTable import FlowTable
+
+START = 1_700_000_000.0
+
+
+def test_sweep_emits_idle_flows_without_packets():
+    emitted = []
+    table = FlowTable(idle_timeout=5, flush_interval=1, on_flush=lambda finished, table, now: emitted.extend(finished))
+    table.add('10.0.0.1', '10.0.0.2', 6, 40000, 80, 60, START)
+    table.add('10.0.0.1', '10.0.0.2', 6, 40000, 80, 60, START + 0.5)
+
+    assert table.sweep(START + 0.9) is None
+    assert table.sweep(START + 2) == []
+    # Пакетов больше нет: поток завершается только проверкой по часам
+    finished = table.sweep(START + 6)
+    assert [flow.packets for flow in finished] == [2]
+    assert len(table) == 0
+    assert emitted == finished
+
+
+def test_sweeper_thread_uses_clock():
+    done = threading.Event()
+    table = FlowTable(idle_timeout=5, flush_interval=0.05,
+                      on_flush=lambda finished, table, now: finished and done.set())
+    table.add('10.0.0.1', '10.0.0.2', 17, 5353, 53, 80, START)
+    stop = table.start_sweeper(clock=lambda: START + 10)
+    try:
+        assert done.wait(2)
+    finally:
+        stop.set()
+    assert table.expired == 1
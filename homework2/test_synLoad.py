@@ -0,0 +1,76 @@
+import os
+import random
+import socket
+
+import pytest
+from scapy.all import TCP
+
+from fastPath import TCP_ACK, TCP_SYN
+from synLoad import DONE, LatencyHistogram, SynLoadGenerator
+
+
+class RecordingSender:
+    def __init__(self):
+        self.packets = []
+
+    def send(self, packet):
+        self.packets.append(packet)
+
+
+def test_histogram_percentiles_are_bounded_and_accurate():
+    random.seed(1)
+    values = [random.lognormvariate(1, 1) for _ in range(50_000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.add(value)
+    ordered = sorted(values)
+    assert len(histogram) == len(values)
+    assert sum(histogram.counts) == len(values)
+    assert len(histogram._buckets) < 1000
+    for q in (0.5, 0.9, 0.99):
+        exact = ordered[int(q * len(ordered))]
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.011)
+
+
+def test_answered_connection_is_reset():
+    payload = b'GET / HTTP/1.1\r\nHost: test\r\n\r\n'
+    generator = SynLoadGenerator('127.0.0.1', 8080, payload=payload, concurrency=1)
+    sender = RecordingSender()
+    generator._send_syns(sender, 1)
+    (syn,) = sender.packets
+    connection = generator.connections[syn[TCP].sport]
+
+    server_seq = 1000
+    sent_at = connection.sent_at
+    generator._handle(sender, connection.sport, server_seq, connection.seq + 1, TCP_SYN | TCP_ACK, 0, sent_at + 0.002)
+    ack, request = sender.packets[1:]
+    assert str(ack[TCP].flags) == 'A' and bytes(request[TCP].payload) == payload
+
+    generator._handle(sender, connection.sport, server_seq + 1, connection.seq + 1 + len(payload), TCP_ACK, 100,
+                      sent_at + 0.005)
+    reset = sender.packets[-1][TCP]
+    assert str(reset.flags) == 'R'
+    assert reset.seq == (connection.seq + 1 + len(payload)) & 0xFFFFFFFF
+    assert reset.ack == server_seq + 1 + 100
+    assert connection.state == DONE and not generator.connections
+    assert generator.stats()['responses'] == 1
+    assert generator.handshake_latency.percentile(0.5) == pytest.approx(2, rel=0.02)
+    assert generator.response_latency.percentile(0.5) == pytest.approx(3, rel=0.02)
+
+
+@pytest.mark.skipif(not hasattr(os, 'geteuid') or os.geteuid() != 0, reason='нужны сырые сокеты (root)')
+def test_handshakes_over_loopback():
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    # Рукопожатия завершает ядро, accept не нужен
+    server.listen(128)
+    try:
+        generator = SynLoadGenerator('127.0.0.1', server.getsockname()[1], concurrency=10, batch=5, timeout=2)
+        stats = generator.run(20)
+    finally:
+        server.close()
+    assert stats['sent'] == 20
+    assert stats['handshakes'] == 20
+    assert stats['in_flight'] == 0
+    assert len(generator.handshake_latency) == 20
+    assert 0 < stats['handshake_p50_ms'] < 2000
@@ -0,0 +1,212 @@
+import json
+import re
+from collections import Counter
+from itertools import islice
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from signatureIndex import SignatureIndex
+from signatureSketch import SpaceSaving
+from signatureTimeseries import SignatureTimeSeries, parse_timestamps
+
+# Сколько символов дочитывать за раз
+CHUNK_SIZE = 1 << 20
+# Событий в одном батче агрегации
+BATCH_SIZE = 10_000
+
+_WHITESPACE = ' \t\r\n'
+
+PLOT_TITLE = 'Распределение типов событий информационной безопасности'
+
+
+def iter_events(path: str, key: str = 'events', chunk_size: int = CHUNK_SIZE):
+    """
+        Потоково читает массив событий из JSON вида {"events": [{...}, ...]} и отдает их по одному.
+        В памяти держится только текущий кусок файла и одно событие.
+
+        Args:
+            path (str): путь к файлу
+            key (str): ключ массива событий
+            chunk_size (int): сколько символов дочитывать за раз
+    """
+    decoder = json.JSONDecoder()
+    marker = json.dumps(key)
+    with open(path, 'r', encoding='utf-8') as f:
+        start = re.compile(re.escape(marker) + r'\s*:\s*\[')
+        buffer = ''
+        # Ищем начало массива: "events" : [
+        while (found := start.search(buffer)) is None:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError(f'{path}: массив "{key}" не найден')
+            # Остается хвост, в котором может начинаться ключ: целый ключ, за которым пока
+            # только пробелы и ':', или последние символы, если ключ разрезан между кусками
+            tail = buffer.rfind(marker)
+            if tail < 0 or buffer[tail + len(marker):].strip(_WHITESPACE + ':'):
+                tail = max(len(buffer) - len(marker), 0)
+            buffer = buffer[tail:] + chunk
+        buffer, pos = buffer[found.end():], 0
+
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE + ',':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError('', buffer, pos)
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Событие не поместилось в буфер целиком
+                if eof:
+                    raise ValueError(f'{path}: неожиданный конец файла')
+                chunk = f.read(max(chunk_size, len(buffer) - pos))
+                buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                continue
+            yield item
+            pos = end
+
+
+def iter_event_batches(path: str, batch_size: int = BATCH_SIZE, chunk_size: int = CHUNK_SIZE):
+    """Те же события списками по batch_size"""
+    events = iter_events(path, chunk_size=chunk_size)
+    while batch := list(islice(events, batch_size)):
+        yield batch
+
+
+def flat_columns(event: dict, prefix: str = ''):
+    """Имена столбцов события, как у pd.json_normalize: вложенные ключи через точку"""
+    for key, value in event.items():
+        if isinstance(value, dict) and value:
+            yield from flat_columns(value, f'{prefix}{key}.')
+        else:
+            yield f'{prefix}{key}'
+
+
+class SignatureAggregator:
+    """
+        Счетчики событий по сигнатурам и по часам.
+        Точный режим держит все различные сигнатуры, режим top_k - только скетч Space-Saving емкости O(k).
+    """
+
+    def __init__(self, top_k: int | None = None, eps: float | None = None, rollup: bool | None = None,
+                 timeseries: bool | None = None):
+        """
+            Args:
+                top_k (int | None): приближенный ТОП-K вместо точного счета всех сигнатур
+                eps (float | None): допустимая ошибка счета в режиме top_k, доля от количества событий
+                rollup (bool | None): вести индекс свертки по категориям/семействам;
+                    None - только в точном режиме (индекс хранит все различные сигнатуры)
+                timeseries (bool | None): вести матрицу сигнатуры x часы для поиска всплесков;
+                    None - только в точном режиме
+        """
+        self.total = 0
+        self.signatures: Counter = Counter()
+        self.sketch = SpaceSaving(top_k, eps) if top_k is not None else None
+        rollup = top_k is None if rollup is None else rollup
+        self.index = SignatureIndex() if rollup else None
+        timeseries = top_k is None if timeseries is None else timeseries
+        self.timeseries = SignatureTimeSeries() if timeseries else None
+        self.hours: Counter = Counter()
+        # События без времени или с нераспознанным временем: в почасовые счетчики не попадают
+        self.dropped_timestamps = 0
+        # Столбцы в порядке первого появления (dict - упорядоченное множество)
+        self._columns: dict[str, None] = {}
+
+    def update(self, batch: list[dict]) -> None:
+        """
+            Добавляет батч событий
+
+            Args:
+                batch (list[dict]): события с полями signature и timestamp
+        """
+        self.total += len(batch)
+        for event in batch:
+            self._columns.update(dict.fromkeys(flat_columns(event)))
+        # Повторы внутри батча схлопываются один раз для всех потребителей
+        signatures = Counter(event.get('signature') for event in batch)
+        signatures.pop(None, None)
+        if self.sketch is not None:
+            for signature, count in signatures.items():
+                self.sketch.add(signature, count)
+        else:
+            self.signatures.update(signatures)
+        if self.index is not None:
+            self.index.update(signatures)
+        # Время разбирается один раз на батч для почасовых счетчиков и матрицы всплесков;
+        # битые значения не роняют батч, а учитываются в dropped_timestamps
+        times = parse_timestamps([event.get('timestamp') for event in batch])
+        valid = ~np.isnat(times)
+        self.dropped_timestamps += len(batch) - int(valid.sum())
+        if self.timeseries is not None:
+            names = np.array([event.get('signature') for event in batch], dtype=object)
+            keep = valid & np.array([name is not None for name in names], dtype=bool)
+            self.timeseries.add(names[keep], times[keep])
+        values, counts = np.unique(times[valid].astype('datetime64[h]'), return_counts=True)
+        self.hours.update(dict(zip(values.tolist(), counts.tolist())))
+
+    def merge(self, other: 'SignatureAggregator') -> 'SignatureAggregator':
+        """Вливает агрегат другого файла"""
+        self.total += other.total
+        self.signatures.update(other.signatures)
+        if self.sketch is not None:
+            self.sketch.merge(other.sketch)
+        if self.index is not None:
+            self.index.merge(other.index)
+        if self.timeseries is not None:
+            self.timeseries.merge(other.timeseries)
+        self.hours.update(other.hours)
+        self.dropped_timestamps += other.dropped_timestamps
+        self._columns.update(other._columns)
+        return self
+
+    def columns(self) -> pd.Index:
+        """Доступные столбцы событий - те же, что дал бы pd.json_normalize по всему файлу"""
+        return pd.Index(list(self._columns))
+
+    def has_signatures(self) -> bool:
+        """True, если встретилась хотя бы одна сигнатура"""
+        return bool(self.sketch.counters if self.sketch is not None else self.signatures)
+
+    def signature_distribution(self) -> pd.Series:
+        """Распределение по сигнатурам по убыванию (как value_counts); в режиме top_k - верхние оценки ТОПа"""
+        if self.sketch is not None:
+            return self.sketch.top()['count'].rename('count')
+        return pd.Series(dict(self.signatures.most_common()), name='count', dtype='int64').rename_axis('signature')
+
+    def hourly_distribution(self) -> pd.Series:
+        """Количество событий по часам в хронологическом порядке"""
+        return pd.Series(dict(sorted(self.hours.items())), name='count', dtype='int64').rename_axis('hour')
+
+
+def aggregate_file(path: str, batch_size: int = BATCH_SIZE, top_k: int | None = None,
+                   eps: float | None = None) -> SignatureAggregator:
+    """Один проход по файлу событий (top_k, eps - см. SignatureAggregator)"""
+    aggregator = SignatureAggregator(top_k, eps)
+    for batch in iter_event_batches(path, batch_size):
+        aggregator.update(batch)
+    return aggregator
+
+
+def plot_distribution(distribution: pd.Series, title: str = PLOT_TITLE, show: bool = True):
+    """
+        Горизонтальная диаграмма по уже посчитанному распределению, без повторного подсчета
+
+        Args:
+            distribution (pd.Series): сигнатура -> количество, по убыванию
+            title (str): заголовок
+            show (bool): показать окно
+    """
+    fig, ax = plt.subplots(figsize=(12, 6))
+    # Самая частая сигнатура сверху, как у countplot с order=value_counts().index
+    ax.barh(distribution.index[::-1], distribution.to_numpy()[::-1])
+    ax.set_title(title)
+    ax.set_xlabel('Количество событий')
+    ax.set_ylabel('Тип события')
+    fig.tight_layout()
+    if show:
+        plt.show()
+    return fig
@@ -1,28 +1,41 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from eventAggregator import aggregate_file, plot_distribution
 
 # Этап 1: Подготовка данных
 file_path = 'events.json'  # Укажите путь к файлу events.json
-with open(file_path, 'r') as f:
-    data = pd.json_normalize(pd.read_json(f)['events'])
+# Для потоков с длинным хвостом сигнатур: приближенный ТОП-K в памяти O(K), None - точный счет
+top_k = None
+top_k_error = 0.001  # допустимая ошибка счета, доля от количества событий
+# Потоковое чтение: события не собираются в DataFrame, считаются агрегаты
+aggregator = aggregate_file(file_path, top_k=top_k, eps=top_k_error if top_k else None)
 
 # Проверка доступных столбцов
-print("Доступные столбцы:", data.columns)
+print("Доступные столбцы:", aggregator.columns())
 
 # Этап 2: Анализ данных
-if 'signature' in data.columns:
-    signature_distribution = data['signature'].value_counts()
+if aggregator.has_signatures():
+    signature_distribution = aggregator.signature_distribution()
     print("Распределение типов событий:")
-    print(signature_distribution)
+    if aggregator.sketch is not None:
+        print(f"(ТОП-{top_k}, ошибка счета не больше {aggregator.sketch.error_bound():.0f} событий)")
+        print(aggregator.sketch.top())
+    else:
+        print(signature_distribution)
+    if aggregator.index is not None:
+        # Свертки по уровням уже посчитаны в индексе, переключение уровня ничего не пересчитывает
+        for level in ('category', 'subcategory', 'family'):
+            print(f"Распределение по уровню {level}:")
+            print(aggregator.index.rollup(level))
+    print("Событий по часам:")
+    print(aggregator.hourly_distribution())
+    if aggregator.dropped_timestamps:
+        print(f"Без времени или с нераспознанным временем: {aggregator.dropped_timestamps} событий")
+    if aggregator.timeseries is not None:
+        spikes = aggregator.timeseries.spikes()
+        print("Всплески частоты сигнатур (z-оценка по скользящему окну):")
+        print(spikes if len(spikes) else "не обнаружено")
 else:
-    print("Столбец 'signature' не найден в DataFrame.")
+    print("Поле 'signature' не найдено в событиях.")
 
-# Визуализация данных
-if 'signature' in data.columns:
-    plt.figure(figsize=(12, 6))
-    sns.countplot(y='signature', data=data, order=data['signature'].value_counts().index)
-    plt.title('Распределение типов событий информационной безопасности')
-    plt.xlabel('Количество событий')
-    plt.ylabel('Тип события')
-    plt.show()
+# Визуализация данных: по тому же распределению, без повторного подсчета
+if aggregator.has_signatures():
+    plot_distribution(signature_distribution)
@@ -0,0 +1,95 @@
+from collections import Counter
+
+import pandas as pd
+
+# Уровни свертки: "MALWARE-CNC Win.Trojan.Jadtre variant ..." -> MALWARE / CNC / Win.Trojan.Jadtre / вся строка
+LEVELS = ('category', 'subcategory', 'family', 'signature')
+# Пустой уровень в ключе свертки: без заполнителя "a//c" и "a/c" склеились бы в одну строку
+EMPTY_LEVEL = '∅'
+
+
+def parse_signature(signature: str) -> tuple[str, str, str, str]:
+    """
+        Раскладывает сигнатуру в стиле Snort "CATEGORY-SUBCATEGORY Описание" по уровням.
+        Семейство - первое слово описания; без подкатегории ("EXPLOIT ...") подкатегория пустая.
+
+        Args:
+            signature (str): строка сигнатуры
+
+        Returns:
+            tuple[str, str, str, str]: категория, подкатегория, семейство, сигнатура
+    """
+    head, _, description = signature.strip().partition(' ')
+    category, _, subcategory = head.partition('-')
+    family = description.split(' ', 1)[0] if description else ''
+    return category, subcategory, family, signature
+
+
+class SignatureIndex:
+    """
+        Префиксное дерево сигнатур с количествами на каждом узле.
+        Каждая уникальная сигнатура разбирается один раз; свертки всех уровней поддерживаются
+        при добавлении, поэтому переключение уровня - чтение готового словаря.
+    """
+
+    def __init__(self):
+        self._paths: dict[str, tuple[str, ...]] = {}
+        # Количество для каждого префикса пути: (категория,), (категория, подкатегория), ...
+        self.counts: Counter = Counter()
+        # Префикс -> дочерние узлы (в порядке появления) для спуска по дереву
+        self.children: dict[tuple[str, ...], dict[str, None]] = {(): {}}
+        self.total = 0
+
+    def path(self, signature: str) -> tuple[str, ...]:
+        """Путь сигнатуры по уровням (разбор кешируется)"""
+        path = self._paths.get(signature)
+        if path is None:
+            path = self._paths[signature] = parse_signature(signature)
+            for depth in range(len(path)):
+                self.children.setdefault(path[:depth], {}).setdefault(path[depth])
+        return path
+
+    def add(self, signature: str, count: int = 1) -> None:
+        """Учитывает count событий сигнатуры на всех уровнях"""
+        path = self.path(signature)
+        self.total += count
+        for depth in range(1, len(path) + 1):
+            self.counts[path[:depth]] += count
+
+    def update(self, counts) -> None:
+        """
+            Добавляет уже посчитанные количества (например, Counter батча)
+
+            Args:
+                counts: отображение сигнатура -> количество
+        """
+        for signature, count in counts.items():
+            self.add(signature, count)
+
+    def merge(self, other: 'SignatureIndex') -> 'SignatureIndex':
+        """Вливает индекс другого файла"""
+        for signature in other._paths:
+            self.add(signature, other.counts[other._paths[signature]])
+        return self
+
+    def rollup(self, level: str = 'category', prefix: tuple[str, ...] = ()) -> pd.Series:
+        """
+            Количества на уровне level, по убыванию
+
+            Args:
+                level (str): один из LEVELS
+                prefix (tuple[str, ...]): ограничить поддеревом, например ('MALWARE',)
+
+            Returns:
+                pd.Series: путь до уровня (через '/', пустой уровень - EMPTY_LEVEL) -> количество
+        """
+        depth = LEVELS.index(level) + 1
+        if len(prefix) >= depth:
+            raise ValueError(f'Префикс {prefix} глубже уровня {level}')
+
+        nodes = [prefix]
+        for _ in range(depth - len(prefix)):
+            nodes = [(*node, child) for node in nodes for child in self.children.get(node, ())]
+        counts = {'/'.join(part or EMPTY_LEVEL for part in node): self.counts[node] for node in nodes}
+        return (pd.Series(counts, name='count', dtype='int64').rename_axis(level)
+                .sort_values(ascending=False, kind='stable'))
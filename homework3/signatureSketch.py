@@ -0,0 +1,127 @@
+import heapq
+import math
+from collections import Counter
+
+import pandas as pd
+
+
+class SpaceSaving:
+    """
+        Приближенный ТОП-K по частоте (алгоритм Space-Saving) в памяти O(capacity).
+
+        Для каждой отслеживаемой сигнатуры хранится оценка count и ошибка error:
+        count - error <= истинное количество <= count, а error <= total / capacity.
+        Любая сигнатура с частотой больше total / capacity гарантированно попадает в скетч.
+    """
+
+    def __init__(self, k: int = 10, eps: float | None = None):
+        """
+            Args:
+                k (int): сколько самых частых сигнатур нужно
+                eps (float | None): допустимая ошибка счета, доля от количества событий;
+                    емкость скетча - max(k, 1 / eps)
+        """
+        if k < 1:
+            raise ValueError('k должен быть положительным')
+        if eps is not None and not 0 < eps < 1:
+            raise ValueError('eps должен быть в интервале (0, 1)')
+
+        self.k = k
+        self.capacity = max(k, math.ceil(1 / eps)) if eps is not None else k
+        self.total = 0
+        # сигнатура -> [оценка количества, ошибка]
+        self.counters: dict[str, list[int]] = {}
+        # Минимальный счетчик ищется по куче с ленивым обновлением: счетчики только растут,
+        # поэтому устаревшая запись просто перекладывается с актуальным значением
+        self._heap: list[tuple[int, str]] = []
+
+    def update(self, items) -> None:
+        """
+            Добавляет батч значений; повторы внутри батча сначала схлопываются
+
+            Args:
+                items: итерируемое сигнатур (None пропускаются)
+        """
+        for item, weight in Counter(item for item in items if item is not None).items():
+            self.add(item, weight)
+
+    def add(self, item: str, weight: int = 1) -> None:
+        """Учитывает item с весом weight"""
+        self.total += weight
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+            heapq.heappush(self._heap, (weight, item))
+        else:
+            # Новая сигнатура вытесняет минимальную и наследует ее счетчик как ошибку
+            minimum, evicted = self._pop_min()
+            del self.counters[evicted]
+            self.counters[item] = [minimum + weight, minimum]
+            heapq.heappush(self._heap, (minimum + weight, item))
+
+    def _pop_min(self) -> tuple[int, str]:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            counter = self.counters.get(item)
+            if counter is None:
+                continue
+            if counter[0] == count:
+                return count, item
+            heapq.heappush(self._heap, (counter[0], item))
+
+    def min_count(self) -> int:
+        """Верхняя граница количества для любой сигнатуры, которой нет в скетче"""
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        """
+            Вливает скетч другого файла или шарда; ошибка остается в пределах total / capacity
+
+            Args:
+                other (SpaceSaving): скетч той же емкости или больше
+
+            Returns:
+                SpaceSaving: self
+        """
+        own_min, other_min = self.min_count(), other.min_count()
+        merged = {}
+        for item in self.counters.keys() | other.counters.keys():
+            # Если в одном из скетчей сигнатуры нет, она могла встретиться там не больше min_count раз
+            count, error = self.counters.get(item, (own_min, own_min))
+            other_count, other_error = other.counters.get(item, (other_min, other_min))
+            merged[item] = [count + other_count, error + other_error]
+
+        kept = heapq.nlargest(self.capacity, merged.items(), key=lambda entry: (entry[1][0], entry[0]))
+        self.total += other.total
+        self.counters = dict(kept)
+        self._heap = [(counter[0], item) for item, counter in kept]
+        heapq.heapify(self._heap)
+        return self
+
+    def error_bound(self) -> float:
+        """Гарантированная максимальная ошибка счета любой сигнатуры"""
+        return self.total / self.capacity
+
+    def top(self, n: int | None = None) -> pd.DataFrame:
+        """
+            ТОП сигнатур по оценке количества
+
+            Args:
+                n (int | None): сколько строк, None - k
+
+            Returns:
+                pd.DataFrame: signature, count (верхняя оценка), error, lower (нижняя оценка),
+                    guaranteed (точно входит в ТОП: нижняя оценка не меньше верхней у следующей)
+        """
+        n = self.k if n is None else n
+        ranked = sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))
+        rows = [(item, count, error, count - error) for item, (count, error) in ranked]
+        frame = pd.DataFrame(rows[:n], columns=['signature', 'count', 'error', 'lower'])
+        # Следующая за ТОПом сигнатура (в скетче или вне его) не может быть больше этой границы
+        next_count = rows[n][1] if len(rows) > n else self.min_count()
+        frame['guaranteed'] = frame['lower'] >= next_count
+        return frame.set_index('signature')
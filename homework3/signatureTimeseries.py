@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+# Окно скользящей статистики (в интервалах) и порог z-оценки всплеска
+WINDOW = 24
+Z_THRESHOLD = 3.0
+# Всплеском не считается интервал, в котором событий меньше этого
+MIN_COUNT = 3
+# Пока истории меньше стольких интервалов, всплески не ищутся
+MIN_HISTORY = 6
+# Стандартное отклонение снизу ограничено: на редких сигнатурах оно почти нулевое
+MIN_STD = 1.0
+# Столбец первого события у сигнатуры без событий
+NO_COLUMN = np.iinfo(np.int64).max
+
+
+def parse_timestamps(values) -> np.ndarray:
+    """
+        Время событий одним векторным разбором; время с поясом приводится к UTC
+
+        Args:
+            values: строки ISO 8601 (None, пустые и нераспознанные значения дают NaT)
+
+        Returns:
+            np.ndarray: datetime64[ns], NaT на месте отсутствующих и битых значений
+    """
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', format='ISO8601', utc=True)
+    return parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+
+class SignatureTimeSeries:
+    """
+        Плотная матрица количества событий: строки - сигнатуры, столбцы - интервалы времени.
+
+        Скользящие среднее и стандартное отклонение по предыдущим window интервалам считаются
+        через накопленные суммы по времени. Окно сигнатуры начинается не раньше ее первого
+        события: интервалы до него (в том числе дописанные в начало запоздавшими данными)
+        не занижают среднее. Новые события помечают «грязным» только столбец, в который попали,
+        и пересчитывается лишь хвост матрицы от самого раннего такого столбца.
+    """
+
+    def __init__(self, interval: str = 'h', window: int = WINDOW, threshold: float = Z_THRESHOLD,
+                 min_count: int = MIN_COUNT):
+        """
+            Args:
+                interval (str): единица numpy datetime64 для интервала ('h' - час, 'm' - минута, 'D' - сутки)
+                window (int): сколько предыдущих интервалов входит в скользящую статистику
+                threshold (float): z-оценка, начиная с которой интервал - всплеск
+                min_count (int): минимум событий в интервале для всплеска
+        """
+        self.interval = interval
+        self.unit = f'datetime64[{interval}]'
+        self.window = window
+        self.threshold = threshold
+        self.min_count = min_count
+
+        self.rows: dict[str, int] = {}
+        self.signatures: list[str] = []
+        self.start = None
+        self.length = 0
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        # Столбец первого события каждой сигнатуры (NO_COLUMN - событий еще не было)
+        self.first = np.zeros(0, dtype=np.int64)
+        # Накопленные по времени суммы количеств и квадратов: cum[:, c] - сумма столбцов 0..c-1
+        self._cum = np.zeros((0, 0), dtype=np.float64)
+        self._cum_sq = np.zeros((0, 0), dtype=np.float64)
+        self.z = np.zeros((0, 0), dtype=np.float64)
+        # Столбцы начиная с этого требуют пересчета статистик
+        self._dirty = 0
+
+    def update(self, batch: list[dict]) -> None:
+        """
+            Добавляет батч событий
+
+            Args:
+                batch (list[dict]): события с полями signature и timestamp
+        """
+        events = [event for event in batch if event.get('signature') is not None]
+        times = parse_timestamps([event.get('timestamp') for event in events])
+        valid = ~np.isnat(times)
+        self.add(np.array([event['signature'] for event in events], dtype=object)[valid], times[valid])
+
+    def add(self, signatures: np.ndarray, times: np.ndarray) -> None:
+        """
+            Добавляет уже разобранные события (время разбирается один раз выше по конвейеру)
+
+            Args:
+                signatures (np.ndarray): сигнатуры (object)
+                times (np.ndarray): время событий datetime64 без NaT
+        """
+        if not len(signatures):
+            return
+        times = times.astype(self.unit)
+
+        # Разбор строк сигнатур - один раз на уникальное значение батча
+        unique, inverse = np.unique(signatures, return_inverse=True)
+        rows = np.array([self._row(signature) for signature in unique], dtype=np.int64)[inverse]
+
+        first, last = times.min(), times.max()
+        if self.start is None:
+            self.start = first
+        if first < self.start:
+            self._prepend(int((self.start - first).astype(np.int64)))
+        columns = (times - self.start).astype(np.int64)
+        self._ensure(len(self.signatures), int(columns.max()) + 1)
+        self.length = max(self.length, int((last - self.start).astype(np.int64)) + 1)
+
+        np.add.at(self.counts, (rows, columns), 1)
+        np.minimum.at(self.first, rows, columns)
+        self._dirty = min(self._dirty, int(columns.min()))
+
+    def merge(self, other: 'SignatureTimeSeries') -> 'SignatureTimeSeries':
+        """Вливает матрицу другого файла (с тем же интервалом); статистики пересчитываются с ее начала"""
+        if other.start is None:
+            return self
+        if self.start is None:
+            self.start = other.start
+        if other.start < self.start:
+            self._prepend(int((self.start - other.start).astype(np.int64)))
+        offset = int((other.start - self.start).astype(np.int64))
+        rows = np.array([self._row(signature) for signature in other.signatures], dtype=np.int64)
+        self._ensure(len(self.signatures), offset + other.length)
+        self.length = max(self.length, offset + other.length)
+        self.counts[rows, offset:offset + other.length] += other.counts[:len(rows), :other.length]
+        first = other.first[:len(rows)]
+        observed = first != NO_COLUMN
+        self.first[rows[observed]] = np.minimum(self.first[rows[observed]], first[observed] + offset)
+        self._dirty = min(self._dirty, offset)
+        return self
+
+    def _row(self, signature: str) -> int:
+        row = self.rows.get(signature)
+        if row is None:
+            row = self.rows[signature] = len(self.signatures)
+            self.signatures.append(signature)
+        return row
+
+    def _ensure(self, rows: int, columns: int) -> None:
+        # Емкость растет вдвое, чтобы добавление часа не копировало всю историю
+        height, width = self.counts.shape
+        if rows <= height and columns <= width:
+            return
+        new_height = max(rows, height * 2 if rows > height else height, 1)
+        new_width = max(columns, width * 2 if columns > width else width, 1)
+        # У новых строк вся история нулевая, поэтому и их накопленные суммы верны без пересчета
+        self.counts = self._grow(self.counts, new_height, new_width)
+        self.first = np.concatenate([self.first, np.full(new_height - height, NO_COLUMN, dtype=np.int64)])
+        self._cum = self._grow(self._cum, new_height, new_width + 1)
+        self._cum_sq = self._grow(self._cum_sq, new_height, new_width + 1)
+        self.z = self._grow(self.z, new_height, new_width)
+
+    @staticmethod
+    def _grow(array: np.ndarray, height: int, width: int) -> np.ndarray:
+        grown = np.zeros((height, width), dtype=array.dtype)
+        grown[:array.shape[0], :array.shape[1]] = array
+        return grown
+
+    def _prepend(self, shift: int) -> None:
+        # События раньше начала матрицы (редко: запоздавшие данные) - сдвиг всей истории
+        height, width = self.counts.shape
+        counts = np.zeros((height, width + shift), dtype=np.int64)
+        counts[:, shift:] = self.counts
+        self.counts = counts
+        self.first[self.first != NO_COLUMN] += shift
+        self._cum = np.zeros((height, width + shift + 1), dtype=np.float64)
+        self._cum_sq = np.zeros_like(self._cum)
+        self.z = np.zeros((height, width + shift), dtype=np.float64)
+        self.start = self.start - np.timedelta64(shift, self.interval)
+        self.length += shift
+        self._dirty = 0
+
+    def _refresh(self) -> None:
+        # Пересчет только столбцов от первого измененного до конца
+        start, end = self._dirty, self.length
+        if start >= end:
+            return
+        height = len(self.signatures)
+        counts = self.counts[:height, start:end].astype(np.float64)
+        self._cum[:height, start + 1:end + 1] = self._cum[:height, start:start + 1] + np.cumsum(counts, axis=1)
+        self._cum_sq[:height, start + 1:end + 1] = (self._cum_sq[:height, start:start + 1]
+                                                     + np.cumsum(counts ** 2, axis=1))
+
+        # Статистика столбца c - по столбцам [max(c - window, первое событие), c), без самого c
+        columns = np.arange(start, end)
+        first = np.minimum(self.first[:height, None], end)
+        lower = np.minimum(np.maximum(columns - self.window, first), columns)
+        history = columns - lower
+        size = np.maximum(history, 1)
+        total = self._cum[:height, columns] - np.take_along_axis(self._cum[:height], lower, axis=1)
+        total_sq = self._cum_sq[:height, columns] - np.take_along_axis(self._cum_sq[:height], lower, axis=1)
+        mean = total / size
+        std = np.sqrt(np.maximum(total_sq / size - mean ** 2, 0))
+        z = (counts - mean) / np.maximum(std, MIN_STD)
+        # На короткой истории сигнатуры статистика ненадежна, всплеск не определяется
+        z[history < MIN_HISTORY] = 0
+        self.z[:height, start:end] = z
+        self._dirty = end
+
+    def index(self) -> pd.DatetimeIndex:
+        """Начала интервалов"""
+        if self.start is None:
+            return pd.DatetimeIndex([])
+        return pd.DatetimeIndex(self.start + np.arange(self.length))
+
+    def matrix(self) -> pd.DataFrame:
+        """Количества: сигнатуры x интервалы"""
+        return pd.DataFrame(self.counts[:len(self.signatures), :self.length],
+                            index=pd.Index(self.signatures, name='signature'), columns=self.index())
+
+    def spikes(self) -> pd.DataFrame:
+        """
+            Интервалы со всплеском частоты сигнатуры
+
+            Returns:
+                pd.DataFrame: signature, time, count, z - по времени
+        """
+        self._refresh()
+        height = len(self.signatures)
+        counts = self.counts[:height, :self.length]
+        z = self.z[:height, :self.length]
+        rows, columns = np.nonzero((z >= self.threshold) & (counts >= self.min_count))
+        order = np.lexsort((rows, columns))
+        rows, columns = rows[order], columns[order]
+        return pd.DataFrame({
+            'signature': [self.signatures[row] for row in rows],
+            'time': self.index()[columns],
+            'count': counts[rows, columns],
+            'z': z[rows, columns],
+        })
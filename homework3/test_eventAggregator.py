@@ -0,0 +1,104 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from eventAggregator import SignatureAggregator, aggregate_file, iter_events
+
+SIGNATURES = ['MALWARE-CNC Win.Trojan.Jadtre variant', 'EXPLOIT Java JRE RCE', 'NETBIOS DCERPC BO',
+              'POLICY-OTHER Tor traffic']
+
+
+def make_events(rows: int = 500, seed: int = 0) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2023-08-21T00:00:00')
+    events = []
+    for i in range(rows):
+        event = {'timestamp': str(start + np.timedelta64(int(rng.integers(0, 72 * 3600)), 's')),
+                 'signature': SIGNATURES[int(rng.zipf(2)) % len(SIGNATURES)]}
+        if i % 50 == 0:
+            event['src'] = {'ip': f'10.0.0.{i % 7}', 'port': 1000 + i}
+        events.append(event)
+    # Битое, отсутствующее и пустое время, событие без сигнатуры
+    events[3]['timestamp'] = 'not-a-date'
+    events[7]['timestamp'] = '2023-13-45T00:00:00'
+    del events[11]['timestamp']
+    events[13]['timestamp'] = ''
+    del events[17]['signature']
+    return events
+
+
+@pytest.fixture
+def events_file(tmp_path):
+    events = make_events()
+    path = tmp_path / 'events.json'
+    path.write_text(json.dumps({'meta': {'events': 'не массив'}, 'events': events}, indent=2), encoding='utf-8')
+    return str(path), events
+
+
+def test_iter_events_independent_of_chunk_size(events_file):
+    path, events = events_file
+    assert list(iter_events(path, chunk_size=7)) == events
+    assert list(iter_events(path)) == events
+
+
+def test_aggregation_matches_pandas(events_file):
+    path, events = events_file
+    aggregator = aggregate_file(path, batch_size=64)
+    frame = pd.json_normalize(events)
+
+    assert aggregator.total == len(events)
+    assert aggregator.columns().tolist() == frame.columns.tolist()
+    expected = frame['signature'].value_counts()
+    pd.testing.assert_series_equal(aggregator.signature_distribution().sort_index(), expected.sort_index(),
+                                   check_names=False)
+
+    times = pd.to_datetime(frame['timestamp'], errors='coerce', format='ISO8601')
+    assert aggregator.dropped_timestamps == int(times.isna().sum()) == 4
+    hourly = times.dropna().dt.floor('h').value_counts().sort_index()
+    assert aggregator.hourly_distribution().to_dict() == {hour.to_pydatetime(): count
+                                                          for hour, count in hourly.items()}
+
+
+def test_timestamps_are_parsed_once_per_batch(events_file, monkeypatch):
+    import eventAggregator
+
+    path, _ = events_file
+    calls = []
+    original = eventAggregator.parse_timestamps
+
+    def counting(values):
+        calls.append(len(values))
+        return original(values)
+
+    monkeypatch.setattr(eventAggregator, 'parse_timestamps', counting)
+    aggregator = aggregate_file(path, batch_size=100)
+    assert aggregator.timeseries is not None
+    assert calls == [100] * 5
+
+
+def test_merge_equals_single_pass(events_file):
+    path, events = events_file
+    whole = aggregate_file(path, batch_size=64)
+    left, right = SignatureAggregator(), SignatureAggregator()
+    left.update(events[:200])
+    right.update(events[200:])
+    merged = left.merge(right)
+
+    assert merged.total == whole.total
+    assert merged.dropped_timestamps == whole.dropped_timestamps
+    pd.testing.assert_series_equal(merged.signature_distribution().sort_index(),
+                                   whole.signature_distribution().sort_index())
+    pd.testing.assert_series_equal(merged.hourly_distribution(), whole.hourly_distribution())
+    pd.testing.assert_frame_equal(merged.timeseries.matrix().sort_index(), whole.timeseries.matrix().sort_index())
+    assert merged.index.rollup('category').to_dict() == whole.index.rollup('category').to_dict()
+
+
+def test_top_k_mode_keeps_only_sketch(events_file):
+    path, events = events_file
+    aggregator = aggregate_file(path, batch_size=64, top_k=2, eps=0.25)
+    assert aggregator.index is None and aggregator.timeseries is None and not aggregator.signatures
+    top = aggregator.signature_distribution()
+    expected = pd.json_normalize(events)['signature'].value_counts()
+    assert top.index.tolist() == expected.index[:2].tolist()
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from signatureIndex import EMPTY_LEVEL, SignatureIndex, parse_signature
+
+SIGNATURES = {
+    'MALWARE-CNC Win.Trojan.Jadtre variant outbound connection': 5,
+    'MALWARE-CNC Win.Trojan.Zeus outbound': 2,
+    'MALWARE-OTHER Win.Trojan.Jadtre download': 1,
+    'EXPLOIT Foo overflow attempt': 3,
+    'EXPLOIT-Foo generic': 4,
+}
+
+
+def build(signatures=SIGNATURES) -> SignatureIndex:
+    index = SignatureIndex()
+    index.update(signatures)
+    return index
+
+
+def test_parse_signature_levels():
+    assert parse_signature('MALWARE-CNC Win.Trojan.Jadtre variant') == \
+        ('MALWARE', 'CNC', 'Win.Trojan.Jadtre', 'MALWARE-CNC Win.Trojan.Jadtre variant')
+    assert parse_signature('EXPLOIT Foo overflow')[:3] == ('EXPLOIT', '', 'Foo')
+
+
+def test_rollup_counts_every_level():
+    index = build()
+    assert index.total == sum(SIGNATURES.values())
+    assert index.rollup('category').to_dict() == {'MALWARE': 8, 'EXPLOIT': 7}
+    assert index.rollup('subcategory', ('MALWARE',)).to_dict() == {'MALWARE/CNC': 7, 'MALWARE/OTHER': 1}
+    assert int(index.rollup('signature').sum()) == index.total
+    with pytest.raises(ValueError):
+        index.rollup('category', ('MALWARE',))
+
+
+def test_empty_level_keeps_its_place_in_key():
+    # "EXPLOIT Foo ..." (без подкатегории, семейство Foo) и "EXPLOIT-Foo ..." (подкатегория Foo)
+    # раньше давали один ключ EXPLOIT/Foo
+    index = build()
+    assert index.rollup('subcategory').to_dict() == {'MALWARE/CNC': 7, f'EXPLOIT/{EMPTY_LEVEL}': 3,
+                                                      'EXPLOIT/Foo': 4, 'MALWARE/OTHER': 1}
+    family = index.rollup('family')
+    assert family.index.is_unique
+    assert family[f'EXPLOIT/{EMPTY_LEVEL}/Foo'] == 3
+    assert family['EXPLOIT/Foo/generic'] == 4
+
+
+def test_merge_equals_single_index():
+    items = list(SIGNATURES.items())
+    left, right = build(dict(items[:2])), build(dict(items[2:]))
+    merged = left.merge(right)
+    expected = build()
+    assert merged.total == expected.total
+    for level in ('category', 'subcategory', 'family', 'signature'):
+        pd.testing.assert_series_equal(merged.rollup(level).sort_index(), expected.rollup(level).sort_index())
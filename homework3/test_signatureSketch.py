@@ -0,0 +1,62 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from signatureSketch import SpaceSaving
+
+
+def zipf_stream(rows: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    return [f'sig-{value}' for value in rng.zipf(1.5, rows)]
+
+
+def check_bounds(sketch: SpaceSaving, truth: Counter) -> None:
+    total = sum(truth.values())
+    assert sketch.total == total
+    for item, (count, error) in sketch.counters.items():
+        assert count - error <= truth[item] <= count
+        assert error <= sketch.error_bound()
+    # Все сигнатуры чаще total / capacity обязаны быть в скетче
+    for item, count in truth.items():
+        if count > total / sketch.capacity:
+            assert item in sketch.counters
+        if item not in sketch.counters:
+            assert count <= sketch.min_count()
+
+
+def test_exact_while_capacity_suffices():
+    sketch = SpaceSaving(k=10)
+    items = ['a'] * 5 + ['b'] * 3 + ['c']
+    sketch.update(items)
+    top = sketch.top()
+    assert top['count'].to_dict() == {'a': 5, 'b': 3, 'c': 1}
+    assert (top['error'] == 0).all() and top['guaranteed'].all()
+
+
+def test_error_bounds_on_long_tail():
+    stream = zipf_stream(20_000)
+    sketch = SpaceSaving(k=5, eps=0.01)
+    for start in range(0, len(stream), 1000):
+        sketch.update(stream[start:start + 1000])
+    truth = Counter(stream)
+    check_bounds(sketch, truth)
+    top = sketch.top()
+    exact = [item for item, _ in truth.most_common(5)]
+    # Гарантированные позиции ТОПа совпадают с точным ТОПом
+    guaranteed = top.index[top['guaranteed']].tolist()
+    assert guaranteed == exact[:len(guaranteed)] and guaranteed
+
+
+def test_merge_keeps_bounds():
+    left_stream, right_stream = zipf_stream(10_000, seed=1), zipf_stream(10_000, seed=2)
+    left, right = SpaceSaving(k=5, eps=0.01), SpaceSaving(k=5, eps=0.01)
+    left.update(left_stream)
+    right.update(right_stream)
+    check_bounds(left.merge(right), Counter(left_stream + right_stream))
+
+
+@pytest.mark.parametrize('k, eps', [(0, None), (5, 0), (5, 1.5)])
+def test_invalid_parameters(k, eps):
+    with pytest.raises(ValueError):
+        SpaceSaving(k, eps)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from signatureTimeseries import SignatureTimeSeries, parse_timestamps
+
+START = np.datetime64('2023-08-21T00:00')
+NOISY = 'MALWARE-CNC Win.Trojan.Jadtre'
+QUIET = 'EXPLOIT Java JRE RCE'
+
+
+def event(signature: str, hour: int, minute: int = 0) -> dict:
+    return {'signature': signature, 'timestamp': str(START + np.timedelta64(hour * 60 + minute, 'm'))}
+
+
+def make_events() -> list[dict]:
+    # Ровный фон NOISY по 2 события в час, всплеск в час 40; QUIET появляется только с часа 30
+    events = [event(NOISY, hour, minute) for hour in range(48) for minute in (5, 35)]
+    events += [event(NOISY, 40, minute) for minute in range(1, 21)]
+    events += [event(QUIET, hour) for hour in range(30, 48)]
+    return events
+
+
+def build(batches) -> SignatureTimeSeries:
+    series = SignatureTimeSeries()
+    for batch in batches:
+        series.update(batch)
+    return series
+
+
+def test_parse_timestamps_coerces_bad_values():
+    times = parse_timestamps(['2023-08-21T10:15:00', 'oops', None, '', '2023-08-21T12:00:00+02:00'])
+    assert times.dtype == np.dtype('datetime64[ns]')
+    assert np.isnat(times).tolist() == [False, True, True, True, False]
+    assert times[-1] == np.datetime64('2023-08-21T10:00')
+
+
+def test_spike_detected_and_quiet_start_ignored():
+    series = build([make_events()])
+    spikes = series.spikes()
+    assert spikes['signature'].tolist() == [NOISY]
+    assert spikes['time'].tolist() == [pd.Timestamp(START + np.timedelta64(40, 'h'))]
+    assert spikes['count'].tolist() == [22]
+    # Окно QUIET начинается с его первого события: нули до часа 30 не делают фон всплеском
+    assert series.matrix().loc[QUIET].sum() == 18
+
+
+def test_late_arriving_data_matches_in_order():
+    events = make_events()
+    in_order = build([sorted(events, key=lambda item: item['timestamp'])])
+
+    # Сначала поздние часы, потом запоздавшие ранние: матрица сдвигается, статистики пересчитываются
+    late = [item for item in events if item['timestamp'] >= str(START + np.timedelta64(24, 'h'))]
+    early = [item for item in events if item['timestamp'] < str(START + np.timedelta64(24, 'h'))]
+    series = SignatureTimeSeries()
+    series.update(late)
+    before = series.spikes()
+    series.update(early)
+
+    assert len(before) <= 1
+    pd.testing.assert_frame_equal(series.matrix().sort_index(), in_order.matrix().sort_index())
+    pd.testing.assert_frame_equal(series.spikes(), in_order.spikes())
+
+
+def test_merge_equals_single_series():
+    events = make_events()
+    whole = build([events])
+    left, right = build([events[::2]]), build([events[1::2]])
+    merged = left.merge(right)
+    pd.testing.assert_frame_equal(merged.matrix().sort_index(), whole.matrix().sort_index())
+    pd.testing.assert_frame_equal(merged.spikes(), whole.spikes())
+
+
+def test_events_without_time_are_skipped():
+    series = build([[event(NOISY, 0), {'signature': NOISY, 'timestamp': 'bad'}, {'signature': NOISY}]])
+    assert int(series.matrix().to_numpy().sum()) == 1
@@ -1,269 +1,744 @@
-import pandas as pd
-import numpy as np
+import argparse
+import os
 import warnings
 
-warnings.filterwarnings('ignore')
+import numpy as np
+import pandas as pd
 
-# 1. Загрузка данных
-print("📥 Загрузка данных...")
-df = pd.read_parquet('dns.parquet')
-print(f"✅ Данные загружены: {df.shape[0]} строк, {df.shape[1]} столбцов")
-print(f"✅ Метка класса: 'GlobalClass' (скорее всего: normal/malicious)")
+from dnsQuantiles import DEFAULT_EPS, QuantileSketch, sketch_batches, thresholds_from_sketches
+from dnsRules import RULES_PATH, CompiledRules, RuleSet, load_rules
+from dnsSink import FULL_DATASET, SUSPICIOUS_DATASET, ParquetResultSink, reset_output
 
-# 2. Посмотрим распределение классов
-if 'GlobalClass' in df.columns:
-    print("\n🎯 РАСПРЕДЕЛЕНИЕ КЛАССОВ:")
-    class_dist = df['GlobalClass'].value_counts()
-    for class_name, count in class_dist.items():
-        percentage = (count / len(df)) * 100
-        print(f"   {class_name}: {count:,} записей ({percentage:.1f}%)")
+warnings.filterwarnings('ignore')
 
-# 3. Анализ подозрительных признаков
-print("\n" + "=" * 60)
-print("🔎 ПОИСК ПОДОЗРИТЕЛЬНЫХ ПАТТЕРНОВ")
-print("=" * 60)
+DATA_PATH = 'dns.parquet'
+SUSPICIOUS_CSV = 'suspicious_dns_records.csv'
+FULL_CSV = 'full_dns_analysis.csv'
+PLOT_PATH = 'dns_features_analysis.png'
 
-# Создадим копию для анализа
-analysis_df = df.copy()
+# Размер батча при потоковом чтении parquet
+BATCH_SIZE = 65_536
+TOP_N = 10
 
-# 3.1. Аномалии в частотах запросов
-print("\n📊 АНОМАЛИИ В ЧАСТОТАХ ЗАПРОСОВ:")
+LABEL_COL = 'GlobalClass'
+DOMAIN_COL = 'rr'
 
 # Подозрительные частоты (слишком высокие/низкие)
-suspicious_freq_features = {
+SUSPICIOUS_FREQ_FEATURES = {
     'NULL_frequency': 'NULL-запросы (редкие, могут быть подозрительными)',
     'TXT_frequency': 'TXT-запросы (используются для данных, возможна эксфильтрация)',
     'OPT_frequency': 'OPT-запросы (EDNS, могут использоваться для атак)'
 }
+ENTROPY_COLS = ['entropy', 'rr_name_entropy']
+LEN_COLS = ['len', 'rr_name_length']
+TTL_COLS = ['unique_ttl', 'ttl_mean', 'ttl_variance']
+GEO_COLS = ['unique_country', 'unique_asn']
 
-for feature, description in suspicious_freq_features.items():
-    if feature in analysis_df.columns:
-        high_threshold = analysis_df[feature].quantile(0.95)  # верхние 5%
-        suspicious = analysis_df[analysis_df[feature] > high_threshold]
-        if len(suspicious) > 0:
-            print(f"   • {description}: {len(suspicious):,} записей с высокой частотой")
-            if 'GlobalClass' in analysis_df.columns:
-                if 'malicious' in analysis_df['GlobalClass'].values:
-                    malicious_in_susp = suspicious[suspicious['GlobalClass'] == 'malicious']
-                    print(f"     Среди них malicious: {len(malicious_in_susp):,}")
-
-# 3.2. Аномалии в энтропии
-print("\n🔐 АНОМАЛИИ В ЭНТРОПИИ:")
-entropy_cols = ['entropy', 'rr_name_entropy']
-for col in entropy_cols:
-    if col in analysis_df.columns:
-        high_entropy = analysis_df[col].quantile(0.95)
-        low_entropy = analysis_df[col].quantile(0.05)
-
-        high_susp = analysis_df[analysis_df[col] > high_entropy]
-        low_susp = analysis_df[analysis_df[col] < low_entropy]
+# Гистограммы графиков: диапазон берется из первого прохода, счетчики копятся при скоринге
+HIST_COLS = ['len', 'NULL_frequency', 'TXT_frequency']
+HIST_BINS = 50
+
+# Колонки, которые реально читают эвристики (проекция при потоковом чтении)
+ANALYSIS_COLUMNS = [*SUSPICIOUS_FREQ_FEATURES, *ENTROPY_COLS, *LEN_COLS, *TTL_COLS, *GEO_COLS,
+                    LABEL_COL, DOMAIN_COL]
+
+
+# ================================================= Загрузка =================================================
+
+def parquet_schema(path: str) -> tuple[int, list[str]]:
+    """
+        Возвращает количество строк и список колонок parquet-файла, не читая данные
+
+        Args:
+            path (str): путь к parquet-файлу
+    """
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(path).metadata
+    return metadata.num_rows, list(metadata.schema.to_arrow_schema().names)
+
+
+def iter_parquet_batches(path: str, columns: list[str] | None = None, batch_size: int = BATCH_SIZE):
+    """
+        Читает parquet-файл по row group'ам батчами, загружая только нужные колонки
+
+        Args:
+            path (str): путь к parquet-файлу
+            columns (list[str] | None): проекция колонок, None - все колонки
+            batch_size (int): максимальное количество строк в батче
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield record_batch.to_pandas()
+
+
+def project_columns(columns: list[str]) -> list[str]:
+    """Оставляет из ANALYSIS_COLUMNS только те, что есть в данных"""
+    return [col for col in ANALYSIS_COLUMNS if col in columns]
+
+
+class DnsDataset:
+    """Источник данных для стадий анализа: parquet-файл целиком в памяти или батчами"""
+
+    def __init__(self, path: str, stream: bool = False, batch_size: int = BATCH_SIZE):
+        """
+            Args:
+                path (str): путь к parquet-файлу
+                stream (bool): читать батчами, не загружая файл целиком
+                batch_size (int): строк в батче (для stream)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        if stream:
+            self.frame = None
+            self.num_rows, self.all_columns = parquet_schema(path)
+            self.columns = project_columns(self.all_columns)
+        else:
+            # Баллы дописываются прямо в загруженный DataFrame, без полной копии
+            self.frame = pd.read_parquet(path)
+            self.num_rows, self.all_columns = self.frame.shape[0], list(self.frame.columns)
+            self.columns = self.all_columns
+
+    def batches(self, projected: bool = True):
+        """
+            Новый проход по данным
+
+            Args:
+                projected (bool): только колонки эвристик; False - все колонки (для сохранения)
+        """
+        if self.frame is not None:
+            return [self.frame]
+        return iter_parquet_batches(self.path, self.columns if projected else None, self.batch_size)
+
+
+def load_dataset(path: str = DATA_PATH, stream: bool = False, batch_size: int = BATCH_SIZE) -> DnsDataset:
+    """Стадия загрузки: в потоковом режиме читаются только метаданные"""
+    return DnsDataset(path, stream, batch_size)
+
+
+# ================================================= Пороги =================================================
+
+def threshold_plan(columns: list[str], rules: RuleSet) -> dict[str, set[float]]:
+    """
+        Какие квантили каких колонок нужны отчету и баллу подозрительности
+
+        Args:
+            columns (list[str]): колонки датасета
+            rules (RuleSet): таблица правил балла
+
+        Returns:
+            dict[str, set[float]]: колонка -> набор квантилей
+    """
+    plan = rules.threshold_plan(columns)
+
+    def need(col, *quantiles):
+        if col in columns:
+            plan.setdefault(col, set()).update(quantiles)
+
+    for feature in SUSPICIOUS_FREQ_FEATURES:
+        need(feature, 0.95)
+    for col in ENTROPY_COLS:
+        need(col, 0.95, 0.05)
+    len_col = length_column(columns)
+    if len_col:
+        need(len_col, 0.95)
+    need('ttl_variance', 0.95)
+    for col in GEO_COLS:
+        need(col, 0.95)
+    # Минимум и максимум для границ гистограмм
+    for col in HIST_COLS:
+        need(col, 0.0, 1.0)
+    return plan
+
+
+def length_column(columns: list[str]) -> str | None:
+    """Колонка с длиной имени: 'len' или 'rr_name_length'"""
+    for col in LEN_COLS:
+        if col in columns:
+            return col
+    return None
+
+
+def compute_thresholds(batches, plan: dict[str, set[float]],
+                       eps: float = DEFAULT_EPS) -> dict[str, dict[float, float]]:
+    """
+        Первый проход: по скетчу квантилей на колонку, затем все пороги считаются один раз.
+        До dnsQuantiles.EXACT_LIMIT строк пороги точные и не зависят от размера батчей,
+        дальше память ограничена размером KLL-скетчей, а не количеством строк.
+
+        Args:
+            batches: итератор DataFrame'ов
+            plan (dict[str, set[float]]): результат threshold_plan
+            eps (float): допустимая ошибка ранга квантилей; 0 - только точные квантили
+
+        Returns:
+            dict[str, dict[float, float]]: колонка -> {квантиль: значение}
+    """
+    return thresholds_from_sketches(sketch_batches(batches, plan, eps), plan)
+
+
+def threshold_dataset(dataset: DnsDataset, rules: RuleSet,
+                      eps: float = DEFAULT_EPS) -> dict[str, dict[float, float]]:
+    """Стадия порогов: один проход по колонкам из плана; таблица в памяти всегда дает точные пороги"""
+    if dataset.frame is not None:
+        eps = 0
+    return compute_thresholds(dataset.batches(), threshold_plan(dataset.columns, rules), eps)
+
+
+# ================================================= Скоринг =================================================
+
+def histogram_edges(low: float, high: float) -> np.ndarray:
+    """Границы HIST_BINS корзин, как у np.histogram: вырожденный диапазон расширяется на ±0.5"""
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, HIST_BINS + 1)
+
+
+class AnalysisStats:
+    """Накопитель статистик отчета, обновляется батч за батчем"""
+
+    def __init__(self, columns: list[str], thresholds: dict[str, dict[float, float]], rules: CompiledRules,
+                 top_n: int = TOP_N, row_offset: int = 0):
+        """
+            Args:
+                columns (list[str]): колонки датасета
+                thresholds (dict): пороги из compute_thresholds
+                rules (CompiledRules): скомпилированные правила балла
+                top_n (int): сколько самых подозрительных записей хранить
+                row_offset (int): номер первой строки в датасете (для партиций)
+        """
+        self.columns = columns
+        self.thresholds = thresholds
+        self.rules = rules
+        self.top_n = top_n
+        self.len_col = length_column(columns)
+        self.has_label = LABEL_COL in columns
+
+        self.total = 0
+        self.class_counts = pd.Series(dtype=np.int64)
+        self.freq_counts = {feature: [0, 0] for feature in SUSPICIOUS_FREQ_FEATURES if feature in columns}
+        self.entropy_counts = {col: [0, 0] for col in ENTROPY_COLS if col in columns}
+        self.very_long = 0
+        self.long_names = 0
+        self.low_ttl = 0
+        self.high_ttl_variance = 0
+        self.geo_counts = {col: 0 for col in GEO_COLS if col in columns}
+        self.score_counts = pd.Series(dtype=np.int64)
+        self.suspicious_count = 0
+        self.confusion_matrix = None
+        self.malicious_total = 0
+        self.detected_malicious = 0
+        self.top = None
+
+        # Агрегаты для графиков: гистограммы с общими границами и скетчи энтропии по группам
+        self.hist_edges = {col: histogram_edges(thresholds[col][0.0], thresholds[col][1.0])
+                           for col in HIST_COLS if col in columns and np.isfinite(thresholds[col][0.0])}
+        self.histograms = {col: np.zeros(HIST_BINS, dtype=np.int64) for col in self.hist_edges}
+        self.entropy_sketches = {False: QuantileSketch(), True: QuantileSketch()} if 'entropy' in columns else {}
+        self.row_offset = row_offset
+
+    def update(self, batch: pd.DataFrame) -> None:
+        """
+            Добавляет батч с посчитанным баллом в статистику
+
+            Args:
+                batch (pd.DataFrame): батч с колонками suspicion_score, reason_mask и is_suspicious
+        """
+        t = self.thresholds
+        score = batch['suspicion_score'].to_numpy()
+        is_suspicious = batch['is_suspicious'].to_numpy()
+        offset = self.row_offset + self.total
+        self.total += len(batch)
+
+        is_malicious = None
+        if self.has_label:
+            labels = batch[LABEL_COL]
+            self.class_counts = self.class_counts.add(labels.value_counts(), fill_value=0)
+            is_malicious = (labels == 'malicious').to_numpy()
+            crosstab = pd.crosstab(labels, pd.Series(is_suspicious, index=batch.index, name='is_suspicious'))
+            self.confusion_matrix = crosstab if self.confusion_matrix is None \
+                else self.confusion_matrix.add(crosstab, fill_value=0)
+            self.malicious_total += int(is_malicious.sum())
+            self.detected_malicious += int((is_malicious & is_suspicious).sum())
+
+        for feature, counts in self.freq_counts.items():
+            high = (batch[feature] > t[feature][0.95]).to_numpy()
+            counts[0] += int(high.sum())
+            if is_malicious is not None:
+                counts[1] += int((high & is_malicious).sum())
+
+        for col, counts in self.entropy_counts.items():
+            counts[0] += int((batch[col] > t[col][0.95]).sum())
+            counts[1] += int((batch[col] < t[col][0.05]).sum())
+
+        if self.len_col:
+            self.very_long += int((batch[self.len_col] > 63).sum())  # RFC ограничение
+            self.long_names += int((batch[self.len_col] > t[self.len_col][0.95]).sum())
+
+        if 'unique_ttl' in batch.columns:
+            self.low_ttl += int((batch['unique_ttl'] < 10).sum())  # Меньше 10 секунд
+        if 'ttl_variance' in batch.columns:
+            self.high_ttl_variance += int((batch['ttl_variance'] > t['ttl_variance'][0.95]).sum())
+
+        for col in self.geo_counts:
+            self.geo_counts[col] += int((batch[col] > t[col][0.95]).sum())
+
+        self.score_counts = self.score_counts.add(pd.Series(score).value_counts(), fill_value=0)
+        self.suspicious_count += int(is_suspicious.sum())
+        self._update_top(batch, score, offset)
+
+        for col, edges in self.hist_edges.items():
+            values = batch[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.histograms[col] += np.histogram(values[~np.isnan(values)], bins=edges)[0]
+        if self.entropy_sketches:
+            entropy = batch['entropy'].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.entropy_sketches[False].update(entropy[~is_suspicious])
+            self.entropy_sketches[True].update(entropy[is_suspicious])
+
+    def _update_top(self, batch: pd.DataFrame, score: np.ndarray, offset: int) -> None:
+        # Кандидаты батча: top_n лучших, при равном балле - в порядке появления в файле
+        order = np.argsort(-score, kind='stable')[:self.top_n]
+        columns = [col for col in self.columns if col in batch.columns] + ['suspicion_score', 'reason_mask']
+        candidates = batch.iloc[order][columns].copy()
+        candidates['_row'] = offset + order
+        self._merge_top(candidates)
+
+    def _merge_top(self, candidates: pd.DataFrame | None) -> None:
+        if candidates is None:
+            return
+        top = candidates if self.top is None else pd.concat([self.top, candidates])
+        self.top = top.sort_values(['suspicion_score', '_row'], ascending=[False, True]).head(self.top_n)
+
+    def merge(self, other: 'AnalysisStats') -> 'AnalysisStats':
+        """
+            Вливает статистику другой части датасета (например, партиции из другого процесса)
+
+            Args:
+                other (AnalysisStats): статистика, посчитанная с теми же порогами
+
+            Returns:
+                AnalysisStats: self
+        """
+        self.total += other.total
+        self.class_counts = self.class_counts.add(other.class_counts, fill_value=0)
+        for feature, counts in self.freq_counts.items():
+            counts[0] += other.freq_counts[feature][0]
+            counts[1] += other.freq_counts[feature][1]
+        for col, counts in self.entropy_counts.items():
+            counts[0] += other.entropy_counts[col][0]
+            counts[1] += other.entropy_counts[col][1]
+        self.very_long += other.very_long
+        self.long_names += other.long_names
+        self.low_ttl += other.low_ttl
+        self.high_ttl_variance += other.high_ttl_variance
+        for col in self.geo_counts:
+            self.geo_counts[col] += other.geo_counts[col]
+        self.score_counts = self.score_counts.add(other.score_counts, fill_value=0)
+        self.suspicious_count += other.suspicious_count
+        if other.confusion_matrix is not None:
+            self.confusion_matrix = other.confusion_matrix if self.confusion_matrix is None \
+                else self.confusion_matrix.add(other.confusion_matrix, fill_value=0)
+        self.malicious_total += other.malicious_total
+        self.detected_malicious += other.detected_malicious
+        self._merge_top(other.top)
+        for col, counts in self.histograms.items():
+            counts += other.histograms[col]
+        for group, sketch in self.entropy_sketches.items():
+            sketch.merge(other.entropy_sketches[group])
+        return self
+
+    def top_records(self) -> pd.DataFrame:
+        """ТОП записей по баллу подозрительности"""
+        return self.top.drop(columns='_row').reset_index(drop=True)
+
+
+def run_analysis(batches, columns: list[str], thresholds: dict[str, dict[float, float]], rules: RuleSet,
+                 writers=(), row_offset: int = 0) -> AnalysisStats:
+    """
+        Второй проход: скоринг, накопление статистик и сохранение батч за батчем
+
+        Args:
+            batches: итератор DataFrame'ов
+            columns (list[str]): колонки датасета
+            thresholds (dict): пороги из compute_thresholds
+            rules (RuleSet): таблица правил балла
+            writers: куда сохранять результаты (ParquetResultSink, ResultWriter)
+            row_offset (int): номер первой строки батчей в датасете
+
+        Колонки suspicion_score, reason_mask и is_suspicious дописываются в каждый батч.
+
+        Returns:
+            AnalysisStats
+    """
+    compiled = rules.compile(columns, thresholds)
+    stats = AnalysisStats(columns, thresholds, compiled, row_offset=row_offset)
+    for batch in batches:
+        # Баллы дописываются в сам батч, без копии
+        score, reason_mask = compiled.evaluate(batch)
+        batch['suspicion_score'] = score
+        batch['reason_mask'] = reason_mask
+        batch['is_suspicious'] = score >= compiled.suspicious_score
+        stats.update(batch)
+        for writer in writers:
+            writer.write(batch)
+    return stats
+
+
+def score_dataset(dataset: DnsDataset, rules: RuleSet, thresholds: dict[str, dict[float, float]]) -> AnalysisStats:
+    """Стадия скоринга без сохранения результатов"""
+    return run_analysis(dataset.batches(), dataset.columns, thresholds, rules)
+
+
+# ================================================= Отчет =================================================
+
+def print_report(stats: AnalysisStats) -> None:
+    """Печатает отчет по накопленной статистике"""
+    t = stats.thresholds
+    has_malicious = 'malicious' in stats.class_counts.index
+
+    # 2. Посмотрим распределение классов
+    if stats.has_label:
+        print("\n🎯 РАСПРЕДЕЛЕНИЕ КЛАССОВ:")
+        class_dist = stats.class_counts.astype(np.int64).sort_values(ascending=False)
+        for class_name, count in class_dist.items():
+            percentage = (count / stats.total) * 100
+            print(f"   {class_name}: {count:,} записей ({percentage:.1f}%)")
+
+    # 3. Анализ подозрительных признаков
+    print("\n" + "=" * 60)
+    print("🔎 ПОИСК ПОДОЗРИТЕЛЬНЫХ ПАТТЕРНОВ")
+    print("=" * 60)
 
+    # 3.1. Аномалии в частотах запросов
+    print("\n📊 АНОМАЛИИ В ЧАСТОТАХ ЗАПРОСОВ:")
+    for feature, (suspicious, malicious_in_susp) in stats.freq_counts.items():
+        if suspicious > 0:
+            print(f"   • {SUSPICIOUS_FREQ_FEATURES[feature]}: {suspicious:,} записей с высокой частотой")
+            if has_malicious:
+                print(f"     Среди них malicious: {malicious_in_susp:,}")
+
+    # 3.2. Аномалии в энтропии
+    print("\n🔐 АНОМАЛИИ В ЭНТРОПИИ:")
+    for col, (high_susp, low_susp) in stats.entropy_counts.items():
         print(f"   • {col}:")
-        print(f"     - Высокая энтропия (> {high_entropy:.2f}): {len(high_susp):,} записей")
-        print(f"     - Низкая энтропия (< {low_entropy:.2f}): {len(low_susp):,} записей")
-
-# 3.3. Аномалии в длине имен
-print("\n📏 АНОМАЛИИ В ДЛИНЕ ИМЕН:")
-if 'len' in analysis_df.columns or 'rr_name_length' in analysis_df.columns:
-    len_col = 'len' if 'len' in analysis_df.columns else 'rr_name_length'
-
-    # Слишком длинные имена (> 95 перцентиль)
-    long_threshold = analysis_df[len_col].quantile(0.95)
-    very_long = analysis_df[analysis_df[len_col] > 63]  # RFC ограничение
-    long_names = analysis_df[analysis_df[len_col] > long_threshold]
-
-    print(f"   • Очень длинные имена (> 63 символов): {len(very_long):,} записей")
-    print(f"   • Длинные имена (> {long_threshold:.0f} символов): {len(long_names):,} записей")
-
-# 3.4. Подозрительные TTL значения
-print("\n⏱️  АНОМАЛИИ В TTL:")
-ttl_cols = ['unique_ttl', 'ttl_mean', 'ttl_variance']
-for col in ttl_cols:
-    if col in analysis_df.columns:
+        print(f"     - Высокая энтропия (> {t[col][0.95]:.2f}): {high_susp:,} записей")
+        print(f"     - Низкая энтропия (< {t[col][0.05]:.2f}): {low_susp:,} записей")
+
+    # 3.3. Аномалии в длине имен
+    print("\n📏 АНОМАЛИИ В ДЛИНЕ ИМЕН:")
+    if stats.len_col:
+        print(f"   • Очень длинные имена (> 63 символов): {stats.very_long:,} записей")
+        print(f"   • Длинные имена (> {t[stats.len_col][0.95]:.0f} символов): {stats.long_names:,} записей")
+
+    # 3.4. Подозрительные TTL значения
+    print("\n⏱️  АНОМАЛИИ В TTL:")
+    for col in TTL_COLS:
+        if col not in stats.columns:
+            continue
         # Низкий TTL может быть признаком быстрого флудинга
         if col == 'unique_ttl':
-            low_ttl = analysis_df[analysis_df[col] < 10]  # Меньше 10 секунд
-            print(f"   • {col} < 10 сек: {len(low_ttl):,} записей")
+            print(f"   • {col} < 10 сек: {stats.low_ttl:,} записей")
         # Высокая вариация TTL
         if col == 'ttl_variance':
-            high_var = analysis_df[analysis_df[col] > analysis_df[col].quantile(0.95)]
-            print(f"   • Высокая вариация TTL: {len(high_var):,} записей")
-
-# 3.5. Географические аномалии
-print("\n🌍 ГЕОГРАФИЧЕСКИЕ АНОМАЛИИ:")
-geo_cols = ['unique_country', 'unique_asn']
-for col in geo_cols:
-    if col in analysis_df.columns:
-        # Много уникальных стран/ASN может быть признаком DGA
-        many_unique = analysis_df[analysis_df[col] > analysis_df[col].quantile(0.95)]
-        print(f"   • Много уникальных {col}: {len(many_unique):,} записей")
-
-# 4. КОМПОЗИТНЫЙ АНАЛИЗ: Поиск самых подозрительных записей
-print("\n" + "=" * 60)
-print("🎯 ВЫЯВЛЕНИЕ САМЫХ ПОДОЗРИТЕЛЬНЫХ ЗАПИСЕЙ")
-print("=" * 60)
-
-# Создадим "балл подозрительности"
-analysis_df['suspicion_score'] = 0
+            print(f"   • Высокая вариация TTL: {stats.high_ttl_variance:,} записей")
 
-# Веса для разных аномалий
-if 'NULL_frequency' in analysis_df.columns:
-    analysis_df['suspicion_score'] += (analysis_df['NULL_frequency'] > analysis_df['NULL_frequency'].quantile(0.9)) * 2
-
-if 'TXT_frequency' in analysis_df.columns:
-    analysis_df['suspicion_score'] += (analysis_df['TXT_frequency'] > analysis_df['TXT_frequency'].quantile(0.9)) * 2
+    # 3.5. Географические аномалии
+    print("\n🌍 ГЕОГРАФИЧЕСКИЕ АНОМАЛИИ:")
+    for col, many_unique in stats.geo_counts.items():
+        # Много уникальных стран/ASN может быть признаком DGA
+        print(f"   • Много уникальных {col}: {many_unique:,} записей")
 
-if 'entropy' in analysis_df.columns:
-    analysis_df['suspicion_score'] += (analysis_df['entropy'] > analysis_df['entropy'].quantile(0.95)) * 3
+    # 4. КОМПОЗИТНЫЙ АНАЛИЗ: Поиск самых подозрительных записей
+    print("\n" + "=" * 60)
+    print("🎯 ВЫЯВЛЕНИЕ САМЫХ ПОДОЗРИТЕЛЬНЫХ ЗАПИСЕЙ")
+    print("=" * 60)
 
-if 'len' in analysis_df.columns:
-    analysis_df['suspicion_score'] += (analysis_df['len'] > 63) * 2
+    suspicious_percent = (stats.suspicious_count / stats.total) * 100
+    print(f"🔍 Найдено подозрительных записей: {stats.suspicious_count:,} из {stats.total:,} "
+          f"({suspicious_percent:.1f}%)")
 
-if 'unique_country' in analysis_df.columns:
-    analysis_df['suspicion_score'] += (analysis_df['unique_country'] > analysis_df['unique_country'].quantile(0.9)) * 1
+    # 5. СРАВНЕНИЕ С ИСХОДНЫМИ МЕТКАМИ (если есть)
+    if stats.has_label:
+        print("\n" + "=" * 60)
+        print("📊 СРАВНЕНИЕ С ИСХОДНЫМИ МЕТКАМИ")
+        print("=" * 60)
 
-# Классификация
-analysis_df['is_suspicious'] = analysis_df['suspicion_score'] >= 3
+        print("Матрица сопряженности:")
+        print(stats.confusion_matrix.astype(np.int64))
 
-# Статистика
-suspicious_count = analysis_df['is_suspicious'].sum()
-total_count = len(analysis_df)
-suspicious_percent = (suspicious_count / total_count) * 100
+        # Эффективность наших эвристик
+        if has_malicious:
+            detection_rate = (stats.detected_malicious / stats.malicious_total) * 100 \
+                if stats.malicious_total > 0 else 0
 
-print(f"🔍 Найдено подозрительных записей: {suspicious_count:,} из {total_count:,} ({suspicious_percent:.1f}%)")
+            print(f"\n📈 ЭФФЕКТИВНОСТЬ ОБНАРУЖЕНИЯ:")
+            print(f"   Всего malicious: {stats.malicious_total:,}")
+            print(f"   Обнаружено нашими правилами: {stats.detected_malicious:,}")
+            print(f"   Эффективность обнаружения: {detection_rate:.1f}%")
 
-# 5. СРАВНЕНИЕ С ИСХОДНЫМИ МЕТКАМИ (если есть)
-if 'GlobalClass' in analysis_df.columns:
+    # 6. ТОП ПОДОЗРИТЕЛЬНЫХ ЗАПИСЕЙ
     print("\n" + "=" * 60)
-    print("📊 СРАВНЕНИЕ С ИСХОДНЫМИ МЕТКАМИ")
+    print(f"🏆 ТОП-{stats.top_n} САМЫХ ПОДОЗРИТЕЛЬНЫХ ЗАПИСЕЙ")
     print("=" * 60)
 
-    confusion_matrix = pd.crosstab(analysis_df['GlobalClass'], analysis_df['is_suspicious'])
-    print("Матрица сопряженности:")
-    print(confusion_matrix)
-
-    # Эффективность наших эвристик
-    if 'malicious' in analysis_df['GlobalClass'].values:
-        malicious_total = (analysis_df['GlobalClass'] == 'malicious').sum()
-        detected_malicious = ((analysis_df['GlobalClass'] == 'malicious') & analysis_df['is_suspicious']).sum()
-
-        detection_rate = (detected_malicious / malicious_total) * 100 if malicious_total > 0 else 0
-
-        print(f"\n📈 ЭФФЕКТИВНОСТЬ ОБНАРУЖЕНИЯ:")
-        print(f"   Всего malicious: {malicious_total:,}")
-        print(f"   Обнаружено нашими правилами: {detected_malicious:,}")
-        print(f"   Эффективность обнаружения: {detection_rate:.1f}%")
-
-# 6. ТОП ПОДОЗРИТЕЛЬНЫХ ЗАПИСЕЙ
-print("\n" + "=" * 60)
-print("🏆 ТОП-10 САМЫХ ПОДОЗРИТЕЛЬНЫХ ЗАПИСЕЙ")
-print("=" * 60)
-
-top_suspicious = analysis_df.sort_values('suspicion_score', ascending=False).head(10)
-
-for i, (idx, row) in enumerate(top_suspicious.iterrows(), 1):
-    print(f"\n{i}. [Счет подозрительности: {row['suspicion_score']}]")
-
-    if 'rr' in row and pd.notna(row['rr']):
-        print(f"   Домен: {row['rr']}")
-
-    # Причины подозрительности
-    reasons = []
-    if 'NULL_frequency' in row and row['NULL_frequency'] > analysis_df['NULL_frequency'].quantile(0.9):
-        reasons.append(f"высокая NULL частота ({row['NULL_frequency']:.3f})")
-    if 'TXT_frequency' in row and row['TXT_frequency'] > analysis_df['TXT_frequency'].quantile(0.9):
-        reasons.append(f"высокая TXT частота ({row['TXT_frequency']:.3f})")
-    if 'entropy' in row and row['entropy'] > analysis_df['entropy'].quantile(0.95):
-        reasons.append(f"высокая энтропия ({row['entropy']:.2f})")
-    if 'len' in row and row['len'] > 63:
-        reasons.append(f"длина {row['len']} символов")
-
-    if reasons:
-        print(f"   Причины: {', '.join(reasons)}")
-
-    if 'GlobalClass' in row:
-        print(f"   Исходная метка: {row['GlobalClass']}")
-
-# 7. СОХРАНЕНИЕ РЕЗУЛЬТАТОВ
-print("\n💾 Сохранение результатов...")
-
-# Сохраняем все подозрительные записи
-suspicious_df = analysis_df[analysis_df['is_suspicious']].copy()
-suspicious_df.to_csv('suspicious_dns_records.csv', index=False, encoding='utf-8-sig')
-
-# Сохраняем полный отчет с баллами
-analysis_df.to_csv('full_dns_analysis.csv', index=False, encoding='utf-8-sig')
-
-print(f"✅ Подозрительные записи сохранены: suspicious_dns_records.csv ({len(suspicious_df)} записей)")
-print(f"✅ Полный анализ сохранен: full_dns_analysis.csv")
-
-# 8. ВИЗУАЛИЗАЦИЯ
-try:
-    import matplotlib.pyplot as plt
-
-    print("\n📈 Создание визуализаций...")
-
-    fig, axes = plt.subplots(2, 3, figsize=(15, 10))
-
-    # 1. Распределение suspicion_score
-    ax1 = axes[0, 0]
-    scores = analysis_df['suspicion_score'].value_counts().sort_index()
-    ax1.bar(scores.index.astype(str), scores.values)
-    ax1.set_title('Распределение баллов подозрительности')
-    ax1.set_xlabel('Балл')
-    ax1.set_ylabel('Количество записей')
-
-    # 2. Энтропия у подозрительных/нормальных
-    if 'entropy' in analysis_df.columns:
-        ax2 = axes[0, 1]
-        normal = analysis_df[~analysis_df['is_suspicious']]['entropy'].dropna()
-        suspicious = analysis_df[analysis_df['is_suspicious']]['entropy'].dropna()
-        ax2.boxplot([normal.values[:1000], suspicious.values[:1000]], labels=['Нормальные', 'Подозрительные'])
-        ax2.set_title('Энтропия доменных имен')
-        ax2.set_ylabel('Энтропия')
-
-    # 3. Длина имен
-    if 'len' in analysis_df.columns:
-        ax3 = axes[0, 2]
-        analysis_df['len'].hist(bins=50, alpha=0.7, ax=ax3)
-        ax3.axvline(x=63, color='red', linestyle='--', label='RFC лимит (63)')
-        ax3.set_title('Распределение длины имен')
-        ax3.set_xlabel('Длина символов')
-        ax3.set_ylabel('Частота')
-        ax3.legend()
-
-    # 4. NULL frequency
-    if 'NULL_frequency' in analysis_df.columns:
-        ax4 = axes[1, 0]
-        analysis_df['NULL_frequency'].hist(bins=50, alpha=0.7, ax=ax4, log=True)
-        ax4.set_title('Частота NULL запросов (лог шкала)')
-        ax4.set_xlabel('Частота')
-        ax4.set_ylabel('Частота (лог)')
-
-    # 5. Сравнение с исходными метками
-    if 'GlobalClass' in analysis_df.columns:
-        ax5 = axes[1, 1]
-        if 'malicious' in analysis_df['GlobalClass'].values:
-            comparison = analysis_df.groupby('GlobalClass')['is_suspicious'].mean() * 100
-            comparison.plot(kind='bar', ax=ax5, color=['green', 'red'])
-            ax5.set_title('Процент подозрительных по классам')
-            ax5.set_ylabel('% подозрительных')
-            ax5.set_xticklabels(ax5.get_xticklabels(), rotation=0)
-
-    # 6. TXT frequency
-    if 'TXT_frequency' in analysis_df.columns:
-        ax6 = axes[1, 2]
-        analysis_df['TXT_frequency'].hist(bins=50, alpha=0.7, ax=ax6, log=True)
-        ax6.set_title('Частота TXT запросов (лог шкала)')
-        ax6.set_xlabel('Частота')
-        ax6.set_ylabel('Частота (лог)')
-
-    plt.tight_layout()
-    plt.savefig('dns_features_analysis.png', dpi=150, bbox_inches='tight')
-    plt.show()
-    print("✅ Визуализация сохранена: dns_features_analysis.png")
-
-except ImportError:
-    print("ℹ️  Установите matplotlib для визуализации: pip install matplotlib")
-
-print("\n✅ Анализ завершен!")
\ No newline at end of file
+    for i, row in enumerate(stats.top_records().to_dict('records'), 1):
+        print(f"\n{i}. [Счет подозрительности: {row['suspicion_score']}]")
+
+        if DOMAIN_COL in row and pd.notna(row[DOMAIN_COL]):
+            print(f"   Домен: {row[DOMAIN_COL]}")
+
+        # Причины подозрительности раскладываются из маски, посчитанной при скоринге
+        reasons = stats.rules.decode(row['reason_mask'], row)
+
+        if reasons:
+            print(f"   Причины: {', '.join(reasons)}")
+
+        if LABEL_COL in row:
+            print(f"   Исходная метка: {row[LABEL_COL]}")
+
+
+# ================================================= Сохранение =================================================
+
+class ResultWriter:
+    """Дописывает результаты в CSV батч за батчем (экспорт по запросу, основной формат - parquet)"""
+
+    def __init__(self, suspicious_path: str = SUSPICIOUS_CSV, full_path: str = FULL_CSV,
+                 encoding: str = 'utf-8-sig'):
+        self.suspicious_path = suspicious_path
+        self.full_path = full_path
+        # Файлы открываются один раз, чтобы BOM utf-8-sig записался только в начало
+        self._suspicious_file = open(suspicious_path, 'w', encoding=encoding, newline='')
+        self._full_file = open(full_path, 'w', encoding=encoding, newline='')
+        self._header = True
+        self.suspicious_written = 0
+
+    def write(self, batch: pd.DataFrame) -> None:
+        suspicious = batch[batch['is_suspicious']]
+        suspicious.to_csv(self._suspicious_file, index=False, header=self._header)
+        batch.to_csv(self._full_file, index=False, header=self._header)
+        self._header = False
+        self.suspicious_written += len(suspicious)
+
+    def close(self) -> None:
+        self._suspicious_file.close()
+        self._full_file.close()
+
+
+def print_saved(stats: AnalysisStats, csv: bool) -> None:
+    """Сообщает, куда сохранены результаты"""
+    print("\n💾 Сохранение результатов...")
+    print(f"✅ Подозрительные записи сохранены: {SUSPICIOUS_DATASET}/ ({stats.suspicious_count} записей)")
+    print(f"✅ Полный анализ сохранен: {FULL_DATASET}/ (parquet, партиции по баллу и метке)")
+    if csv:
+        print(f"✅ CSV-выгрузка: {SUSPICIOUS_CSV}, {FULL_CSV}")
+
+
+def persist_dataset(dataset: DnsDataset, rules: RuleSet, thresholds: dict[str, dict[float, float]],
+                    csv: bool = False) -> AnalysisStats:
+    """
+        Стадия сохранения: скоринг со всеми колонками и запись результатов в том же проходе
+
+        Args:
+            dataset (DnsDataset): источник данных
+            rules (RuleSet): таблица правил балла
+            thresholds (dict): пороги из threshold_dataset
+            csv (bool): дополнительно выгрузить CSV
+
+        Returns:
+            AnalysisStats
+    """
+    reset_output()
+    writers = [ParquetResultSink()]
+    if csv:
+        writers.append(ResultWriter())
+    try:
+        return run_analysis(dataset.batches(projected=False), dataset.columns, thresholds, rules, writers)
+    finally:
+        for writer in writers:
+            writer.close()
+
+
+# ================================================= Визуализация =================================================
+
+def box_summary(sketch: QuantileSketch, label: str) -> dict:
+    """
+        Статистика для ax.bxp по скетчу: квартили и усы 1.5 IQR, без отдельных выбросов
+
+        Args:
+            sketch (QuantileSketch): скетч значений группы
+            label (str): подпись группы
+
+        Returns:
+            dict: описание одного «ящика»
+    """
+    q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    return {
+        'label': label,
+        'q1': q1,
+        'med': median,
+        'q3': q3,
+        'whislo': max(sketch.min, q1 - 1.5 * iqr),
+        'whishi': min(sketch.max, q3 + 1.5 * iqr),
+        'fliers': [],
+    }
+
+
+def visualize(stats: AnalysisStats, show: bool = True) -> None:
+    """
+        Графики по агрегатам, накопленным при скоринге: стоимость не зависит от числа строк
+
+        Args:
+            stats (AnalysisStats): статистика прогона
+            show (bool): показать окно; False - только сохранить PNG (для запуска без дисплея)
+    """
+    try:
+        import matplotlib
+        if not show:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        print("\n📈 Создание визуализаций...")
+
+        fig, axes = plt.subplots(2, 3, figsize=(15, 10))
+
+        # 1. Распределение suspicion_score
+        ax1 = axes[0, 0]
+        scores = stats.score_counts.astype(np.int64).sort_index()
+        ax1.bar(scores.index.astype(str), scores.values)
+        ax1.set_title('Распределение баллов подозрительности')
+        ax1.set_xlabel('Балл')
+        ax1.set_ylabel('Количество записей')
+
+        # 2. Энтропия у подозрительных/нормальных
+        if stats.entropy_sketches:
+            ax2 = axes[0, 1]
+            boxes = [box_summary(stats.entropy_sketches[group], label)
+                     for group, label in ((False, 'Нормальные'), (True, 'Подозрительные'))
+                     if stats.entropy_sketches[group].count]
+            ax2.bxp(boxes, showfliers=False)
+            ax2.set_title('Энтропия доменных имен')
+            ax2.set_ylabel('Энтропия')
+
+        # 3. Длина имен
+        if 'len' in stats.histograms:
+            ax3 = axes[0, 2]
+            plot_histogram(ax3, stats, 'len')
+            ax3.axvline(x=63, color='red', linestyle='--', label='RFC лимит (63)')
+            ax3.set_title('Распределение длины имен')
+            ax3.set_xlabel('Длина символов')
+            ax3.set_ylabel('Частота')
+            ax3.legend()
+
+        # 4. NULL frequency
+        if 'NULL_frequency' in stats.histograms:
+            ax4 = axes[1, 0]
+            plot_histogram(ax4, stats, 'NULL_frequency', log=True)
+            ax4.set_title('Частота NULL запросов (лог шкала)')
+            ax4.set_xlabel('Частота')
+            ax4.set_ylabel('Частота (лог)')
+
+        # 5. Сравнение с исходными метками
+        if stats.has_label:
+            ax5 = axes[1, 1]
+            if 'malicious' in stats.class_counts.index:
+                confusion = stats.confusion_matrix.reindex(columns=[False, True], fill_value=0)
+                comparison = confusion[True] / confusion.sum(axis=1) * 100
+                comparison.plot(kind='bar', ax=ax5, color=['green', 'red'])
+                ax5.set_title('Процент подозрительных по классам')
+                ax5.set_ylabel('% подозрительных')
+                ax5.set_xticklabels(ax5.get_xticklabels(), rotation=0)
+
+        # 6. TXT frequency
+        if 'TXT_frequency' in stats.histograms:
+            ax6 = axes[1, 2]
+            plot_histogram(ax6, stats, 'TXT_frequency', log=True)
+            ax6.set_title('Частота TXT запросов (лог шкала)')
+            ax6.set_xlabel('Частота')
+            ax6.set_ylabel('Частота (лог)')
+
+        plt.tight_layout()
+        plt.savefig(PLOT_PATH, dpi=150, bbox_inches='tight')
+        if show:
+            plt.show()
+        plt.close(fig)
+        print(f"✅ Визуализация сохранена: {PLOT_PATH}")
+
+    except ImportError:
+        print("ℹ️  Установите matplotlib для визуализации: pip install matplotlib")
+
+
+def plot_histogram(ax, stats: AnalysisStats, col: str, log: bool = False) -> None:
+    """Рисует накопленную гистограмму колонки так же, как Series.hist(bins=50)"""
+    edges = stats.hist_edges[col]
+    ax.hist(edges[:-1], bins=edges, weights=stats.histograms[col], alpha=0.7, log=log)
+    ax.grid(True)
+
+
+# ================================================= Запуск =================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Эвристический анализ DNS-признаков')
+    parser.add_argument('path', nargs='?', default=DATA_PATH,
+                        help='parquet-файл с признаками или каталог parquet-партиций')
+    parser.add_argument('--stream', action='store_true',
+                        help='потоковый режим: чтение батчами, память ограничена одним батчем')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='строк в батче (для --stream)')
+    parser.add_argument('--rules', default=RULES_PATH, help='JSON с таблицей правил и весов')
+    parser.add_argument('--quantile-error', type=float, default=DEFAULT_EPS,
+                        help='допустимая ошибка ранга для порогов-квантилей сверх точного предела, 0 - всегда точно')
+    parser.add_argument('--csv', action='store_true',
+                        help=f'дополнительно выгрузить {SUSPICIOUS_CSV} и {FULL_CSV}')
+    parser.add_argument('--no-show', action='store_true',
+                        help='не открывать окно с графиками, только сохранить PNG')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='процессов для каталога партиций (по умолчанию - по числу ядер)')
+    args = parser.parse_args()
+    rules = load_rules(args.rules)
+
+    # 1. Загрузка данных
+    print("📥 Загрузка данных...")
+    if os.path.isdir(args.path):
+        run_partitioned(args, rules)
+        return
+
+    dataset = load_dataset(args.path, args.stream, args.batch_size)
+    print(f"✅ Данные загружены: {dataset.num_rows} строк, {len(dataset.all_columns)} столбцов")
+    print(f"✅ Метка класса: 'GlobalClass' (скорее всего: normal/malicious)")
+
+    thresholds = threshold_dataset(dataset, rules, args.quantile_error)
+
+    # 7. СОХРАНЕНИЕ РЕЗУЛЬТАТОВ (пишется во время скоринга)
+    stats = persist_dataset(dataset, rules, thresholds, args.csv)
+
+    print_report(stats)
+    print_saved(stats, args.csv)
+
+    # 8. ВИЗУАЛИЗАЦИЯ
+    visualize(stats, show=not args.no_show)
+
+    print("\n✅ Анализ завершен!")
+
+
+def run_partitioned(args, rules: RuleSet) -> None:
+    """Каталог партиций: скоринг в пуле процессов, отчет по объединенной статистике"""
+    # Импорт здесь, потому что dnsParallel сам импортирует этот модуль
+    from dnsParallel import analyze_partitions, list_partitions
+
+    reset_output()
+    paths = list_partitions(args.path)
+    stats = analyze_partitions(paths, rules, args.quantile_error, args.batch_size, args.workers, save=True,
+                               csv=args.csv)
+    print(f"✅ Данные обработаны: {stats.total} строк в {len(paths)} партициях")
+
+    print_report(stats)
+    print_saved(stats, args.csv)
+
+    visualize(stats, show=not args.no_show)
+    print("\n✅ Анализ завершен!")
+
+
+if __name__ == '__main__':
+    main()
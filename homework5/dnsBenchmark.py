@@ -0,0 +1,105 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from dnsAnalyzer import (BATCH_SIZE, load_dataset, persist_dataset, print_report, score_dataset,
+                         threshold_dataset, visualize)
+from dnsQuantiles import DEFAULT_EPS
+from dnsRules import RULES_PATH, load_rules
+from dnsSynthetic import write_parquet
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def reset_peak_rss() -> None:
+    """Сбрасывает пиковый RSS процесса (Linux), чтобы пик мерился по каждой стадии отдельно"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса в МБ: VmHWM из /proc, иначе ru_maxrss (не сбрасывается)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(name: str, rows: int, func, results: list, *args, **kwargs):
+    """
+        Выполняет стадию и добавляет строку замеров в results
+
+        Args:
+            name (str): название стадии
+            rows (int): строк в датасете (для rows/sec)
+            func: функция стадии
+            results (list): сюда добавляется (стадия, строки, время, пиковый RSS, строк/сек)
+
+        Returns:
+            результат func
+    """
+    reset_peak_rss()
+    start = time.perf_counter()
+    # Вывод стадий (отчет, сообщения) не мешает таблице замеров
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    results.append((name, rows, elapsed, peak_rss_mb(), rows / elapsed if elapsed else float('inf')))
+    return result
+
+
+def run_benchmark(path: str, rows: int, stream: bool, batch_size: int, eps: float, rules_path: str) -> list:
+    """
+        Прогоняет все стадии анализа на одном датасете
+
+        Returns:
+            list: строки замеров по стадиям
+    """
+    results = []
+    rules = load_rules(rules_path)
+    dataset = measure('load', rows, load_dataset, results, path, stream, batch_size)
+    thresholds = measure('threshold', rows, threshold_dataset, results, dataset, rules, eps)
+    stats = measure('score', rows, score_dataset, results, dataset, rules, thresholds)
+    measure('report', rows, print_report, results, stats)
+    measure('persist', rows, persist_dataset, results, dataset, rules, thresholds)
+    measure('visualize', rows, visualize, results, stats, show=False)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк стадий dnsAnalyzer.py на синтетических данных')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SIZES, help='размеры датасетов')
+    parser.add_argument('--stream', action='store_true', help='потоковый режим анализа')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='строк в батче (для --stream)')
+    parser.add_argument('--quantile-error', type=float, default=DEFAULT_EPS, help='ошибка ранга квантилей')
+    parser.add_argument('--rules', default=RULES_PATH, help='JSON с таблицей правил и весов')
+    parser.add_argument('--workdir', default='dns_benchmark', help='каталог для данных и результатов')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора данных')
+    args = parser.parse_args()
+
+    rules_path = os.path.abspath(args.rules)
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+
+    print(f"{'стадия':<10} {'строк':>12} {'время, с':>10} {'пик RSS, МБ':>12} {'строк/с':>14}")
+    for rows in args.rows:
+        path = f'synthetic_{rows}_{args.seed}.parquet'
+        if not os.path.exists(path):
+            write_parquet(path, rows, args.seed)
+        for name, stage_rows, elapsed, rss, rate in run_benchmark(path, rows, args.stream, args.batch_size,
+                                                                   args.quantile_error, rules_path):
+            print(f"{name:<10} {stage_rows:>12,} {elapsed:>10.3f} {rss:>12.1f} {rate:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+import argparse
+import json
+import math
+import os
+import pickle
+import sys
+import time
+from collections import deque
+
+import pandas as pd
+
+from dnsQuantiles import DEFAULT_EPS, QuantileSketch, thresholds_from_sketches
+from dnsRules import RULES_PATH, CompiledRules, RuleSet, load_rules
+
+# Окно скользящих квантилей и количество корзин в нем
+WINDOW_SECONDS = 3600
+WINDOW_BUCKETS = 12
+# Сколько значений копить перед заливкой в скетч (заливка пачкой дешевле поштучной)
+FLUSH_SIZE = 1024
+# Как часто пересчитывать пороги внутри одной корзины; на разогреве - каждый раз,
+# когда история удваивается (1, 2, 4, ... записей), чтобы пороги появлялись с первых записей
+REFRESH_EVERY = 10_000
+# Сколько записей должно набраться в окне после разрыва во времени, чтобы заменить прежние пороги
+WARM_UP_RECORDS = 1_000
+CHECKPOINT_SECONDS = 300
+
+
+class OnlineScorer:
+    """
+        Онлайн-скоринг DNS-записей по тем же правилам, что и dnsAnalyzer.py.
+
+        Квантильные пороги считаются по скользящему окну: окно разбито на корзины,
+        у каждой корзины свои KLL-скетчи признаков (без точного режима, чтобы память окна была
+        ограничена), порог - квантиль объединения корзин окна.
+        Запись сначала оценивается по текущим порогам, потом учитывается в окне: самая первая
+        запись оценивается без квантильных правил, дальше пороги обновляются при каждом
+        удвоении окна, пока интервал не дойдет до REFRESH_EVERY.
+        Разогрев считается по записям, которые сейчас в окне: если после разрыва во времени окно
+        опустело, прежние пороги действуют, пока в нем снова не наберется warm_up записей
+        (или столько, по скольким они считались, если меньше).
+    """
+
+    def __init__(self, rules: RuleSet, window: float = WINDOW_SECONDS, buckets: int = WINDOW_BUCKETS,
+                 eps: float = DEFAULT_EPS, checkpoint_path: str | None = None,
+                 checkpoint_seconds: float = CHECKPOINT_SECONDS, warm_up: int = WARM_UP_RECORDS):
+        """
+            Args:
+                rules (RuleSet): таблица правил (dns_rules.json)
+                window (float): длина окна в секундах
+                buckets (int): на сколько корзин делится окно
+                eps (float): допустимая ошибка ранга скетчей
+                checkpoint_path (str | None): куда периодически сохранять состояние
+                checkpoint_seconds (float): период сохранения состояния
+                warm_up (int): записей в окне, после которых прежние пороги заменяются новыми
+        """
+        self.rules = rules
+        self.window = window
+        self.bucket_span = window / buckets
+        self.eps = eps
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_seconds = checkpoint_seconds
+        self.warm_up = warm_up
+
+        self.plan = rules.threshold_plan([rule['feature'] for rule in rules.rules])
+        self.features = [rule['feature'] for rule in rules.rules]
+        # (номер корзины, {признак: скетч}); старые корзины вытесняются сами
+        self._buckets: deque = deque(maxlen=buckets)
+        # Номер корзины -> записей в ней; сумма - размер окна для разогрева
+        self._bucket_records: dict[int, int] = {}
+        self._pending = {feature: [] for feature in self.plan}
+        self._pending_count = 0
+        self._since_refresh = 0
+        # Записей в окне на момент последнего пересчета порогов
+        self._refreshed_records = 0
+        self._last_checkpoint = time.monotonic()
+        self.records_seen = 0
+        self.thresholds: dict[str, dict[float, float]] = {}
+        self.compiled: CompiledRules = rules.compile(self.features, self._empty_thresholds())
+
+    def score(self, record: dict, timestamp: float | None = None) -> tuple[float, int]:
+        """
+            Оценивает одну запись и учитывает ее в окне
+
+            Args:
+                record (dict): признак -> значение
+                timestamp (float | None): время записи (unix), по умолчанию - текущее
+
+            Returns:
+                tuple[float, int]: балл подозрительности и маска причин
+        """
+        self._advance(time.time() if timestamp is None else timestamp)
+        result = self.compiled.evaluate_record(record)
+
+        for feature, values in self._pending.items():
+            value = record.get(feature)
+            if value is not None:
+                values.append(value)
+        self._pending_count += 1
+        self._after_learn(1)
+        return result
+
+    def score_batch(self, batch: pd.DataFrame, timestamp: float | None = None) -> tuple:
+        """
+            Оценивает микробатч одним векторным вычислением и учитывает его в окне
+
+            Args:
+                batch (pd.DataFrame): записи микробатча
+                timestamp (float | None): время микробатча (unix), по умолчанию - текущее
+
+            Returns:
+                tuple[np.ndarray, np.ndarray]: баллы и маски причин
+        """
+        self._advance(time.time() if timestamp is None else timestamp)
+        compiled = self.rules.compile(list(batch.columns), self._thresholds_or_empty())
+        result = compiled.evaluate(batch)
+
+        self._flush()
+        sketches = self._buckets[-1][1]
+        for feature in self.plan:
+            if feature in batch.columns:
+                sketches[feature].update(batch[feature].to_numpy(dtype='float64', na_value=math.nan))
+        self._after_learn(len(batch))
+        return result
+
+    def is_suspicious(self, score: float) -> bool:
+        return score >= self.rules.suspicious_score
+
+    def checkpoint(self, path: str | None = None) -> None:
+        """
+            Атомарно сохраняет состояние окна, чтобы после рестарта не пересчитывать историю
+
+            Args:
+                path (str | None): файл состояния, по умолчанию checkpoint_path
+        """
+        path = path or self.checkpoint_path
+        if not path:
+            raise ValueError('Не задан файл состояния: передайте path или checkpoint_path')
+        self._flush()
+        state = {
+            'window': self.window,
+            'bucket_span': self.bucket_span,
+            'eps': self.eps,
+            'buckets': list(self._buckets),
+            'bucket_records': self._bucket_records,
+            'records_seen': self.records_seen,
+        }
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, path)
+        self._last_checkpoint = time.monotonic()
+
+    @classmethod
+    def restore(cls, path: str, rules: RuleSet, **kwargs) -> 'OnlineScorer':
+        """
+            Восстанавливает скорер из файла состояния (файл должен быть собственным, pickle)
+
+            Args:
+                path (str): файл, записанный checkpoint()
+                rules (RuleSet): таблица правил; признаки без сохраненных скетчей начинают с нуля
+
+            Returns:
+                OnlineScorer
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+
+        buckets = round(state['window'] / state['bucket_span'])
+        scorer = cls(rules, window=state['window'], buckets=buckets, eps=state['eps'], checkpoint_path=path,
+                     **kwargs)
+        for index, sketches in state['buckets']:
+            for feature in scorer.plan:
+                sketches.setdefault(feature, QuantileSketch(scorer.eps, exact_limit=0))
+            scorer._buckets.append((index, sketches))
+        # В старых файлах состояния счетчиков корзин нет - оцениваются по размеру скетчей
+        scorer._bucket_records = state.get('bucket_records') or {
+            index: max((sketch.count for sketch in sketches.values()), default=0)
+            for index, sketches in state['buckets']}
+        scorer.records_seen = state['records_seen']
+        scorer._refresh()
+        return scorer
+
+    def _advance(self, timestamp: float) -> None:
+        # Переход в новую корзину; записи из прошлого учитываются в текущей корзине
+        index = int(timestamp // self.bucket_span)
+        if self._buckets and index <= self._buckets[-1][0]:
+            return
+        self._flush()
+        self._buckets.append((index, {feature: QuantileSketch(self.eps, exact_limit=0) for feature in self.plan}))
+        # Корзины, выпавшие из окна при разрыве во времени
+        while self._buckets[0][0] <= index - self._buckets.maxlen:
+            self._buckets.popleft()
+        self._bucket_records = {index: self._bucket_records.get(index, 0) for index, _ in self._buckets}
+        if not self._warming_up():
+            self._refresh()
+
+    def _after_learn(self, count: int) -> None:
+        self.records_seen += count
+        self._since_refresh += count
+        current = self._buckets[-1][0]
+        self._bucket_records[current] = self._bucket_records.get(current, 0) + count
+        if self._pending_count >= FLUSH_SIZE:
+            self._flush()
+        # На разогреве пересчет при удвоении окна, дальше - раз в REFRESH_EVERY записей;
+        # окно, заново разогретое после разрыва, пересчитывается сразу
+        if not self._warming_up():
+            window = min(self._refreshed_records, self.window_records())
+            if self._since_refresh >= min(REFRESH_EVERY, max(window, 1)):
+                self._refresh()
+        if self.checkpoint_path and time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds:
+            self.checkpoint()
+
+    def _flush(self) -> None:
+        if not self._pending_count or not self._buckets:
+            return
+        sketches = self._buckets[-1][1]
+        for feature, values in self._pending.items():
+            if values:
+                sketches[feature].update(values)
+                values.clear()
+        self._pending_count = 0
+
+    def _refresh(self) -> None:
+        # Пороги окна считаются один раз и используются до следующего пересчета
+        self._flush()
+        window_sketches = {}
+        for feature in self.plan:
+            merged = QuantileSketch(self.eps, exact_limit=0)
+            for _, sketches in self._buckets:
+                merged.merge(sketches[feature])
+            window_sketches[feature] = merged
+        self.thresholds = thresholds_from_sketches(window_sketches, self.plan)
+        self.compiled = self.rules.compile(self.features, self.thresholds)
+        self._since_refresh = 0
+        self._refreshed_records = self.window_records()
+
+    def window_records(self) -> int:
+        """Сколько записей сейчас в окне"""
+        return sum(self._bucket_records.values())
+
+    def _warming_up(self) -> bool:
+        # После разрыва окно меньше того, по которому считались действующие пороги: пересчет отложен,
+        # чтобы не получить NaN и пороги по горстке записей. На холодном старте окно только растет
+        return self.window_records() < min(self.warm_up, self._refreshed_records)
+
+    def _empty_thresholds(self) -> dict[str, dict[float, float]]:
+        return {feature: {q: math.nan for q in quantiles} for feature, quantiles in self.plan.items()}
+
+    def _thresholds_or_empty(self) -> dict[str, dict[float, float]]:
+        return self.thresholds or self._empty_thresholds()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Онлайн-скоринг DNS-записей (JSON lines на входе)')
+    parser.add_argument('input', nargs='?', help='файл JSON lines, по умолчанию stdin')
+    parser.add_argument('--rules', default=RULES_PATH, help='JSON с таблицей правил и весов')
+    parser.add_argument('--checkpoint', default='dns_online_state.pkl', help='файл состояния окна')
+    parser.add_argument('--window', type=float, default=WINDOW_SECONDS, help='окно квантилей, секунд')
+    parser.add_argument('--time-field', default='timestamp', help='поле с unix-временем записи')
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules)
+    if os.path.exists(args.checkpoint):
+        scorer = OnlineScorer.restore(args.checkpoint, rules)
+        print(f"♻️  Состояние восстановлено: {args.checkpoint} ({scorer.records_seen:,} записей в истории)")
+    else:
+        scorer = OnlineScorer(rules, window=args.window, checkpoint_path=args.checkpoint)
+
+    stream = open(args.input, 'r', encoding='utf-8') if args.input else sys.stdin
+    try:
+        for line in stream:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            score, mask = scorer.score(record, record.get(args.time_field))
+            if scorer.is_suspicious(score):
+                reasons = scorer.compiled.decode(mask, record)
+                print(f"🚨 {record.get('rr', '?')}: балл {score} ({', '.join(reasons)})")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        scorer.checkpoint()
+        print(f"💾 Состояние сохранено: {args.checkpoint}")
+
+
+if __name__ == '__main__':
+    main()
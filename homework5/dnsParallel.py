@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+from dnsAnalyzer import (BATCH_SIZE, FULL_CSV, SUSPICIOUS_CSV, AnalysisStats, ResultWriter, iter_parquet_batches,
+                         parquet_schema, project_columns, run_analysis, threshold_plan)
+from dnsQuantiles import DEFAULT_EPS, EXACT_LIMIT, merge_sketches, sketch_batches, thresholds_from_sketches
+from dnsRules import RuleSet
+from dnsSink import ParquetResultSink
+
+
+def list_partitions(directory: str) -> list[str]:
+    """
+        Все parquet-файлы каталога (с подкаталогами) в стабильном порядке
+
+        Args:
+            directory (str): каталог с партициями
+
+        Returns:
+            list[str]: отсортированные пути к партициям
+    """
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.endswith('.parquet'))
+    return sorted(paths)
+
+
+def _sketch_partition(task) -> dict:
+    # Первый проход в воркере: скетчи квантилей одной партиции; сжатые скетчи - O(1 / eps) вместо всех значений
+    path, columns, plan, eps, batch_size, compress = task
+    sketches = sketch_batches(iter_parquet_batches(path, columns, batch_size), plan, eps)
+    if compress:
+        for sketch in sketches.values():
+            sketch.compress()
+    return sketches
+
+
+def _score_partition(task) -> AnalysisStats:
+    # Второй проход в воркере: скоринг и статистика одной партиции по глобальным порогам
+    path, columns, thresholds, rules, batch_size, row_offset, save, csv_dir = task
+    if not save:
+        return run_analysis(iter_parquet_batches(path, columns, batch_size), columns, thresholds, rules,
+                            row_offset=row_offset)
+
+    # Каждый воркер пишет свои файлы, имя части - номер первой строки партиции
+    part_name = f'part-{row_offset:012d}'
+    writers = [ParquetResultSink(part_name=part_name)]
+    if csv_dir is not None:
+        writers.append(ResultWriter(*_csv_parts(csv_dir, part_name), encoding='utf-8'))
+    try:
+        return run_analysis(iter_parquet_batches(path, None, batch_size), columns, thresholds, rules,
+                            writers=writers, row_offset=row_offset)
+    finally:
+        for writer in writers:
+            writer.close()
+
+
+def _csv_parts(csv_dir: str, part_name: str) -> tuple[str, str]:
+    return os.path.join(csv_dir, f'{part_name}-suspicious.csv'), os.path.join(csv_dir, f'{part_name}-full.csv')
+
+
+def _concat_csv(parts: list[str], path: str) -> None:
+    # Части склеиваются в порядке партиций, заголовок - один раз, BOM utf-8-sig - в начале файла
+    header_written = False
+    with open(path, 'w', encoding='utf-8-sig', newline='') as out:
+        for part in parts:
+            with open(part, 'r', encoding='utf-8', newline='') as f:
+                header = f.readline()
+                if not header_written and header:
+                    out.write(header)
+                    header_written = True
+                shutil.copyfileobj(f, out)
+
+
+def analyze_partitions(paths: list[str], rules: RuleSet, eps: float = DEFAULT_EPS,
+                       batch_size: int = BATCH_SIZE, workers: int | None = None,
+                       save: bool = False, csv: bool = False) -> AnalysisStats:
+    """
+        Двухпроходный анализ набора партиций в пуле процессов.
+
+        Скетчи и статистики партиций объединяются в порядке путей, поэтому
+        результат не зависит от количества воркеров (workers=1 - тот же расчет в одном процессе).
+        Скетчи до dnsQuantiles.EXACT_LIMIT строк хранят все значения, так что пороги и разметка
+        совпадают с прогоном по одному файлу. Если строк во всех партициях больше предела, воркеры
+        сжимают скетчи в KLL сами и возвращают O(1 / eps) элементов вместо всех значений.
+
+        Args:
+            paths (list[str]): пути к партициям, все с одинаковой схемой
+            rules (RuleSet): таблица правил балла
+            eps (float): допустимая ошибка ранга квантилей
+            batch_size (int): строк в батче при чтении партиции
+            workers (int | None): количество процессов, None - по числу ядер
+            save (bool): сохранять размеченные записи через ParquetResultSink
+            csv (bool): при save дополнительно выгрузить CSV (части воркеров склеиваются по порядку)
+
+        Returns:
+            AnalysisStats: статистика по всем партициям
+    """
+    if not paths:
+        raise ValueError('Не найдено ни одной parquet-партиции')
+
+    # Смещения строк берутся из метаданных, чтобы порядок ТОПа совпадал с последовательным прогоном
+    row_counts = [parquet_schema(path)[0] for path in paths]
+    row_offsets = list(accumulate(row_counts[:-1], initial=0))
+    columns = project_columns(parquet_schema(paths[0])[1])
+    plan = threshold_plan(columns, rules)
+    # Объединение все равно перешло бы в KLL: точные значения не передаются между процессами
+    compress = eps > 0 and sum(row_counts) > EXACT_LIMIT
+    csv_dir = tempfile.mkdtemp(prefix='dns-csv-', dir='.') if save and csv else None
+
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    pool_map = executor.map if executor else map
+    try:
+        sketches = merge_sketches(pool_map(_sketch_partition,
+                                           [(path, list(plan), plan, eps, batch_size, compress) for path in paths]))
+        thresholds = thresholds_from_sketches(sketches, plan)
+
+        tasks = [(path, columns, thresholds, rules, batch_size, offset, save, csv_dir)
+                 for path, offset in zip(paths, row_offsets)]
+        stats = None
+        for part in pool_map(_score_partition, tasks):
+            stats = part if stats is None else stats.merge(part)
+        if csv_dir is not None:
+            parts = [_csv_parts(csv_dir, f'part-{offset:012d}') for offset in row_offsets]
+            _concat_csv([suspicious for suspicious, _ in parts], SUSPICIOUS_CSV)
+            _concat_csv([full for _, full in parts], FULL_CSV)
+    finally:
+        if executor:
+            executor.shutdown()
+        if csv_dir is not None:
+            shutil.rmtree(csv_dir, ignore_errors=True)
+    return stats
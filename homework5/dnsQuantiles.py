@@ -0,0 +1,273 @@
+import numpy as np
+
+# Допустимая ошибка ранга по умолчанию (доля от количества записей)
+DEFAULT_EPS = 0.001
+
+# Эмпирическая константа KLL: ошибка ранга ~ KLL_CONST / k
+KLL_CONST = 1.65
+CAPACITY_DECAY = 2 / 3
+MIN_CAPACITY = 8
+# Пока значений не больше стольких, скетч хранит их все и квантили точные
+EXACT_LIMIT = 1_000_000
+
+
+class QuantileSketch:
+    """
+        Мёржируемый скетч квантилей для одной числовой колонки.
+
+        Пока значений не больше exact_limit (или при eps=0 - всегда), хранятся все значения и
+        квантили точные, с той же линейной интерполяцией, что и pandas .quantile: результат
+        не зависит ни от разбиения на батчи, ни от порядка слияния частей. Дальше - KLL-скетч
+        с ошибкой ранга не больше eps * count при памяти O(1 / eps). Значения уходят в KLL
+        блоками фиксированного размера от начала потока, поэтому и приближенный результат
+        зависит только от последовательности значений, а не от размера батчей.
+    """
+
+    def __init__(self, eps: float = DEFAULT_EPS, seed: int = 0, exact_limit: int = EXACT_LIMIT):
+        """
+            Args:
+                eps (float): допустимая ошибка ранга, доля от количества записей; 0 - только точные квантили
+                seed (int): зерно для выбора половины при сжатии (прогон воспроизводим)
+                exact_limit (int): до скольких значений квантили считаются точно
+        """
+        if not 0 <= eps < 1:
+            raise ValueError('eps должен быть в интервале [0, 1)')
+
+        self.eps = eps
+        self.k = max(MIN_CAPACITY, int(np.ceil(KLL_CONST / eps))) if eps else 0
+        self.exact_limit = exact_limit
+        self.count = 0
+        self.min = np.nan
+        self.max = np.nan
+        # Точный режим: все значения; None - скетч перешел в KLL
+        self._values: list[np.ndarray] | None = [] if eps == 0 or exact_limit > 0 else None
+        # KLL: levels[i] - элементы с весом 2 ** i; _buffer - хвост потока короче блока
+        self.levels: list[np.ndarray] = [np.empty(0)]
+        self._buffer = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+        self._sorted = None
+
+    def update(self, values) -> None:
+        """
+            Добавляет значения в скетч, NaN пропускаются
+
+            Args:
+                values: массив или Series значений
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+
+        self.count += len(values)
+        self.min = np.fmin(self.min, values.min())
+        self.max = np.fmax(self.max, values.max())
+        self._sorted = None
+        if self._values is not None:
+            self._values.append(values)
+            if self.eps and self.count > self.exact_limit:
+                self._to_sketch()
+        else:
+            self._feed(values)
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """
+            Вливает другой скетч (например, посчитанный по другому чанку или процессу).
+            Пока оба скетча точные и вместе не превышают exact_limit, результат совпадает
+            с расчетом по всем значениям сразу.
+
+            Args:
+                other (QuantileSketch): скетч той же колонки
+
+            Returns:
+                QuantileSketch: self
+        """
+        if not other.count:
+            return self
+
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self._sorted = None
+        if other._values is not None:
+            self.count += other.count
+            if self._values is not None:
+                self._values.extend(other._values)
+                if self.eps and self.count > self.exact_limit:
+                    self._to_sketch()
+            else:
+                for values in other._values:
+                    self._feed(values)
+            return self
+
+        if self._values is not None:
+            self._to_sketch()
+        self.count += other.count
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+        self._feed(other._buffer)
+        return self
+
+    def compress(self) -> 'QuantileSketch':
+        """
+            Переводит точный скетч в KLL (при eps > 0), например перед передачей из воркера:
+            вместо всех значений остается O(1 / eps) элементов. При eps = 0 скетч не меняется
+
+            Returns:
+                QuantileSketch: self
+        """
+        if self._values is not None and self.eps:
+            self._to_sketch()
+        return self
+
+    def quantile(self, q: float) -> float:
+        """
+            Квантиль q с линейной интерполяцией между соседними рангами
+
+            Args:
+                q (float): квантиль от 0 до 1
+
+            Returns:
+                float: значение квантиля, NaN для пустого скетча
+        """
+        return float(self.quantiles([q])[0])
+
+    def quantiles(self, qs) -> np.ndarray:
+        """Векторный вариант quantile для нескольких q сразу"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+
+        if self._values is not None:
+            return np.quantile(self._exact(), qs)
+
+        values, cumulative = self._weighted()
+        position = qs * (self.count - 1)
+        lower = np.floor(position)
+        upper = np.ceil(position)
+        # Значение на ранге r - первый элемент, у которого накопленный вес больше r
+        lower_values = values[np.searchsorted(cumulative, lower, side='right')]
+        upper_values = values[np.searchsorted(cumulative, upper, side='right')]
+        result = lower_values + (upper_values - lower_values) * (position - lower)
+        # Края распределения известны точно, даже после сжатий
+        result = np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, result))
+        return np.clip(result, self.min, self.max)
+
+    def is_exact(self) -> bool:
+        """True, если квантили точные"""
+        return self._values is not None or len(self.levels) == 1
+
+    def _exact(self) -> np.ndarray:
+        # Все значения точного режима одним массивом, кешируется до следующего изменения
+        if self._sorted is None:
+            self._values = [np.concatenate(self._values)] if len(self._values) != 1 else self._values
+            self._sorted = self._values[0]
+        return self._sorted
+
+    def _to_sketch(self) -> None:
+        values = np.concatenate(self._values) if self._values else np.empty(0)
+        self._values = None
+        self._feed(values)
+
+    def _feed(self, values: np.ndarray) -> None:
+        # Сжатия идут блоками по k значений, отсчитанными от начала потока
+        self._sorted = None
+        buffer = np.concatenate([self._buffer, values])
+        blocks = len(buffer) // self.k * self.k
+        for start in range(0, blocks, self.k):
+            self.levels[0] = np.concatenate([self.levels[0], buffer[start:start + self.k]])
+            self._compress()
+        self._buffer = buffer[blocks:]
+
+    def _weighted(self) -> tuple[np.ndarray, np.ndarray]:
+        # Отсортированные элементы и их накопленные веса, кешируются до следующего изменения
+        if self._sorted is None:
+            levels = [*self.levels, self._buffer]
+            values = np.concatenate(levels)
+            weights = np.concatenate([np.full(len(self.levels[level]), 2 ** level, dtype=np.int64)
+                                      for level in range(len(self.levels))]
+                                     + [np.ones(len(self._buffer), dtype=np.int64)])
+            order = np.argsort(values, kind='stable')
+            self._sorted = values[order], np.cumsum(weights[order])
+        return self._sorted
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(MIN_CAPACITY, int(np.ceil(self.k * CAPACITY_DECAY ** depth)))
+
+    def _compress(self) -> None:
+        self._sorted = None
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # При нечетном количестве один элемент остается на текущем уровне
+                odd = len(items) % 2
+                offset = int(self._rng.integers(2))
+                self.levels[level] = items[:odd]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[odd + offset::2]])
+            level += 1
+
+
+def sketch_batches(batches, columns, eps: float = DEFAULT_EPS) -> dict[str, QuantileSketch]:
+    """
+        Один проход по батчам: по скетчу на каждую колонку
+
+        Args:
+            batches: итератор DataFrame'ов
+            columns: колонки, для которых нужны квантили
+            eps (float): допустимая ошибка ранга
+
+        Returns:
+            dict[str, QuantileSketch]: колонка -> скетч
+    """
+    sketches = {col: QuantileSketch(eps) for col in columns}
+    for batch in batches:
+        for col, sketch in sketches.items():
+            sketch.update(batch[col].to_numpy(dtype=np.float64, na_value=np.nan))
+    return sketches
+
+
+def merge_sketches(parts) -> dict[str, QuantileSketch]:
+    """
+        Объединяет словари скетчей, посчитанные по разным чанкам/процессам, в порядке их следования
+
+        Args:
+            parts: итерируемое словарей колонка -> скетч
+
+        Returns:
+            dict[str, QuantileSketch]: колонка -> объединенный скетч
+    """
+    merged: dict[str, QuantileSketch] = {}
+    for part in parts:
+        for col, sketch in part.items():
+            if col in merged:
+                merged[col].merge(sketch)
+            else:
+                merged[col] = sketch
+    return merged
+
+
+def thresholds_from_sketches(sketches: dict[str, QuantileSketch],
+                             plan: dict[str, set[float]]) -> dict[str, dict[float, float]]:
+    """
+        Считает все пороги прогона один раз
+
+        Args:
+            sketches (dict[str, QuantileSketch]): скетчи колонок
+            plan (dict[str, set[float]]): колонка -> нужные квантили
+
+        Returns:
+            dict[str, dict[float, float]]: колонка -> {квантиль: значение}
+    """
+    thresholds = {}
+    for col, quantiles in plan.items():
+        quantiles = sorted(quantiles)
+        values = sketches[col].quantiles(quantiles)
+        thresholds[col] = {q: float(value) for q, value in zip(quantiles, values)}
+    return thresholds
@@ -0,0 +1,177 @@
+import json
+import os
+from typing import TypedDict, NotRequired
+
+import numpy as np
+import pandas as pd
+
+# Таблица правил лежит рядом с кодом, веса правятся без изменения кода
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dns_rules.json')
+
+# Оператор -> (знак, строгое сравнение): x < t сводится к -x > -t
+OPERATORS = {
+    '>': (1.0, True),
+    '>=': (1.0, False),
+    '<': (-1.0, True),
+    '<=': (-1.0, False),
+}
+
+# Маска причин упаковывается в int64
+MAX_RULES = 63
+
+
+# Правило из таблицы: порог задается либо квантилем колонки, либо абсолютным значением
+class Rule(TypedDict):
+    feature: str
+    op: str
+    weight: float
+    reason: str
+    quantile: NotRequired[float]
+    threshold: NotRequired[float]
+
+
+class RuleSet:
+    """Таблица правил балла подозрительности"""
+
+    def __init__(self, rules: list[Rule], suspicious_score: float):
+        """
+            Args:
+                rules (list[Rule]): правила в порядке битов маски причин
+                suspicious_score (float): балл, начиная с которого запись подозрительна
+        """
+        if len(rules) > MAX_RULES:
+            raise ValueError(f'Правил больше {MAX_RULES}, маска причин не поместится в int64')
+        for rule in rules:
+            if rule['op'] not in OPERATORS:
+                raise ValueError(f"Неизвестный оператор '{rule['op']}' в правиле для {rule['feature']}")
+            if ('quantile' in rule) == ('threshold' in rule):
+                raise ValueError(f"Для {rule['feature']} нужно задать ровно одно из: quantile, threshold")
+
+        self.rules = rules
+        self.suspicious_score = suspicious_score
+
+    def threshold_plan(self, columns: list[str]) -> dict[str, set[float]]:
+        """
+            Квантили, которые нужны правилам
+
+            Args:
+                columns (list[str]): колонки датасета
+
+            Returns:
+                dict[str, set[float]]: колонка -> набор квантилей
+        """
+        plan: dict[str, set[float]] = {}
+        for rule in self.rules:
+            if 'quantile' in rule and rule['feature'] in columns:
+                plan.setdefault(rule['feature'], set()).add(rule['quantile'])
+        return plan
+
+    def compile(self, columns: list[str], thresholds: dict[str, dict[float, float]]) -> 'CompiledRules':
+        """
+            Подставляет пороги и отбрасывает правила для отсутствующих колонок
+
+            Args:
+                columns (list[str]): колонки датасета
+                thresholds (dict): колонка -> {квантиль: значение}
+
+            Returns:
+                CompiledRules
+        """
+        active = []
+        for bit, rule in enumerate(self.rules):
+            if rule['feature'] not in columns:
+                continue
+            value = thresholds[rule['feature']][rule['quantile']] if 'quantile' in rule else rule['threshold']
+            active.append((bit, rule, float(value)))
+        return CompiledRules(active, self.suspicious_score)
+
+
+class CompiledRules:
+    """Правила, собранные в векторы для одного матричного вычисления над батчем"""
+
+    def __init__(self, active: list[tuple[int, Rule, float]], suspicious_score: float):
+        self.suspicious_score = suspicious_score
+        self.features = [rule['feature'] for _, rule, _ in active]
+        self.reasons = {bit: (rule['feature'], rule['reason']) for bit, rule, _ in active}
+
+        signs = np.array([OPERATORS[rule['op']][0] for _, rule, _ in active])
+        self._signs = signs
+        self._strict = np.array([OPERATORS[rule['op']][1] for _, rule, _ in active], dtype=bool)
+        self._thresholds = np.array([value for _, _, value in active]) * signs
+        weights = [rule['weight'] for _, rule, _ in active]
+        self._weights = np.array(weights, dtype=np.int64 if all(float(w).is_integer() for w in weights)
+                                 else np.float64)
+        self._bits = np.array([1 << bit for bit, _, _ in active], dtype=np.int64)
+        # Те же правила кортежами для скоринга одной записи без numpy
+        self._checks = [(rule['feature'], float(sign), bool(strict), float(threshold), rule['weight'], 1 << bit)
+                        for (bit, rule, _), sign, strict, threshold
+                        in zip(active, signs, self._strict, self._thresholds)]
+
+    def evaluate(self, batch: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """
+            Считает балл и маску сработавших правил для всех строк батча сразу
+
+            Args:
+                batch (pd.DataFrame): батч записей
+
+            Returns:
+                tuple[np.ndarray, np.ndarray]: балл подозрительности и маска причин (int64)
+        """
+        if not self.features:
+            return np.zeros(len(batch), dtype=self._weights.dtype), np.zeros(len(batch), dtype=np.int64)
+
+        # Матрица (строки x правила); NaN не проходит ни одно сравнение
+        values = batch[self.features].to_numpy(dtype=np.float64, na_value=np.nan) * self._signs
+        hits = np.where(self._strict, values > self._thresholds, values >= self._thresholds)
+        return hits @ self._weights, hits @ self._bits
+
+    def evaluate_record(self, record: dict) -> tuple[float, int]:
+        """
+            Балл и маска причин для одной записи; отсутствующий признак или NaN правило не включают
+
+            Args:
+                record (dict): признак -> значение
+
+            Returns:
+                tuple[float, int]: балл подозрительности и маска причин
+        """
+        score = 0
+        mask = 0
+        for feature, sign, strict, threshold, weight, bit in self._checks:
+            value = record.get(feature)
+            if value is None:
+                continue
+            value = sign * value
+            if value > threshold or (not strict and value == threshold):
+                score += weight
+                mask |= bit
+        return score, mask
+
+    def decode(self, mask: int, record) -> list[str]:
+        """
+            Разворачивает маску причин в читаемый список
+
+            Args:
+                mask (int): маска причин строки
+                record: строка (dict или Series) со значениями признаков
+
+            Returns:
+                list[str]: причины в порядке правил
+        """
+        return [reason.format(value=record[feature])
+                for bit, (feature, reason) in self.reasons.items() if mask >> bit & 1]
+
+
+def load_rules(path: str = RULES_PATH) -> RuleSet:
+    """
+        Читает таблицу правил из JSON
+
+        Args:
+            path (str): путь к JSON с ключами suspicious_score и rules
+
+        Returns:
+            RuleSet
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return RuleSet(config['rules'], config['suspicious_score'])
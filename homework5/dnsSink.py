@@ -0,0 +1,116 @@
+import os
+import shutil
+from urllib.parse import quote
+
+import pandas as pd
+
+FULL_DATASET = 'full_dns_analysis'
+SUSPICIOUS_DATASET = 'suspicious_dns_records'
+
+# Партиционирование полного результата: балл, затем исходная метка
+PARTITION_COLS = ['suspicion_score', 'GlobalClass']
+COMPRESSION = 'zstd'
+# Имя каталога партиции для пустого значения - как у pyarrow
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+def reset_output(full_dir: str = FULL_DATASET, suspicious_dir: str = SUSPICIOUS_DATASET) -> None:
+    """
+        Удаляет результаты прошлого прогона, чтобы новые части не смешались со старыми
+
+        Args:
+            full_dir (str): каталог полного результата
+            suspicious_dir (str): каталог подозрительных записей
+    """
+    for directory in (full_dir, suspicious_dir):
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+
+
+class ParquetResultSink:
+    """
+        Дописывает размеченные батчи в сжатый parquet.
+
+        Полный результат - датасет, партиционированный по suspicion_score и GlobalClass
+        (каталоги key=value): на каждую партицию один открытый файл, батчи дописываются в него
+        row group'ами. Подозрительные записи - отдельный файл, куда каждый батч попадает
+        row group'ой через фильтр arrow, без копии DataFrame. Файлы дописываются в close().
+    """
+
+    def __init__(self, full_dir: str = FULL_DATASET, suspicious_dir: str = SUSPICIOUS_DATASET,
+                 part_name: str = 'part'):
+        """
+            Args:
+                full_dir (str): каталог полного результата
+                suspicious_dir (str): каталог подозрительных записей
+                part_name (str): префикс файлов этого писателя, уникальный для процесса/партиции
+        """
+        self.full_dir = full_dir
+        self.suspicious_dir = suspicious_dir
+        self.part_name = part_name
+        self.rows_written = 0
+        self.suspicious_written = 0
+        self.files_written = 0
+        # Значения колонок партиционирования -> писатель файла этой партиции
+        self._writers = {}
+        self._suspicious_writer = None
+
+    def write(self, batch: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+        partition_cols = [col for col in PARTITION_COLS if col in batch.columns]
+        if partition_cols:
+            groups = batch.groupby(partition_cols, sort=False, dropna=False).indices
+            for key, rows in groups.items():
+                key = key if isinstance(key, tuple) else (key,)
+                self._write_partition(key, partition_cols, table.take(rows).drop_columns(partition_cols))
+        else:
+            self._write_partition((), [], table)
+
+        suspicious = table.filter(table['is_suspicious'])
+        if suspicious.num_rows:
+            if self._suspicious_writer is None:
+                os.makedirs(self.suspicious_dir, exist_ok=True)
+                path = os.path.join(self.suspicious_dir, f'{self.part_name}.parquet')
+                self._suspicious_writer = pq.ParquetWriter(path, suspicious.schema, compression=COMPRESSION)
+            if not suspicious.schema.equals(self._suspicious_writer.schema):
+                suspicious = suspicious.cast(self._suspicious_writer.schema)
+            self._suspicious_writer.write_table(suspicious)
+
+        self.rows_written += table.num_rows
+        self.suspicious_written += suspicious.num_rows
+
+    def _write_partition(self, key: tuple, partition_cols: list[str], table) -> None:
+        import pyarrow.parquet as pq
+
+        writer = self._writers.get(key)
+        if writer is None:
+            directory = os.path.join(self.full_dir, *(f'{col}={partition_value(value)}'
+                                                      for col, value in zip(partition_cols, key)))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{self.part_name}.parquet')
+            writer = self._writers[key] = pq.ParquetWriter(path, table.schema, compression=COMPRESSION)
+            self.files_written += 1
+        if not table.schema.equals(writer.schema):
+            table = table.cast(writer.schema)
+        writer.write_table(table)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+        if self._suspicious_writer is not None:
+            self._suspicious_writer.close()
+            self._suspicious_writer = None
+
+
+def partition_value(value) -> str:
+    """Значение партиции для имени каталога key=value"""
+    if pd.isna(value):
+        return NULL_PARTITION
+    if isinstance(value, float) and value.is_integer():
+        # pyarrow пишет целые баллы без дробной части
+        value = int(value)
+    return quote(str(value), safe='')
@@ -0,0 +1,140 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Строк в одном сгенерированном чанке (и row group'е parquet)
+CHUNK_ROWS = 1_000_000
+MALICIOUS_SHARE = 0.2
+
+TLDS = np.array(['.com', '.net', '.org', '.ru', '.info', '.xyz'])
+
+
+def generate_chunk(rows: int, seed: int = 0, chunk_index: int = 0) -> pd.DataFrame:
+    """
+        Чанк синтетических DNS-признаков в схеме, которую ожидает dnsAnalyzer.py.
+
+        Результат зависит только от (seed, chunk_index, rows), поэтому датасет любого размера
+        воспроизводится одинаково. Malicious-записи смещены в сторону длинных имен, высокой
+        энтропии и частых NULL/TXT-запросов, чтобы эвристикам было что находить.
+
+        Args:
+            rows (int): количество строк
+            seed (int): зерно датасета
+            chunk_index (int): номер чанка в датасете
+
+        Returns:
+            pd.DataFrame
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    malicious = rng.random(rows) < MALICIOUS_SHARE
+
+    def shifted(normal, bad):
+        return np.where(malicious, bad, normal)
+
+    length = shifted(rng.integers(4, 40, rows), rng.integers(20, 120, rows))
+    entropy = np.clip(shifted(rng.normal(2.8, 0.5, rows), rng.normal(3.8, 0.4, rows)), 0, None)
+    unique_ttl = shifted(rng.integers(1, 30, rows), rng.integers(1, 60, rows))
+    ttl_mean = np.abs(shifted(rng.normal(3600, 900, rows), rng.normal(300, 200, rows)))
+
+    first_row = chunk_index * CHUNK_ROWS
+    domains = np.char.add(np.char.add('d', np.arange(first_row, first_row + rows).astype(str)),
+                          TLDS[rng.integers(0, len(TLDS), rows)])
+
+    return pd.DataFrame({
+        'rr': domains,
+        'NULL_frequency': shifted(rng.exponential(0.002, rows), rng.exponential(0.02, rows)),
+        'TXT_frequency': shifted(rng.exponential(0.01, rows), rng.exponential(0.05, rows)),
+        'OPT_frequency': rng.exponential(0.03, rows),
+        'entropy': entropy,
+        'rr_name_entropy': np.clip(entropy + rng.normal(0, 0.2, rows), 0, None),
+        'len': length,
+        'unique_ttl': unique_ttl,
+        'ttl_mean': ttl_mean,
+        'ttl_variance': rng.exponential(1, rows) * ttl_mean,
+        'unique_country': shifted(rng.integers(1, 4, rows), rng.integers(1, 15, rows)),
+        'unique_asn': shifted(rng.integers(1, 6, rows), rng.integers(1, 30, rows)),
+        'GlobalClass': np.where(malicious, 'malicious', 'normal'),
+    })
+
+
+def iter_chunks(rows: int, seed: int = 0):
+    """
+        Датасет из rows строк по чанкам CHUNK_ROWS, чтобы 10^8 строк не держать в памяти
+
+        Args:
+            rows (int): общее количество строк
+            seed (int): зерно датасета
+    """
+    for chunk_index, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        yield generate_chunk(min(CHUNK_ROWS, rows - start), seed, chunk_index)
+
+
+def write_parquet(path: str, rows: int, seed: int = 0) -> str:
+    """
+        Пишет синтетический датасет в один parquet-файл, чанк за чанком
+
+        Args:
+            path (str): путь к файлу
+            rows (int): количество строк
+            seed (int): зерно датасета
+
+        Returns:
+            str: путь к файлу
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_chunks(rows, seed):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def write_partitions(directory: str, rows: int, seed: int = 0) -> str:
+    """
+        Пишет тот же датасет каталогом партиций (по файлу на чанк) для параллельного режима
+
+        Args:
+            directory (str): каталог партиций
+            rows (int): количество строк
+            seed (int): зерно датасета
+
+        Returns:
+            str: путь к каталогу
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    for chunk_index, chunk in enumerate(iter_chunks(rows, seed)):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        pq.write_table(table, os.path.join(directory, f'part-{chunk_index:05d}.parquet'))
+    return directory
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Синтетические DNS-признаки для dnsAnalyzer.py')
+    parser.add_argument('rows', type=int, help='количество строк (10^4 .. 10^8)')
+    parser.add_argument('path', nargs='?', default='dns.parquet', help='parquet-файл или каталог партиций')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    parser.add_argument('--partitions', action='store_true', help='писать каталог партиций')
+    args = parser.parse_args()
+
+    if args.partitions:
+        write_partitions(args.path, args.rows, args.seed)
+    else:
+        write_parquet(args.path, args.rows, args.seed)
+    print(f"✅ Сгенерировано {args.rows:,} строк: {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+import argparse
+from collections import OrderedDict, deque
+from typing import TypedDict
+
+import pandas as pd
+
+from eventStore import parse_splunk_time
+from messageParser import ACCOUNT_FIELDS, load_parsed_events
+
+# Без ограничения состояние по ключам (учетки, хосты) росло бы вместе с журналом
+MAX_KEYS = 100_000
+
+FAILED_LOGON_CODES = ('4625', '4771')
+SUCCESS_LOGON_CODE = '4624'
+ESCALATION_CHAIN = ('4720', '4728', '4672')
+# Все коды, которые нужны паттернам по умолчанию
+CORRELATION_CODES = {*FAILED_LOGON_CODES, SUCCESS_LOGON_CODE, *ESCALATION_CHAIN}
+
+
+class Alert(TypedDict):
+    pattern: str
+    key: str
+    start: float
+    end: float
+    events: int
+
+
+def event_account(event: dict) -> str | None:
+    """
+        Учетка, над которой выполнено действие: цель входа, новый/добавленный пользователь, иначе субъект.
+        Member у 4728 приходит как DN ("CN=bob,CN=Users,..."), из него берется CN.
+    """
+    for field in ACCOUNT_FIELDS:
+        value = event.get(field)
+        if isinstance(value, str) and value and value != '-':
+            if value.upper().startswith('CN='):
+                value = value[3:].split(',', 1)[0]
+            return value.lower()
+    return None
+
+
+def event_host(event: dict) -> str | None:
+    host = event.get('ComputerName')
+    return host.lower() if isinstance(host, str) else None
+
+
+KEY_FUNCS = {'account': event_account, 'host': event_host}
+
+
+class KeyedState:
+    """Состояние по ключам с вытеснением давно неактивных и самых старых ключей при переполнении"""
+
+    def __init__(self, window: float, max_keys: int = MAX_KEYS):
+        self.window = window
+        self.max_keys = max_keys
+        self._states: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    def get(self, key: str, now: float, factory):
+        """Состояние ключа (новое, если его не было или оно устарело); ключ становится самым свежим"""
+        self.expire(now)
+        item = self._states.pop(key, None)
+        state = item[1] if item is not None else factory()
+        self._states[key] = (now, state)
+        if len(self._states) > self.max_keys:
+            self._states.popitem(last=False)
+        return state
+
+    def drop(self, key: str) -> None:
+        self._states.pop(key, None)
+
+    def expire(self, now: float) -> None:
+        # Ключи упорядочены по последней активности, поэтому устаревшие всегда в начале
+        while self._states:
+            seen, _ = next(iter(self._states.values()))
+            if seen >= now - self.window:
+                break
+            self._states.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class BruteForcePattern:
+    """N неудачных входов (4625/4771) по ключу за окно, после которых был успешный вход (4624)"""
+
+    def __init__(self, key: str = 'account', attempts: int = 5, window: float = 300,
+                 max_keys: int = MAX_KEYS):
+        """
+            Args:
+                key (str): 'account' или 'host'
+                attempts (int): минимум неудачных попыток в окне
+                window (float): окно в секундах
+                max_keys (int): предел количества отслеживаемых ключей
+        """
+        self.name = f'brute_force_{key}'
+        self.key_func = KEY_FUNCS[key]
+        self.attempts = attempts
+        self.window = window
+        self.state = KeyedState(window, max_keys)
+
+    def update(self, event: dict, ts: float) -> Alert | None:
+        code = event.get('EventCode')
+        if code not in FAILED_LOGON_CODES and code != SUCCESS_LOGON_CODE:
+            return None
+        key = self.key_func(event)
+        if key is None:
+            return None
+
+        # Все неудачи ключа в окне: в алерт идет их полное количество, память ограничена самим окном
+        failures: deque = self.state.get(key, ts, deque)
+        while failures and failures[0] < ts - self.window:
+            failures.popleft()
+        if code in FAILED_LOGON_CODES:
+            failures.append(ts)
+            return None
+        if len(failures) < self.attempts:
+            return None
+        self.state.drop(key)
+        return Alert(pattern=self.name, key=key, start=failures[0], end=ts, events=len(failures) + 1)
+
+
+class SequencePattern:
+    """Цепочка событий по ключу в заданном порядке, вся цепочка укладывается в окно"""
+
+    def __init__(self, name: str, steps: tuple[str, ...], key: str = 'account', window: float = 3600,
+                 max_keys: int = MAX_KEYS):
+        """
+            Args:
+                name (str): название паттерна в алертах
+                steps (tuple[str, ...]): EventCode шагов по порядку
+                key (str): 'account' или 'host'
+                window (float): окно в секундах от первого до последнего шага
+                max_keys (int): предел количества отслеживаемых ключей
+        """
+        self.name = name
+        self.steps = steps
+        self.key_func = KEY_FUNCS[key]
+        self.window = window
+        self.state = KeyedState(window, max_keys)
+
+    def update(self, event: dict, ts: float) -> Alert | None:
+        code = event.get('EventCode')
+        if code not in self.steps:
+            return None
+        key = self.key_func(event)
+        if key is None:
+            return None
+
+        # starts[i] - самое позднее начало цепочки, у которой пройдены шаги 0..i:
+        # из всех частичных совпадений у него больше всего времени до конца окна
+        starts: list = self.state.get(key, ts, lambda: [None] * len(self.steps))
+        alert = None
+        # Обход с конца, чтобы событие не продвинуло цепочку сразу на несколько шагов
+        for i in reversed(range(len(self.steps))):
+            if self.steps[i] != code:
+                continue
+            if i == 0:
+                starts[0] = ts
+                continue
+            start = starts[i - 1]
+            if start is None or start < ts - self.window:
+                continue
+            if i == len(self.steps) - 1:
+                alert = Alert(pattern=self.name, key=key, start=start, end=ts, events=len(self.steps))
+                starts[:] = [None] * len(self.steps)
+                break
+            starts[i] = start if starts[i] is None else max(starts[i], start)
+        return alert
+
+
+def default_patterns() -> list:
+    """Перебор паролей по учетке и по хосту, создание пользователя с выдачей привилегий"""
+    return [
+        BruteForcePattern('account'),
+        BruteForcePattern('host'),
+        SequencePattern('escalation_chain', ESCALATION_CHAIN, 'account'),
+    ]
+
+
+class CorrelationEngine:
+    """Один потоковый проход по событиям, отсортированным по времени"""
+
+    def __init__(self, patterns: list | None = None):
+        self.patterns = patterns if patterns is not None else default_patterns()
+        self.last_ts = float('-inf')
+
+    def process(self, event: dict, ts: float) -> list[Alert]:
+        """
+            Args:
+                event (dict): событие с EventCode, ComputerName и разобранными полями Message
+                ts (float): время события (unix), не меньше предыдущего
+
+            Returns:
+                list[Alert]: сработавшие паттерны
+        """
+        if ts < self.last_ts:
+            raise ValueError('События должны идти по возрастанию времени')
+        self.last_ts = ts
+        return [alert for pattern in self.patterns if (alert := pattern.update(event, ts)) is not None]
+
+    def run(self, events) -> list[Alert]:
+        """Алерты по итератору (событие, время)"""
+        return [alert for event, ts in events for alert in self.process(event, ts)]
+
+
+def sorted_events(events: pd.DataFrame):
+    """События DataFrame (с колонкой _time) по возрастанию времени; выгрузки Splunk идут от новых к старым"""
+    ts = events['_time'].map(parse_splunk_time)
+    order = ts.sort_values(kind='stable').index
+    for event, value in zip(events.loc[order].to_dict('records'), ts.loc[order]):
+        if pd.notna(value):
+            yield event, value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Корреляция событий Windows по времени')
+    parser.add_argument('path', nargs='?', default='botsv1.json', help='выгрузка Splunk')
+    parser.add_argument('--workers', type=int, default=None, help='процессов для разбора Message')
+    args = parser.parse_args()
+
+    events = load_parsed_events(args.path, event_codes=CORRELATION_CODES, workers=args.workers)
+    alerts = CorrelationEngine().run(sorted_events(events))
+    if not alerts:
+        print("Цепочек не найдено")
+    for alert in alerts:
+        print(f"🚨 {alert['pattern']}: {alert['key']} ({alert['events']} событий, "
+              f"{alert['end'] - alert['start']:.0f} с)")
+
+
+if __name__ == '__main__':
+    main()
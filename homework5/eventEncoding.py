@@ -0,0 +1,142 @@
+import argparse
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from eventStore import as_text, parse_splunk_time
+from splunkReader import DEFAULT_FIELDS, iter_splunk_records, load_events
+
+# Поля с небольшим количеством различных значений: хранятся кодами словаря
+CATEGORICAL_FIELDS = ['EventCode', 'ComputerName', 'Account_Name', 'Account_Domain', 'LogName', 'Keywords']
+TIME_FIELD = '_time'
+
+
+class CategoryDictionary:
+    """Словарь значение -> код, общий для всех загружаемых файлов: коды уже выданных значений не меняются"""
+
+    def __init__(self):
+        self.codes: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def encode(self, value) -> int:
+        """Код значения (новое значение получает следующий код), -1 для отсутствующего"""
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, values) -> np.ndarray:
+        """Коды известных значений, неизвестные пропускаются"""
+        return np.array([self.codes[value] for value in values if value in self.codes], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class EventEncoder:
+    """
+        Загрузка выгрузок Splunk сразу в компактном виде: категориальные поля - int32-коды
+        общих словарей, время - datetime64, без промежуточных строковых колонок.
+    """
+
+    def __init__(self, categorical: list[str] = CATEGORICAL_FIELDS):
+        """
+            Args:
+                categorical (list[str]): поля, которые кодируются словарями
+        """
+        self.categorical = categorical
+        self.dictionaries = {field: CategoryDictionary() for field in categorical}
+
+    def load(self, path: str, event_codes=None) -> pd.DataFrame:
+        """
+            Args:
+                path (str): путь к выгрузке Splunk
+                event_codes: коды событий, которые нужны (строки), None - все
+
+            Returns:
+                pd.DataFrame: категориальные колонки на общих словарях и колонка _time
+        """
+        codes = {field: array('i') for field in self.categorical}
+        times = array('d')
+        encoders = [(codes[field].append, self.dictionaries[field].encode, field) for field in self.categorical]
+        for record in iter_splunk_records(path, self.categorical + [TIME_FIELD], event_codes):
+            for append, encode, field in encoders:
+                # Многозначные поля (Account_Name у 4624) кодируются одной строкой
+                append(encode(as_text(record[field])))
+            value = parse_splunk_time(record[TIME_FIELD])
+            times.append(np.nan if value is None else value)
+
+        columns = {field: self.categorical_column(field, np.frombuffer(codes[field], dtype=np.int32))
+                   for field in self.categorical}
+        # Миллисекунды из выгрузки сохраняются
+        columns[TIME_FIELD] = pd.to_datetime(np.frombuffer(times, dtype=np.float64) * 1000, unit='ms')
+        return pd.DataFrame(columns)
+
+    def categorical_column(self, field: str, codes: np.ndarray) -> pd.Categorical:
+        """Коды поля как pd.Categorical на текущем состоянии общего словаря"""
+        return pd.Categorical.from_codes(codes, categories=pd.Index(self.dictionaries[field].values,
+                                                                    dtype=object))
+
+    def concat(self, frames: list[pd.DataFrame]) -> pd.DataFrame:
+        """
+            Объединяет загруженные файлы без перекодирования: категории ранних файлов -
+            префикс общего словаря, поэтому их коды остаются верными.
+        """
+        frames = [frame.assign(**{field: self.categorical_column(field, frame[field].cat.codes.to_numpy())
+                                  for field in self.categorical}) for frame in frames]
+        return pd.concat(frames, ignore_index=True)
+
+    def filter_codes(self, frame: pd.DataFrame, event_codes) -> pd.DataFrame:
+        """Фильтр по EventCode сравнением целых кодов, без сравнения строк"""
+        wanted = self.dictionaries['EventCode'].lookup(event_codes)
+        return frame[np.isin(frame['EventCode'].cat.codes.to_numpy(), wanted)]
+
+
+def frame_memory(frame: pd.DataFrame) -> int:
+    """Занимаемая DataFrame память в байтах, включая объекты строк"""
+    return int(frame.memory_usage(deep=True, index=False).sum())
+
+
+def memory_report(paths: list[str], encoded: pd.DataFrame, event_codes=None) -> tuple[int, int, float]:
+    """
+        Сравнивает с обычной загрузкой тех же полей строками (load_events).
+        Файлы перечитываются целиком, поэтому отчет строится только по запросу (--memory-report)
+
+        Returns:
+            tuple[int, int, float]: байт строками, байт в закодированном виде, во сколько раз меньше
+    """
+    before = sum(frame_memory(load_events(path, DEFAULT_FIELDS, event_codes)) for path in paths)
+    after = frame_memory(encoded)
+    return before, after, before / after if after else float('inf')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Компактная загрузка выгрузок Splunk со словарным кодированием')
+    parser.add_argument('paths', nargs='*', default=['botsv1.json'], help='выгрузки Splunk')
+    parser.add_argument('--event-codes', nargs='+', default=None, help='оставить только эти EventCode')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='сравнить память с загрузкой строками (файлы читаются повторно)')
+    args = parser.parse_args()
+
+    encoder = EventEncoder()
+    events = encoder.concat([encoder.load(path) for path in args.paths])
+    if args.event_codes:
+        events = encoder.filter_codes(events, args.event_codes)
+
+    print(f"Событий: {len(events):,}, поля: {', '.join(DEFAULT_FIELDS)}")
+    for field in encoder.categorical:
+        print(f"  {field}: {len(encoder.dictionaries[field]):,} значений в словаре")
+    if args.memory_report:
+        before, after, ratio = memory_report(args.paths, events, args.event_codes)
+        print(f"Память (load_events -> словари): строками {before / 2**20:.2f} МБ -> "
+              f"кодами {after / 2**20:.2f} МБ ({ratio:.1f}x)")
+    else:
+        print(f"Память в закодированном виде: {frame_memory(events) / 2**20:.2f} МБ")
+
+
+if __name__ == '__main__':
+    main()
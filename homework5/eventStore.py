@@ -0,0 +1,297 @@
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from messageParser import ACCOUNT_FIELDS, BASE_FIELDS, parse_message
+from splunkReader import iter_splunk_records
+
+DB_PATH = 'events.db'
+# Версия схемы (PRAGMA user_version): 2 - разобранные поля Message вместо текста
+SCHEMA_VERSION = 2
+
+# Расследования - наборы EventCode без повторов
+INVESTIGATIONS = {
+    'failed_logins': ('4625', '4771'),
+    'privilege_escalation': ('4672', '4104', '4688'),
+    'user_management': ('4720', '4722', '4724', '4728', '4703'),
+}
+
+# Поле выгрузки Splunk -> колонка таблицы
+FIELDS = {
+    '_cd': 'cd',
+    'EventCode': 'event_code',
+    'ComputerName': 'computer_name',
+    'Account_Name': 'account_name',
+    'Account_Domain': 'account_domain',
+    'LogName': 'log_name',
+    'Keywords': 'keywords',
+    '_time': 'time_text',
+}
+
+# Из Message в базе остаются только поля, которые нужны корреляции: текст разбирается один раз при загрузке
+MESSAGE_STORED = ACCOUNT_FIELDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    cd TEXT NOT NULL UNIQUE,
+    event_code TEXT,
+    computer_name TEXT,
+    account_name TEXT,
+    account_domain TEXT,
+    log_name TEXT,
+    keywords TEXT,
+    time_text TEXT,
+    ts REAL
+);
+CREATE INDEX IF NOT EXISTS idx_events_code_ts ON events (event_code, ts);
+CREATE INDEX IF NOT EXISTS idx_events_computer_ts ON events (computer_name, ts);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE TABLE IF NOT EXISTS accounts (
+    event_id INTEGER NOT NULL REFERENCES events (id),
+    account_name TEXT,
+    account_domain TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_name ON accounts (account_name, event_id);
+CREATE TABLE IF NOT EXISTS message_fields (
+    event_id INTEGER PRIMARY KEY REFERENCES events (id),
+    target_account TEXT,
+    member TEXT,
+    subject_account TEXT
+);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    records INTEGER
+);
+"""
+
+
+def as_list(value) -> list:
+    """Значение поля Splunk как список (у 4624 и подобных Account_Name - [субъект, цель])"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def as_text(value) -> str | None:
+    """Многозначное поле одной строкой для вывода"""
+    return ', '.join(map(str, value)) if isinstance(value, list) else value
+
+
+def parse_splunk_time(value: str | None) -> float | None:
+    """
+        '2016-08-28 16:02:21.000 MDT' -> unix-время.
+        Аббревиатура пояса отбрасывается: время одного источника сравнимо между собой.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:23], '%Y-%m-%d %H:%M:%S.%f').replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+class EventStore:
+    """Постоянное хранилище событий Windows (SQLite) с индексами по EventCode, хосту, учетке и времени"""
+
+    def __init__(self, path: str = DB_PATH):
+        """
+            Args:
+                path (str): файл базы, создается при первом открытии
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        # У событий баз старого формата нет разобранных полей: выгрузки будут дочитаны заново
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            return
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(events)')}
+        with self.connection:
+            if 'message' in columns:
+                self.connection.execute('ALTER TABLE events DROP COLUMN message')
+            self.connection.execute('DELETE FROM ingested_files')
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        if 'message' in columns:
+            # Место, которое занимал текст Message, возвращается файлу
+            self.connection.execute('VACUUM')
+
+    def is_current(self, export_path: str) -> bool:
+        """True, если выгрузка уже загружена и с тех пор не менялась"""
+        stat = os.stat(export_path)
+        known = self.connection.execute('SELECT size, mtime FROM ingested_files WHERE path = ?',
+                                        (os.path.abspath(export_path),)).fetchone()
+        return known == (stat.st_size, stat.st_mtime)
+
+    def ingest(self, export_path: str) -> int:
+        """
+            Дозагружает выгрузку Splunk без перестроения базы.
+            Уже загруженный неизмененный файл пропускается, повторные события (по _cd) игнорируются.
+
+            Args:
+                export_path (str): путь к выгрузке botsv1-формата
+
+            Returns:
+                int: сколько новых событий добавлено
+        """
+        if self.is_current(export_path):
+            return 0
+        key = os.path.abspath(export_path)
+        stat = os.stat(export_path)
+
+        columns = list(FIELDS.values()) + ['ts']
+        insert = (f"INSERT OR IGNORE INTO events ({', '.join(columns)}) "
+                  f"VALUES ({', '.join('?' * len(columns))})")
+        insert_fields = (f"INSERT OR IGNORE INTO message_fields (event_id, {', '.join(MESSAGE_STORED)}) "
+                         f"VALUES ({', '.join('?' * (len(MESSAGE_STORED) + 1))})")
+        added = 0
+        # Вся выгрузка - одна транзакция: при ошибке база остается в прежнем состоянии
+        with self.connection:
+            for offset, record in enumerate(iter_splunk_records(export_path, list(FIELDS) + ['Message'])):
+                row, accounts = self._row(record, key, offset)
+                parsed = parse_message(record.get('EventCode'), record.get('Message'))
+                fields = [parsed.get(column) for column in MESSAGE_STORED]
+                cursor = self.connection.execute(insert, row)
+                # Учетки добавляются только для новых (не повторных) событий
+                if cursor.rowcount:
+                    added += 1
+                    event_id = cursor.lastrowid
+                    self.connection.executemany('INSERT INTO accounts VALUES (?, ?, ?)',
+                                                [(event_id, *account) for account in accounts])
+                elif any(fields):
+                    # Повторное событие из базы старого формата получает разобранные поля
+                    event_id = self.connection.execute('SELECT id FROM events WHERE cd = ?', (row[0],)).fetchone()[0]
+                if any(fields):
+                    self.connection.execute(insert_fields, (event_id, *fields))
+            self.connection.execute('INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?)',
+                                    (key, stat.st_size, stat.st_mtime, added))
+        return added
+
+    @staticmethod
+    def _row(record: dict, source: str, offset: int) -> tuple[tuple, list]:
+        # Без _cd событие идентифицируется файлом и позицией в нем
+        values = [as_text(record.get(field)) for field in FIELDS]
+        if values[0] is None:
+            values[0] = f'{source}#{offset}'
+        names = as_list(record.get('Account_Name'))
+        domains = as_list(record.get('Account_Domain'))
+        domains += [None] * (len(names) - len(domains))
+        accounts = [(name, domain) for name, domain in zip(names, domains) if name not in (None, '-')]
+        return (*values, parse_splunk_time(record.get('_time'))), accounts
+
+    def find(self, event_codes=None, computer: str | None = None, account: str | None = None,
+             since: float | None = None, until: float | None = None) -> pd.DataFrame:
+        """
+            Выборка по индексам
+
+            Args:
+                event_codes: коды событий (строки), None - любые
+                computer (str | None): ComputerName
+                account (str | None): Account_Name (любая из учеток события)
+                since (float | None): unix-время, не раньше
+                until (float | None): unix-время, раньше
+
+            Returns:
+                pd.DataFrame: события в порядке времени
+        """
+        conditions, params = [], []
+        if event_codes is not None:
+            event_codes = sorted(set(event_codes))
+            conditions.append(f"event_code IN ({', '.join('?' * len(event_codes))})")
+            params.extend(event_codes)
+        if computer is not None:
+            conditions.append('computer_name = ?')
+            params.append(computer)
+        if account is not None:
+            conditions.append('id IN (SELECT event_id FROM accounts WHERE account_name = ?)')
+            params.append(account)
+        if since is not None:
+            conditions.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('ts < ?')
+            params.append(until)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return pd.read_sql_query(f'SELECT * FROM events {where} ORDER BY ts', self.connection, params=params)
+
+    def investigate(self, name: str, **filters) -> pd.DataFrame:
+        """
+            Готовое расследование из INVESTIGATIONS (failed_logins, privilege_escalation, user_management)
+
+            Args:
+                name (str): название расследования
+                **filters: доп. фильтры find (computer, account, since, until)
+        """
+        return self.find(INVESTIGATIONS[name], **filters)
+
+    def parsed_events(self, event_codes=None) -> pd.DataFrame:
+        """
+            События с разобранными при загрузке полями Message (MESSAGE_STORED) - те же значения,
+            что дает messageParser.load_parsed_events, но без повторного чтения и разбора выгрузки
+
+            Args:
+                event_codes: коды событий (строки), None - любые
+
+            Returns:
+                pd.DataFrame: BASE_FIELDS + MESSAGE_STORED в порядке времени
+        """
+        where, params = '', []
+        if event_codes is not None:
+            params = sorted(set(event_codes))
+            where = f"WHERE e.event_code IN ({', '.join('?' * len(params))})"
+        columns = ', '.join([*(f'e.{FIELDS[field]} AS "{field}"' for field in BASE_FIELDS),
+                             *(f'm.{column}' for column in MESSAGE_STORED)])
+        query = (f'SELECT {columns} FROM events e LEFT JOIN message_fields m ON m.event_id = e.id '
+                 f'{where} ORDER BY e.ts, e.id')
+        return pd.read_sql_query(query, self.connection, params=params)
+
+    def count_by_code(self, event_codes=None) -> pd.Series:
+        """Количество событий по EventCode (считается по индексу, без чтения строк)"""
+        where, params = '', []
+        if event_codes is not None:
+            params = sorted(set(event_codes))
+            where = f"WHERE event_code IN ({', '.join('?' * len(params))})"
+        rows = self.connection.execute(f'SELECT event_code, COUNT(*) FROM events {where} '
+                                       f'GROUP BY event_code ORDER BY COUNT(*) DESC, event_code', params).fetchall()
+        return pd.Series(dict(rows), name='count', dtype='int64').rename_axis('EventCode')
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Индексированное хранилище событий Windows')
+    parser.add_argument('--db', default=DB_PATH, help='файл базы SQLite')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='дозагрузить выгрузки Splunk')
+    ingest.add_argument('paths', nargs='+')
+
+    query = commands.add_parser('query', help='выполнить расследование')
+    query.add_argument('investigation', choices=sorted(INVESTIGATIONS))
+    query.add_argument('--computer')
+    query.add_argument('--account')
+    args = parser.parse_args()
+
+    store = EventStore(args.db)
+    try:
+        if args.command == 'ingest':
+            for path in args.paths:
+                print(f"📥 {path}: добавлено событий {store.ingest(path):,}")
+        else:
+            events = store.investigate(args.investigation, computer=args.computer, account=args.account)
+            print(events.to_string(index=False) if len(events) else "Событий не найдено")
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import time
+from itertools import cycle, islice
+
+from messageParser import BASE_FIELDS, CHUNK_RECORDS, parse_records
+from splunkReader import iter_splunk_records
+
+DEFAULT_RECORDS = 200_000
+
+
+def load_corpus(path: str, records: int) -> list[dict]:
+    """
+        Корпус для замеров: записи выгрузки по кругу до нужного количества
+
+        Args:
+            path (str): выгрузка Splunk
+            records (int): сколько записей нужно
+
+        Returns:
+            list[dict]: записи с BASE_FIELDS и Message
+    """
+    source = list(iter_splunk_records(path, BASE_FIELDS + ['Message']))
+    if not source:
+        raise ValueError(f'{path}: нет записей')
+    return list(islice(cycle(source), records))
+
+
+def run_benchmark(corpus: list[dict], workers_list: list[int], chunk_size: int) -> list:
+    """
+        Разбирает один и тот же корпус с разным количеством процессов
+
+        Returns:
+            list: (процессов, записей, время, записей/с, ускорение относительно первого прогона)
+    """
+    results = []
+    for workers in workers_list:
+        start = time.perf_counter()
+        parsed = sum(1 for _ in parse_records(corpus, workers, chunk_size))
+        elapsed = time.perf_counter() - start
+        rate = parsed / elapsed if elapsed else float('inf')
+        results.append((workers, parsed, elapsed, rate, rate / results[0][3] if results else 1.0))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк разбора Message: записей/с от количества процессов')
+    parser.add_argument('path', nargs='?', default='botsv1.json', help='выгрузка Splunk')
+    parser.add_argument('--records', type=int, default=DEFAULT_RECORDS, help='размер корпуса')
+    parser.add_argument('--workers', type=int, nargs='+', default=None, help='количества процессов')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_RECORDS, help='записей в одной задаче')
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers_list = args.workers or sorted({1, 2, 4, cpus} | {w for w in (8, 16) if w <= cpus})
+    corpus = load_corpus(args.path, args.records)
+
+    print(f"ядер: {cpus}")
+    print(f"{'процессов':>10} {'записей':>10} {'время, с':>10} {'записей/с':>12} {'ускорение':>10}")
+    for workers, parsed, elapsed, rate, speedup in run_benchmark(corpus, workers_list, args.chunk_size):
+        print(f"{workers:>10} {parsed:>10,} {elapsed:>10.3f} {rate:>12,.0f} {speedup:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
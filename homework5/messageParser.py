@@ -0,0 +1,257 @@
+import argparse
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+from splunkReader import iter_splunk_records
+
+# Записей в одной задаче пула: меньше - дороже пересылка, больше - хуже балансировка
+CHUNK_RECORDS = 2000
+
+# Поля, которые берутся из самой записи, а не из Message
+BASE_FIELDS = ['EventCode', 'ComputerName', '_time']
+
+# Многострочное значение: "Privileges:\t\tSeA\n\t\t\tSeB" или "Enabled Privileges:\n\t\t\tSeA"
+LIST = 'list'
+
+# В новых версиях Windows раздел Subject у 4688 называется Creator Subject
+SUBJECT_ACCOUNT = (('Subject', 'Creator Subject'), 'Account Name')
+PROCESS_NAME = ('Process Information', 'Process Name')
+
+# Коды подстановки Windows, которые попадают в Message без расшифровки
+VALUE_ALIASES = {
+    '%%1936': 'TokenElevationTypeDefault (1)',
+    '%%1937': 'TokenElevationTypeFull (2)',
+    '%%1938': 'TokenElevationTypeLimited (3)',
+}
+
+# EventCode -> колонка -> (раздел Message (или кортеж вариантов) / None для верхнего уровня, метка поля[, LIST])
+MESSAGE_FIELDS = {
+    '4624': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'target_account': ('New Logon', 'Account Name'),
+        'target_domain': ('New Logon', 'Account Domain'),
+        'logon_type': (None, 'Logon Type'),
+        'process_name': PROCESS_NAME,
+        'workstation': ('Network Information', 'Workstation Name'),
+        'source_address': ('Network Information', 'Source Network Address'),
+        'source_port': ('Network Information', 'Source Port'),
+        'logon_process': ('Detailed Authentication Information', 'Logon Process'),
+        'auth_package': ('Detailed Authentication Information', 'Authentication Package'),
+    },
+    '4625': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'target_account': ('Account For Which Logon Failed', 'Account Name'),
+        'target_domain': ('Account For Which Logon Failed', 'Account Domain'),
+        'logon_type': (None, 'Logon Type'),
+        'failure_reason': ('Failure Information', 'Failure Reason'),
+        'status': ('Failure Information', 'Status'),
+        'sub_status': ('Failure Information', 'Sub Status'),
+        'process_name': PROCESS_NAME,
+        'workstation': ('Network Information', 'Workstation Name'),
+        'source_address': ('Network Information', 'Source Network Address'),
+    },
+    '4656': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'object_type': ('Object', 'Object Type'),
+        'object_name': ('Object', 'Object Name'),
+        'process_name': PROCESS_NAME,
+        'access_mask': ('Access Request Information', 'Access Mask'),
+    },
+    '4672': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'privileges': (None, 'Privileges', LIST),
+    },
+    '4688': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'new_process_id': ('Process Information', 'New Process ID'),
+        'new_process_name': ('Process Information', 'New Process Name'),
+        'token_elevation_type': ('Process Information', 'Token Elevation Type'),
+        'creator_process_id': ('Process Information', 'Creator Process ID'),
+        'creator_process_name': ('Process Information', 'Creator Process Name'),
+        'command_line': ('Process Information', 'Process Command Line'),
+    },
+    '4689': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'process_name': PROCESS_NAME,
+        'exit_status': ('Process Information', 'Exit Status'),
+    },
+    '4703': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'target_account': ('Target Account', 'Account Name'),
+        'process_name': PROCESS_NAME,
+        'enabled_privileges': (None, 'Enabled Privileges', LIST),
+        'disabled_privileges': (None, 'Disabled Privileges', LIST),
+    },
+    '4720': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'target_account': ('New Account', 'Account Name'),
+        'target_domain': ('New Account', 'Account Domain'),
+    },
+    '4722': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'target_account': ('Target Account', 'Account Name'),
+    },
+    '4724': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'target_account': ('Target Account', 'Account Name'),
+    },
+    '4728': {
+        'subject_account': SUBJECT_ACCOUNT,
+        'member': ('Member', 'Account Name'),
+        'group': ('Group', 'Group Name'),
+    },
+    # Неудачная предварительная аутентификация Kerberos: учетка - в Account Information, без Subject
+    '4771': {
+        'target_account': ('Account Information', 'Account Name'),
+        'service_name': ('Service Information', 'Service Name'),
+        'source_address': ('Network Information', 'Client Address'),
+        'source_port': ('Network Information', 'Client Port'),
+        'status': ('Additional Information', 'Failure Code'),
+    },
+}
+
+
+def _field_pattern(section, label: str, kind: str | None = None) -> re.Pattern:
+    # Значение ищется только внутри своего раздела: "Account Name" есть и в Subject, и в New Logon
+    label = re.escape(label)
+    if kind == LIST:
+        return re.compile(rf'^{label}:[\t ]*([^\n]*(?:\n\t\t\t[^\n]*)*)', re.M)
+    if section is None:
+        return re.compile(rf'^{label}:\t+([^\n]*)', re.M)
+    sections = '|'.join(map(re.escape, (section,) if isinstance(section, str) else section))
+    return re.compile(rf'^(?:{sections}):\n(?:\t[^\n]*\n)*?\t{label}:\t*([^\n]*)', re.M)
+
+
+def compile_extractors(spec: dict = MESSAGE_FIELDS) -> dict[str, list[tuple[str, re.Pattern, bool]]]:
+    """
+        Компилирует регулярки полей один раз на процесс
+
+        Args:
+            spec (dict): EventCode -> колонка -> (раздел, метка[, LIST])
+
+        Returns:
+            dict: EventCode -> [(колонка, регулярка, многострочное ли значение)]
+    """
+    return {code: [(column, _field_pattern(*field), len(field) > 2 and field[2] == LIST)
+                   for column, field in fields.items()]
+            for code, fields in spec.items()}
+
+
+EXTRACTORS = compile_extractors()
+
+# Все колонки, которые может дать разбор, в стабильном порядке
+MESSAGE_COLUMNS = list(dict.fromkeys(column for fields in MESSAGE_FIELDS.values() for column in fields))
+# Поля Message с учеткой события в порядке предпочтения: цель входа, добавленный член группы, субъект
+ACCOUNT_FIELDS = ['target_account', 'member', 'subject_account']
+
+
+def parse_message(event_code: str, message: str | None) -> dict[str, str]:
+    """
+        Поля одного Message по правилам его EventCode
+
+        Args:
+            event_code (str): EventCode записи
+            message (str | None): текст Message
+
+        Returns:
+            dict[str, str]: колонка -> значение (отсутствующие и '-' пропускаются)
+    """
+    fields = {}
+    if not message:
+        return fields
+    for column, pattern, is_list in EXTRACTORS.get(event_code, ()):
+        match = pattern.search(message)
+        if match is None:
+            continue
+        if is_list:
+            value = ', '.join(item for item in match.group(1).split() if item != '-')
+        else:
+            value = match.group(1).strip()
+        if value and value != '-':
+            fields[column] = VALUE_ALIASES.get(value, value)
+    return fields
+
+
+def _parse_chunk(chunk: list[tuple]) -> list[dict]:
+    # Задача воркера: в процесс пересылаются только базовые поля и Message
+    return [{**dict(zip(BASE_FIELDS, base)), **parse_message(base[0], message)} for *base, message in chunk]
+
+
+def _chunks(records, size: int):
+    records = iter(records)
+    while chunk := [(*(record.get(field) for field in BASE_FIELDS), record.get('Message'))
+                    for record in islice(records, size)]:
+        yield chunk
+
+
+def parse_records(records, workers: int | None = None, chunk_size: int = CHUNK_RECORDS):
+    """
+        Разбирает Message записей в пуле процессов, порядок записей сохраняется
+
+        Args:
+            records: итератор записей Splunk (словари с EventCode, Message, ...)
+            workers (int | None): количество процессов, None - по числу ядер, 1 - без пула
+            chunk_size (int): записей в одной задаче
+
+        Yields:
+            dict: базовые поля и разобранные поля Message
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in _chunks(records, chunk_size):
+            yield from _parse_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        # В работе не больше двух задач на процесс: память ограничена, порядок сохраняется
+        pending = deque()
+        for chunk in _chunks(records, chunk_size):
+            pending.append(executor.submit(_parse_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def load_parsed_events(path: str, event_codes=None, workers: int | None = None,
+                       chunk_size: int = CHUNK_RECORDS) -> pd.DataFrame:
+    """
+        DataFrame событий выгрузки Splunk с колонками из Message
+
+        Args:
+            path (str): путь к выгрузке
+            event_codes: коды событий, которые нужны (строки), None - все
+            workers (int | None): количество процессов
+            chunk_size (int): записей в одной задаче
+
+        Returns:
+            pd.DataFrame: BASE_FIELDS + MESSAGE_COLUMNS
+    """
+    records = iter_splunk_records(path, BASE_FIELDS + ['Message'], event_codes)
+    return pd.DataFrame.from_records(parse_records(records, workers, chunk_size),
+                                     columns=BASE_FIELDS + MESSAGE_COLUMNS)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Разбор поля Message событий Windows в колонки')
+    parser.add_argument('path', nargs='?', default='botsv1.json', help='выгрузка Splunk')
+    parser.add_argument('--workers', type=int, default=None, help='количество процессов')
+    parser.add_argument('--output', default=None, help='сохранить результат в CSV')
+    args = parser.parse_args()
+
+    events = load_parsed_events(args.path, workers=args.workers)
+    events = events.dropna(axis=1, how='all')
+    if args.output:
+        events.to_csv(args.output, index=False)
+        print(f"✅ Разобранные события сохранены в '{args.output}'")
+    else:
+        print(events.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
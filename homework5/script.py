@@ -1,23 +1,42 @@
+import argparse
+
 import pandas as pd
 
-file_path = 'botsv1.json'
+from eventCorrelation import CORRELATION_CODES, CorrelationEngine, sorted_events
+from eventStore import DB_PATH, INVESTIGATIONS, EventStore
+
+parser = argparse.ArgumentParser(description='Расследования и корреляция событий Windows из выгрузки Splunk')
+parser.add_argument('path', nargs='?', default='botsv1.json', help='выгрузка Splunk')
+parser.add_argument('--db', default=DB_PATH, help='файл базы SQLite, сохраняется между запусками')
+args = parser.parse_args()
+file_path = args.path
 
-security_logs = pd.read_json(file_path)
-# Извлечение данных из колонки 'result'
-expanded_security_logs = pd.json_normalize(security_logs['result'])
+failed_login_codes = list(INVESTIGATIONS['failed_logins'])
+privilege_escalation = list(INVESTIGATIONS['privilege_escalation'])
+users_event = list(INVESTIGATIONS['user_management'])
+# Список подозрительных EventCode в виде строк (без повторов)
+suspicious_event_codes = [*failed_login_codes, *privilege_escalation, *users_event]
 
-failed_login_codes = ['4625', '4771', '4771']
-privilege_escalation = ['4672', '4104', '4688', '4688']
-users_event = ['4720', '4722', '4724', '4728', '4703']
-# Список подозрительных EventCode в виде строк
-suspicious_event_codes = [*failed_login_codes, *privilege_escalation, *users_event ]
-# Фильтрация записей, содержащих подозрительные EventCode
-suspicious_logs = expanded_security_logs[expanded_security_logs['EventCode'].isin(suspicious_event_codes)]
-# Анализ данных
-event_counts = suspicious_logs['EventCode'].value_counts()
+# Индексированное хранилище: выгрузка разбирается один раз, дальше - выборки по индексу.
+# База сохраняется между запусками: неизмененная выгрузка повторно не читается
+store = EventStore(args.db)
+try:
+    if store.is_current(file_path):
+        print(f"♻️  База {args.db} актуальна, выгрузка не перечитывается")
+    else:
+        print(f"📥 {file_path}: добавлено событий {store.ingest(file_path):,}")
+    suspicious_logs = store.find(suspicious_event_codes)
+    # Анализ данных
+    event_counts = store.count_by_code(suspicious_event_codes)
+    # Корреляция по времени: перебор паролей и цепочки повышения привилегий по учеткам и хостам
+    alerts = CorrelationEngine().run(sorted_events(store.parsed_events(CORRELATION_CODES)))
+finally:
+    store.close()
 
 
 df = pd.read_parquet('dns.parquet')
 print(df.columns.tolist())
 
 print(event_counts)
+for alert in alerts:
+    print(f"🚨 {alert['pattern']}: {alert['key']} ({alert['events']} событий)")
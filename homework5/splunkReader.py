@@ -0,0 +1,103 @@
+import json
+
+import pandas as pd
+
+# Сколько символов дочитывать за раз
+CHUNK_SIZE = 1 << 20
+
+# Поля, которые нужны для разбора журналов безопасности
+DEFAULT_FIELDS = ['EventCode', 'ComputerName', 'Account_Name', 'Account_Domain', 'LogName', 'Keywords', '_time']
+
+_WHITESPACE = ' \t\r\n'
+
+
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE):
+    """
+        Потоково читает JSON-файл вида [{...}, {...}, ...] и отдает элементы по одному.
+        В памяти держится только текущий кусок файла и один разобранный элемент.
+
+        Args:
+            path (str): путь к файлу
+            chunk_size (int): сколько символов дочитывать за раз
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def fill(buffer, pos):
+            # Отбрасываем прочитанное и дочитываем не меньше, чем уже есть в буфере,
+            # чтобы большой элемент не перечитывался много раз
+            chunk = f.read(max(chunk_size, len(buffer) - pos))
+            return buffer[pos:] + chunk, 0, not chunk
+
+        started = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError(f'{path}: неожиданный конец файла')
+                buffer, pos, eof = fill(buffer, pos)
+                continue
+
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise ValueError(f'{path}: ожидался JSON-массив')
+                started = True
+                pos += 1
+                continue
+            if char == ']':
+                return
+            if char == ',':
+                pos += 1
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Элемент не поместился в буфер целиком
+                if eof:
+                    raise
+                buffer, pos, eof = fill(buffer, pos)
+                continue
+            yield item
+            pos = end
+            if pos > chunk_size:
+                buffer, pos = buffer[pos:], 0
+
+
+def iter_splunk_records(path: str, fields: list[str] | None = None, event_codes=None, chunk_size: int = CHUNK_SIZE):
+    """
+        Записи выгрузки Splunk ([{"preview": ..., "result": {...}}, ...]) по одной.
+        Фильтр по EventCode применяется до проекции, лишние поля (Message, _raw, ...) сразу отбрасываются.
+
+        Args:
+            path (str): путь к выгрузке
+            fields (list[str] | None): какие поля result оставить, None - все
+            event_codes: коды событий, которые нужны (строки), None - все
+            chunk_size (int): сколько символов дочитывать за раз
+    """
+    event_codes = set(event_codes) if event_codes is not None else None
+    for item in iter_json_array(path, chunk_size):
+        result = item.get('result', item)
+        if event_codes is not None and result.get('EventCode') not in event_codes:
+            continue
+        yield {field: result.get(field) for field in fields} if fields is not None else result
+
+
+def load_events(path: str, fields: list[str] = DEFAULT_FIELDS, event_codes=None) -> pd.DataFrame:
+    """
+        DataFrame только из нужных полей и только отфильтрованных событий
+
+        Args:
+            path (str): путь к выгрузке Splunk
+            fields (list[str]): какие поля оставить
+            event_codes: коды событий, которые нужны (строки), None - все
+
+        Returns:
+            pd.DataFrame
+    """
+    return pd.DataFrame.from_records(iter_splunk_records(path, fields, event_codes), columns=fields)
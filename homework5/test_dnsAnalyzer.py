@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dnsAnalyzer import load_dataset, score_dataset, threshold_dataset
+from dnsQuantiles import QuantileSketch
+from dnsRules import RULES_PATH, load_rules
+from dnsSynthetic import write_parquet
+
+ROWS = 30_000
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return load_rules(RULES_PATH)
+
+
+@pytest.fixture(scope='module')
+def dataset_path(tmp_path_factory):
+    return write_parquet(str(tmp_path_factory.mktemp('dns') / 'dns.parquet'), ROWS)
+
+
+def test_exact_quantiles_match_pandas():
+    values = np.random.default_rng(0).normal(size=5000)
+    sketch = QuantileSketch()
+    for start in range(0, len(values), 700):
+        sketch.update(values[start:start + 700])
+    assert sketch.is_exact()
+    expected = pd.Series(values).quantile([0.05, 0.5, 0.95]).to_numpy()
+    assert np.array_equal(sketch.quantiles([0.05, 0.5, 0.95]), expected)
+
+
+def test_sketch_does_not_depend_on_batch_size():
+    values = np.random.default_rng(1).exponential(size=50_000)
+    results = []
+    for batch in (1000, 4096, 50_000):
+        sketch = QuantileSketch(0.01, exact_limit=0)
+        for start in range(0, len(values), batch):
+            sketch.update(values[start:start + batch])
+        assert not sketch.is_exact()
+        results.append(sketch.quantiles([0.05, 0.5, 0.95]))
+    assert np.array_equal(results[0], results[1])
+    assert np.array_equal(results[0], results[2])
+
+
+def test_in_memory_and_streamed_thresholds_are_equal(dataset_path, rules):
+    memory = load_dataset(dataset_path)
+    memory_thresholds = threshold_dataset(memory, rules)
+    memory_stats = score_dataset(memory, rules, memory_thresholds)
+
+    for batch_size in (5000, 7777):
+        streamed = load_dataset(dataset_path, stream=True, batch_size=batch_size)
+        thresholds = threshold_dataset(streamed, rules)
+        assert thresholds == memory_thresholds
+        assert score_dataset(streamed, rules, thresholds).suspicious_count == memory_stats.suspicious_count
+
+
+def test_in_memory_thresholds_match_pandas(dataset_path, rules):
+    frame = pd.read_parquet(dataset_path)
+    thresholds = threshold_dataset(load_dataset(dataset_path), rules)
+    for col, quantiles in thresholds.items():
+        for q, value in quantiles.items():
+            assert value == pytest.approx(frame[col].quantile(q))
+    # Отсечение по 95-му перцентилю помечает ровно 5% строк
+    assert int((frame['entropy'] > thresholds['entropy'][0.95]).sum()) == ROWS // 20
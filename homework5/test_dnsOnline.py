@@ -0,0 +1,79 @@
+import math
+import os
+
+import pytest
+
+from dnsOnline import REFRESH_EVERY, OnlineScorer
+from dnsRules import RULES_PATH, load_rules
+from dnsSynthetic import generate_chunk
+
+START = 1_700_000_000.0
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return load_rules(RULES_PATH)
+
+
+@pytest.fixture(scope='module')
+def records():
+    return generate_chunk(2000).to_dict('records')
+
+
+def test_checkpoint_without_path_raises(rules, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scorer = OnlineScorer(rules)
+    with pytest.raises(ValueError):
+        scorer.checkpoint()
+    assert os.listdir(tmp_path) == []
+
+
+def test_checkpoint_restore_round_trip(rules, records, tmp_path):
+    path = str(tmp_path / 'state.pkl')
+    scorer = OnlineScorer(rules, checkpoint_path=path)
+    for i, record in enumerate(records):
+        scorer.score(record, START + i)
+    scorer.checkpoint()
+    assert not os.path.exists(f'{path}.tmp')
+
+    restored = OnlineScorer.restore(path, rules)
+    assert restored.records_seen == len(records)
+    scorer._refresh()
+    assert restored.thresholds == scorer.thresholds
+
+
+def test_thresholds_available_during_warm_up(rules, records):
+    scorer = OnlineScorer(rules)
+    flagged = 0
+    # Все записи в одной корзине окна: пороги обновляются только разогревом
+    for record in records:
+        score, _ = scorer.score(record, START)
+        flagged += scorer.is_suspicious(score)
+    assert len(records) < REFRESH_EVERY
+    assert all(not math.isnan(value) for quantiles in scorer.thresholds.values() for value in quantiles.values())
+    assert flagged
+
+
+def test_thresholds_survive_gap_longer_than_window(rules, records):
+    scorer = OnlineScorer(rules, window=600, buckets=6, warm_up=500)
+    for i, record in enumerate(records):
+        scorer.score(record, START + i * 0.1)
+    before = scorer.thresholds
+    assert scorer.window_records() == len(records)
+
+    # Разрыв длиннее окна: старые корзины выпали, окно начинается заново
+    resumed = START + 10_000
+    flagged = 0
+    for i, record in enumerate(records[:400]):
+        score, _ = scorer.score(record, resumed + i * 0.1)
+        flagged += scorer.is_suspicious(score)
+    assert scorer.window_records() == 400
+    assert scorer.thresholds == before
+    assert all(not math.isnan(value) for quantiles in scorer.thresholds.values() for value in quantiles.values())
+    assert flagged
+
+    # Окно снова разогрето - пороги считаются по новым записям
+    for i, record in enumerate(records[400:600]):
+        scorer.score(record, resumed + 40 + i * 0.1)
+    assert scorer.window_records() == 600
+    assert scorer.thresholds != before
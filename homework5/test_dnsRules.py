@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dnsRules import RULES_PATH, load_rules
+from dnsSynthetic import generate_chunk
+
+ROWS = 5000
+FEATURES = ['NULL_frequency', 'TXT_frequency', 'entropy', 'len', 'unique_country']
+
+
+def baseline(frame: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    """Балл и маска причин по формулам исходного dnsAnalyzer.py (c81bc5f), биты в порядке dns_rules.json"""
+    score = pd.Series(0, index=frame.index)
+    checks = []
+    if 'NULL_frequency' in frame.columns:
+        checks.append((frame['NULL_frequency'] > frame['NULL_frequency'].quantile(0.9), 2, 0))
+    if 'TXT_frequency' in frame.columns:
+        checks.append((frame['TXT_frequency'] > frame['TXT_frequency'].quantile(0.9), 2, 1))
+    if 'entropy' in frame.columns:
+        checks.append((frame['entropy'] > frame['entropy'].quantile(0.95), 3, 2))
+    if 'len' in frame.columns:
+        checks.append((frame['len'] > 63, 2, 3))
+    if 'unique_country' in frame.columns:
+        checks.append((frame['unique_country'] > frame['unique_country'].quantile(0.9), 1, 4))
+    mask = pd.Series(0, index=frame.index)
+    for hit, weight, bit in checks:
+        score += hit * weight
+        mask += hit.astype(np.int64) * (1 << bit)
+    return score, mask
+
+
+def baseline_reasons(row, frame: pd.DataFrame) -> list[str]:
+    # Причины ТОПа из исходного скрипта (для unique_country причины там не было)
+    reasons = []
+    if 'NULL_frequency' in row and row['NULL_frequency'] > frame['NULL_frequency'].quantile(0.9):
+        reasons.append(f"высокая NULL частота ({row['NULL_frequency']:.3f})")
+    if 'TXT_frequency' in row and row['TXT_frequency'] > frame['TXT_frequency'].quantile(0.9):
+        reasons.append(f"высокая TXT частота ({row['TXT_frequency']:.3f})")
+    if 'entropy' in row and row['entropy'] > frame['entropy'].quantile(0.95):
+        reasons.append(f"высокая энтропия ({row['entropy']:.2f})")
+    if 'len' in row and row['len'] > 63:
+        reasons.append(f"длина {row['len']} символов")
+    return reasons
+
+
+@pytest.fixture(scope='module')
+def frame():
+    frame = generate_chunk(ROWS)
+    rng = np.random.default_rng(1)
+    # Пропуски в каждом признаке правил: NaN не должен включать правило ни в одной из реализаций
+    for feature in FEATURES:
+        frame[feature] = frame[feature].astype('float64')
+        frame.loc[rng.random(ROWS) < 0.05, feature] = np.nan
+    return frame
+
+
+def compile_rules(frame: pd.DataFrame):
+    rules = load_rules(RULES_PATH)
+    plan = rules.threshold_plan(list(frame.columns))
+    thresholds = {feature: {q: frame[feature].quantile(q) for q in quantiles} for feature, quantiles in plan.items()}
+    return rules, rules.compile(list(frame.columns), thresholds)
+
+
+@pytest.mark.parametrize('drop', [None, 'unique_country', 'len'])
+def test_rule_table_matches_baseline_formulas(frame, drop):
+    if drop is not None:
+        frame = frame.drop(columns=[drop])
+    rules, compiled = compile_rules(frame)
+    expected_score, expected_mask = baseline(frame)
+
+    score, mask = compiled.evaluate(frame)
+    np.testing.assert_array_equal(score, expected_score.to_numpy())
+    np.testing.assert_array_equal(mask, expected_mask.to_numpy())
+    assert (score >= rules.suspicious_score).sum() == (expected_score >= 3).sum()
+
+    # Поштучный скоринг (онлайн-режим) дает то же, включая NaN в записи
+    records = frame.to_dict('records')
+    assert any(math.isnan(record[feature]) for record in records for feature in FEATURES if feature != drop)
+    assert [compiled.evaluate_record(record) for record in records] == list(zip(score.tolist(), mask.tolist()))
+
+
+def test_reasons_match_baseline_text(frame):
+    _, compiled = compile_rules(frame)
+    _, mask = compiled.evaluate(frame)
+    for i in np.flatnonzero(mask)[:200]:
+        row = frame.iloc[i]
+        reasons = compiled.decode(int(mask[i]), row)
+        # Причину по unique_country добавила таблица правил, остальные совпадают с исходным текстом
+        assert [reason for reason in reasons if 'стран' not in reason] == baseline_reasons(row, frame)
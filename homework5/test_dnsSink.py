@@ -0,0 +1,37 @@
+import glob
+import os
+
+import pandas as pd
+
+from dnsSink import ParquetResultSink
+
+
+def make_batch(start: int, rows: int) -> pd.DataFrame:
+    index = range(start, start + rows)
+    return pd.DataFrame({
+        'rr': [f'd{i}.com' for i in index],
+        'entropy': [i / 10 for i in index],
+        'GlobalClass': ['malicious' if i % 3 == 0 else 'normal' for i in index],
+        'suspicion_score': [float(i % 4) for i in index],
+        'is_suspicious': [i % 4 >= 2 for i in index],
+    })
+
+
+def test_one_file_per_partition(tmp_path):
+    full_dir = str(tmp_path / 'full')
+    sink = ParquetResultSink(full_dir, str(tmp_path / 'suspicious'))
+    batches = [make_batch(start, 100) for start in range(0, 1000, 100)]
+    for batch in batches:
+        sink.write(batch.copy())
+    sink.close()
+
+    files = glob.glob(os.path.join(full_dir, '**', '*.parquet'), recursive=True)
+    assert len(files) == sink.files_written == 4 * 2
+    assert os.path.isdir(os.path.join(full_dir, 'suspicion_score=3', 'GlobalClass=normal'))
+
+    expected = pd.concat(batches)
+    full = pd.read_parquet(full_dir)
+    assert sink.rows_written == len(full) == len(expected)
+    assert sorted(full['rr']) == sorted(expected['rr'])
+    suspicious = pd.read_parquet(str(tmp_path / 'suspicious'))
+    assert sink.suspicious_written == len(suspicious) == int(expected['is_suspicious'].sum())
@@ -0,0 +1,67 @@
+from eventCorrelation import CorrelationEngine
+from messageParser import parse_message
+
+START = 1_472_400_000.0
+
+KERBEROS_FAILURE = (
+    'Kerberos pre-authentication failed.\n\n'
+    'Account Information:\n'
+    '\tSecurity ID:\t\tS-1-5-21-1-2-3-1105\n'
+    '\tAccount Name:\t\tBob\n\n'
+    'Service Information:\n'
+    '\tService Name:\t\tkrbtgt/WAYNECORPINC\n\n'
+    'Network Information:\n'
+    '\tClient Address:\t\t::ffff:192.168.250.20\n'
+    '\tClient Port:\t\t49320\n\n'
+    'Additional Information:\n'
+    '\tTicket Options:\t\t0x40810010\n'
+    '\tFailure Code:\t\t0x18\n'
+    '\tPre-Authentication Type:\t2\n'
+)
+
+SUCCESSFUL_LOGON = (
+    'An account was successfully logged on.\n\n'
+    'Subject:\n'
+    '\tSecurity ID:\t\tS-1-0-0\n'
+    '\tAccount Name:\t\t-\n\n'
+    'Logon Type:\t\t\t3\n\n'
+    'New Logon:\n'
+    '\tSecurity ID:\t\tS-1-5-21-1-2-3-1105\n'
+    '\tAccount Name:\t\tbob\n'
+    '\tAccount Domain:\t\tWAYNECORPINC\n'
+)
+
+
+def event(code: str, message: str) -> dict:
+    return {'EventCode': code, 'ComputerName': 'we8105desk.waynecorpinc.local', **parse_message(code, message)}
+
+
+def test_kerberos_failure_fields():
+    fields = parse_message('4771', KERBEROS_FAILURE)
+    assert fields['target_account'] == 'Bob'
+    assert fields['service_name'] == 'krbtgt/WAYNECORPINC'
+    assert fields['source_address'] == '::ffff:192.168.250.20'
+    assert fields['status'] == '0x18'
+
+
+def test_kerberos_failures_correlate_by_account():
+    events = [event('4771', KERBEROS_FAILURE) for _ in range(6)] + [event('4624', SUCCESSFUL_LOGON)]
+    engine = CorrelationEngine()
+    alerts = [alert for i, item in enumerate(events) for alert in engine.process(item, START + i)]
+    assert sorted(alert['pattern'] for alert in alerts) == ['brute_force_account', 'brute_force_host']
+    account = next(alert for alert in alerts if alert['pattern'] == 'brute_force_account')
+    assert account['key'] == 'bob'
+    # Все шесть неудач окна и успешный вход, а не только attempts последних
+    assert account['events'] == 7
+    assert account['start'] == START
+
+
+def test_brute_force_counts_only_failures_inside_window():
+    engine = CorrelationEngine()
+    # Две неудачи задолго до окна, затем восемь подряд и успешный вход
+    times = [START, START + 1] + [START + 1000 + i for i in range(8)] + [START + 1010]
+    events = [event('4771', KERBEROS_FAILURE) for _ in range(10)] + [event('4624', SUCCESSFUL_LOGON)]
+    alerts = [alert for item, ts in zip(events, times) for alert in engine.process(item, ts)]
+    account = next(alert for alert in alerts if alert['pattern'] == 'brute_force_account')
+    assert account['events'] == 9
+    assert account['start'] == START + 1000
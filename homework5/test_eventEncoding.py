@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from eventEncoding import CATEGORICAL_FIELDS, TIME_FIELD, EventEncoder, frame_memory, memory_report
+from eventStore import as_text, parse_splunk_time
+from splunkReader import DEFAULT_FIELDS, load_events
+
+EXPORT = os.path.join(os.path.dirname(__file__), 'botsv1.json')
+
+
+def expected_values(path: str, event_codes=None) -> pd.DataFrame:
+    # Те же поля обычной загрузкой строками; многозначные поля - одной строкой, как у кодировщика
+    frame = load_events(path, DEFAULT_FIELDS, event_codes)
+    for field in CATEGORICAL_FIELDS:
+        frame[field] = frame[field].map(as_text)
+    return frame
+
+
+def test_round_trip_restores_values_and_dtypes():
+    encoder = EventEncoder()
+    encoded = encoder.load(EXPORT)
+    expected = expected_values(EXPORT)
+    assert len(encoded) == len(expected)
+
+    for field in CATEGORICAL_FIELDS:
+        assert isinstance(encoded[field].dtype, pd.CategoricalDtype)
+        # Словарь общий: категории колонки - его значения в порядке кодов
+        assert encoded[field].cat.categories.tolist() == encoder.dictionaries[field].values
+        decoded = encoded[field].astype(object).where(encoded[field].notna(), None)
+        assert decoded.tolist() == expected[field].where(expected[field].notna(), None).tolist()
+
+    assert pd.api.types.is_datetime64_dtype(encoded[TIME_FIELD])
+    seconds = (encoded[TIME_FIELD] - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+    np.testing.assert_allclose(seconds, expected[TIME_FIELD].map(parse_splunk_time).to_numpy(dtype=float))
+
+
+def test_concat_keeps_codes_of_earlier_files():
+    encoder = EventEncoder()
+    first = encoder.load(EXPORT, event_codes=['4624'])
+    second = encoder.load(EXPORT)
+    merged = encoder.concat([first, second])
+
+    expected = pd.concat([expected_values(EXPORT, ['4624']), expected_values(EXPORT)], ignore_index=True)
+    for field in CATEGORICAL_FIELDS:
+        assert isinstance(merged[field].dtype, pd.CategoricalDtype)
+        decoded = merged[field].astype(object).where(merged[field].notna(), None)
+        assert decoded.tolist() == expected[field].where(expected[field].notna(), None).tolist()
+
+    filtered = encoder.filter_codes(merged, ['4624', '4688'])
+    assert set(filtered['EventCode'].astype(str)) <= {'4624', '4688'}
+    assert len(filtered) == int(expected['EventCode'].isin(['4624', '4688']).sum())
+
+
+def test_memory_report_compares_with_string_load():
+    encoder = EventEncoder()
+    encoded = encoder.load(EXPORT)
+    before, after, ratio = memory_report([EXPORT], encoded)
+    assert after == frame_memory(encoded)
+    assert before > after and ratio > 1
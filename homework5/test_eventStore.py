@@ -0,0 +1,101 @@
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import eventStore
+from eventCorrelation import CORRELATION_CODES, sorted_events
+from eventStore import MESSAGE_STORED, EventStore
+from messageParser import BASE_FIELDS, load_parsed_events
+
+EXPORT = os.path.join(os.path.dirname(__file__), 'botsv1.json')
+
+
+def as_values(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def test_parsed_events_match_export(tmp_path):
+    store = EventStore(str(tmp_path / 'events.db'))
+    try:
+        assert store.ingest(EXPORT)
+        assert store.ingest(EXPORT) == 0
+        from_store = list(sorted_events(store.parsed_events(CORRELATION_CODES)))
+    finally:
+        store.close()
+    from_export = load_parsed_events(EXPORT, event_codes=CORRELATION_CODES, workers=1)
+    from_export = list(sorted_events(from_export[BASE_FIELDS + MESSAGE_STORED]))
+    assert from_store
+    # Пустая колонка из базы - None (object), из выгрузки - NaN: сравниваются значения
+    pd.testing.assert_frame_equal(as_values(pd.DataFrame([event for event, _ in from_store])),
+                                  as_values(pd.DataFrame([event for event, _ in from_export])))
+    assert [ts for _, ts in from_store] == [ts for _, ts in from_export]
+
+
+def test_second_run_reuses_store(tmp_path, monkeypatch):
+    path = str(tmp_path / 'events.db')
+    store = EventStore(path)
+    try:
+        added = store.ingest(EXPORT)
+        expected = store.parsed_events(CORRELATION_CODES)
+    finally:
+        store.close()
+
+    # Повторный запуск открывает ту же базу: выгрузка не читается и Message не разбирается
+    def fail(*args, **kwargs):
+        raise AssertionError('выгрузка прочитана повторно')
+
+    monkeypatch.setattr(eventStore, 'iter_splunk_records', fail)
+    store = EventStore(path)
+    try:
+        assert store.is_current(EXPORT)
+        assert store.ingest(EXPORT) == 0
+        assert int(store.count_by_code().sum()) == added
+        pd.testing.assert_frame_equal(store.parsed_events(CORRELATION_CODES), expected)
+        # Текст Message не хранится - только разобранные поля
+        columns = {row[1] for row in store.connection.execute('PRAGMA table_info(events)')}
+        assert 'message' not in columns
+    finally:
+        store.close()
+
+
+def test_old_database_drops_message_and_reingests(tmp_path):
+    path = str(tmp_path / 'events.db')
+    store = EventStore(path)
+    try:
+        store.ingest(EXPORT)
+        expected = store.parsed_events(CORRELATION_CODES)
+    finally:
+        store.close()
+
+    # База прошлого формата: текст Message в events, разобранных полей нет
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('ALTER TABLE events ADD COLUMN message TEXT')
+        connection.execute('DELETE FROM message_fields')
+        connection.execute('PRAGMA user_version = 1')
+    connection.close()
+
+    store = EventStore(path)
+    try:
+        assert not store.is_current(EXPORT)
+        assert store.ingest(EXPORT) == 0
+        pd.testing.assert_frame_equal(store.parsed_events(CORRELATION_CODES), expected)
+        columns = {row[1] for row in store.connection.execute('PRAGMA table_info(events)')}
+        assert 'message' not in columns
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize('codes', [None, ('4624',)])
+def test_parsed_events_columns(tmp_path, codes):
+    store = EventStore(str(tmp_path / 'events.db'))
+    try:
+        store.ingest(EXPORT)
+        events = store.parsed_events(codes)
+    finally:
+        store.close()
+    assert list(events.columns) == BASE_FIELDS + MESSAGE_STORED
+    if codes is not None:
+        assert set(events['EventCode']) == set(codes)